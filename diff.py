@@ -0,0 +1,45 @@
+import argparse
+import pathlib
+
+import toml
+
+import pcdl
+from pcdl.diff import diff_stacks, format_report, render_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compare two revisions of a design describing a "
+        "pneumatic circuit"
+    )
+    parser.add_argument(
+        '--config', type=argparse.FileType('r'),
+    )
+    parser.add_argument(
+        '--overlay', type=argparse.FileType('wb'),
+        help="write an svg showing only the contours that changed",
+    )
+    parser.add_argument(
+        'old', type=pathlib.Path,
+        help="an animated gif, a multi-page tiff, or a directory of pngs",
+    )
+    parser.add_argument(
+        'new', type=pathlib.Path,
+        help="the revision to compare against old, in any of the same forms",
+    )
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+
+    old = pcdl.load_design(args.old, config=config)
+    new = pcdl.load_design(args.new, config=config)
+
+    diffs = diff_stacks(old, new)
+    print(format_report(diffs))
+
+    if args.overlay is not None:
+        render_diff(diffs, args.overlay)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import pathlib
+
+import toml
+
+import pcdl
+from pcdl.nest import DEFAULT_SPACING, nest_layers, render_sheet
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="pack the layers of one or more designs describing "
+        "pneumatic circuits onto stock sheets"
+    )
+    parser.add_argument(
+        '--config', type=argparse.FileType('r'),
+    )
+    parser.add_argument(
+        '--spacing', type=float, default=DEFAULT_SPACING,
+        help="minimum gap between layers, in mm",
+    )
+    parser.add_argument(
+        '--compact', action='store_true',
+        help="merge contours into one compound path per cut class",
+    )
+    parser.add_argument(
+        '--common-lines', action='store_true',
+        help="cut edges shared between neighbouring layers only once",
+    )
+    parser.add_argument(
+        'output', type=pathlib.Path
+    )
+    parser.add_argument(
+        'descriptions', type=pathlib.Path, nargs='+',
+        help="animated gifs, multi-page tiffs, or directories of pngs",
+    )
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+
+    layers = []
+    for description in args.descriptions:
+        layers.extend(pcdl.load_design(description, config=config))
+
+    sheets = nest_layers(layers, config=config, spacing=args.spacing)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    for index, sheet in enumerate(sheets):
+        filename = f"sheet{index}_{sheet.material}_{sheet.thickness}mm.svg"
+        with open(args.output.joinpath(filename), 'wb') as output:
+            merged = render_sheet(
+                sheet, output,
+                compact=args.compact, common_lines=args.common_lines,
+            )
+        print(filename, *(
+            placement.layer.name for placement in sheet.placements
+        ))
+        if merged is not None:
+            print(
+                f"  common lines save {merged.saving:.1f}mm of "
+                f"{merged.length_before:.1f}mm"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,19 @@
-from pcdl.load import load_gif
-from pcdl.svg import render_layer, render_composite
+from pcdl.budget import MemoryBudgetError, MemoryPlan, plan_memory
+from pcdl.check import Problem, check_design
+from pcdl.config import Config
+from pcdl.geometry import (
+    Geometry, layer_geometry, read_binary, write_binary, write_npz,
+)
+from pcdl.load import load_design, load_directory, load_gif, load_tiff
+from pcdl.memory import MemoryProfile, StageMemory
+from pcdl.output import BUNDLES, DEFAULT_LEVEL, OutputWriter
+from pcdl.progress import Cancelled, Progress
+from pcdl.rendering import (
+    Rendering, layer_digest, layer_filename, render_design, render_variants,
+    shared_layers, variant_directories,
+)
+from pcdl.retrace import IncrementalTracer
+from pcdl.stl import layer_triangles, write_stl
+from pcdl.svg import (
+    layer_routes, render_layer, render_composite, render_composite_inline,
+)
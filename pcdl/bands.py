@@ -0,0 +1,224 @@
+"""
+Parallel tracing of the routes in a single layer.
+
+The layer is cut into horizontal bands of rows, each traced in a worker
+process.  A worker owns the half edges that start in its band.  It returns
+the contours that close within the band as finished paths, and everything
+else as open fragments that leave the band.  The parent stitches fragments
+into closed contours and then puts all contours into the same canonical
+order as the serial tracer, so the output is identical.
+"""
+import concurrent.futures
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.path import PathBuilder
+from pcdl.svg import (
+    _HalfEdge, _half_edges, _hedge_key, _layer_contours, _link_half_edges,
+    _next_edge, _trace_contours, _write_contour,
+)
+
+
+# Rows of links either side of a band that a worker needs in order to find
+# the successors of every half edge starting in the band.
+_MARGIN = 3
+
+
+class _Unstitchable(Exception):
+    # Raised when the half edges do not form disjoint closed contours, which
+    # only happens for layers with dead ends.  The serial tracer handles those
+    # by visiting order, so we fall back to it.
+    pass
+
+
+def _canonical(contour: List[_HalfEdge]):
+    # Rotate a closed contour to start at its smallest half edge, which is
+    # where the serial tracer would have started it.
+    start = min(range(len(contour)), key=lambda i: _hedge_key(contour[i]))
+    contour = contour[start:] + contour[:start]
+    contour.append(contour[0])
+    return _hedge_key(contour[0]), contour
+
+
+def _vertices(contour: List[_HalfEdge]) -> array:
+    vertices = array('i')
+    for hedge in contour:
+        vertices.extend(hedge.src)
+    vertices.extend(contour[-1].tgt)
+    return vertices
+
+
+def _hedges(vertices: array) -> List[_HalfEdge]:
+    points = [
+        Coordinate2(vertices[i], vertices[i + 1])
+        for i in range(0, len(vertices), 2)
+    ]
+    return [_HalfEdge(a, b) for a, b in zip(points, points[1:])]
+
+
+def _trace_band(task):
+    y0, y1, grid, x_links, y_links = task
+
+    links = []
+    for i in range(0, len(x_links), 2):
+        x, y = x_links[i], x_links[i + 1]
+        links.append((Coordinate2(x, y), Coordinate2(x + 1, y)))
+    for i in range(0, len(y_links), 2):
+        x, y = y_links[i], y_links[i + 1]
+        links.append((Coordinate2(x, y), Coordinate2(x, y + 1)))
+    hedges = _link_half_edges(links)
+
+    owned = [hedge for hedge in hedges if y0 <= hedge.src.y < y1]
+    owned.sort(key=_hedge_key)
+
+    successors = {}
+    predecessors = set()
+    for hedge in owned:
+        successor = _next_edge(hedges, hedge)
+        if successor is None or successor in predecessors:
+            raise _Unstitchable()
+        successors[hedge] = successor
+        predecessors.add(successor)
+
+    closed = []
+    fragments = []
+    visited = set()
+
+    # Chains entering the band from outside it.
+    for hedge in owned:
+        if hedge in predecessors:
+            continue
+        chain = [hedge]
+        visited.add(hedge)
+        successor = successors[hedge]
+        while successor in successors and successor not in visited:
+            chain.append(successor)
+            visited.add(successor)
+            successor = successors[successor]
+        fragments.append((
+            _hedge_key(chain[0]), _hedge_key(successor), _vertices(chain),
+        ))
+
+    # Whatever is left closes inside the band.
+    for hedge in owned:
+        if hedge in visited:
+            continue
+        cycle = [hedge]
+        visited.add(hedge)
+        successor = successors[hedge]
+        while successor != hedge:
+            cycle.append(successor)
+            visited.add(successor)
+            successor = successors[successor]
+
+        key, contour = _canonical(cycle)
+        path = PathBuilder()
+        _write_contour(path, contour, grid)
+        closed.append((key, path))
+
+    return closed, fragments
+
+
+def _stitch(fragments, grid):
+    by_start = {fragment[0]: fragment for fragment in fragments}
+    stitched = []
+    used = set()
+    for first in by_start:
+        if first in used:
+            continue
+
+        vertices = array('i')
+        key = first
+        while key not in used:
+            fragment = by_start.get(key)
+            if fragment is None:
+                raise _Unstitchable()
+            used.add(key)
+            _, key, part = fragment
+            # Consecutive fragments share the vertex where they meet.
+            vertices.extend(part[2:] if vertices else part)
+        if key != first:
+            raise _Unstitchable()
+
+        key, contour = _canonical(_hedges(vertices))
+        path = PathBuilder()
+        _write_contour(path, contour, grid)
+        stitched.append((key, path))
+    return stitched
+
+
+def _serial(layer: Layer) -> List[PathBuilder]:
+    paths = []
+    for contour in _trace_contours(_half_edges(layer)):
+        path = PathBuilder()
+        _write_contour(path, contour, layer.grid)
+        paths.append(path)
+    return paths
+
+
+def trace_routes(
+    layer: Layer, *, processes: Optional[int] = None,
+    bands: Optional[int] = None,
+) -> List[PathBuilder]:
+    """Traces the outline of every route in the layer using a pool of
+    `processes` workers, which defaults to the number of CPUs.  The layer is
+    cut into `bands` horizontal bands, by default a few per worker.
+
+    Returns one path per contour, identical to and in the same order as
+    those produced by the serial tracer.
+    """
+    if getattr(layer, 'trace_contours', None) is not None:
+        # Layers that trace themselves are not held in memory, so could not
+        # be shipped to workers anyway.
+        paths = []
+        for contour in _layer_contours(layer):
+            path = PathBuilder()
+            _write_contour(path, contour, layer.grid)
+            paths.append(path)
+        return paths
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if bands is None:
+        bands = 4 * processes
+    height = max(1, -(-layer.height // bands))
+
+    # Bucket the links by the band of the row they start on.
+    rows: Dict[int, Tuple[List[Coordinate2], List[Coordinate2]]] = {}
+    for link in layer.links():
+        horizontal = link.a.y == link.b.y
+        rows.setdefault(link.a.y, ([], []))[0 if horizontal else 1].append(
+            link.a,
+        )
+
+    tasks = []
+    for y0 in range(0, layer.height, height):
+        y1 = y0 + height
+        x_links = array('i')
+        y_links = array('i')
+        for y in range(y0 - _MARGIN, y1 + _MARGIN):
+            horizontal, vertical = rows.get(y, ((), ()))
+            for origin in horizontal:
+                x_links.extend(origin)
+            for origin in vertical:
+                y_links.extend(origin)
+        tasks.append((y0, y1, layer.grid, x_links, y_links))
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_trace_band, tasks))
+
+        contours = []
+        fragments = []
+        for closed, open_fragments in results:
+            contours.extend(closed)
+            fragments.extend(open_fragments)
+        contours.extend(_stitch(fragments, layer.grid))
+    except _Unstitchable:
+        return _serial(layer)
+
+    contours.sort(key=lambda contour: contour[0])
+    return [path for _, path in contours]
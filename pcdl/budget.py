@@ -0,0 +1,184 @@
+"""
+Choosing how to load and render a design so that it fits in a memory budget.
+
+The memory a render needs is estimated from the size of each frame and the
+number of pixels in it that are not transparent, both of which can be found
+without decoding the frames into Python objects.  The estimates are fitted to
+the peak resident memory of renders of large boards, which is more than the
+stages measured by `pcdl.memory.MemoryProfile` add up to, as memory freed by
+one stage cannot always be handed back for the next:
+
+* decoding a frame takes 8 bytes per pixel, or 13 for an RGBA frame plus
+  32 per opaque pixel;
+* each layer held in memory takes around 300 bytes per opaque pixel, and
+  each layer kept in chunks on disk around 13 bytes per pixel;
+* tracing the routes of a layer in memory needs another 500 bytes per
+  opaque pixel, mostly for the set of half edges, and tracing chunk by chunk
+  only the 160 or so of the finished document;
+* the document of a layer that is repeated later is held until its last
+  repeat has been written, as `render.py` does.
+
+Strategies are tried from fastest to leanest, and the first whose estimate
+fits is used.
+"""
+import collections
+import hashlib
+import os
+import pathlib
+from typing import Dict, List, Optional, Tuple
+
+import PIL.Image
+import PIL.ImageSequence
+
+from pcdl.config import Config
+from pcdl.load import _directory_paths, _open
+from pcdl.memory import _resident
+
+
+_PALETTE_PIXEL = 8
+_RGBA_PIXEL = 13
+_RGBA_OPAQUE = 32
+_LAYER = 300
+_TRACE = 500
+_STORED_PIXEL = 13
+_DOCUMENT = 160
+
+# Chunks kept mapped by each layer when moving layers to disk to save
+# memory.
+_BUDGET_CHUNKS = 4
+
+
+class MemoryBudgetError(Exception):
+    """Raised when no strategy is expected to fit in the budget."""
+    pass
+
+
+class MemoryPlan(object):
+    """How to load and render a design: the strategy chosen, the config and
+    number of decoding threads to use, and the peak memory expected.
+    """
+
+    def __init__(
+        self, strategy: str, *, config, workers: Optional[int], peak: int,
+    ):
+        self.strategy = strategy
+        self.config = config
+        self.workers = workers
+        self.peak = peak
+
+
+def _counts(image) -> Tuple[int, int, bool, bytes]:
+    # The number of pixels in a frame, how many of them are opaque, whether
+    # the frame will be decoded as RGBA, and a digest of its pixels so that
+    # repeated frames can be told apart.
+    width, height = image.size
+    digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+    transparency = image.info.get('transparency')
+    if image.mode == 'P' and isinstance(transparency, int):
+        return width * height, width * height - image.histogram()[
+            transparency
+        ], False, digest
+    alpha = image.convert('RGBA').getchannel('A')
+    return width * height, width * height - alpha.histogram()[0], True, digest
+
+
+def _frame_counts(
+    source, *, config,
+) -> Tuple[List[Tuple[int, int, bool, bytes]], bool]:
+    # Returns the counts for each frame, and whether the frames can be
+    # decoded in parallel, which all but GIFs can.
+    if hasattr(source, 'read'):
+        source = source.read()
+
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        path = pathlib.Path(source)
+        if path.is_dir():
+            counts = []
+            for frame_path in _directory_paths(path, config=config)[0]:
+                with PIL.Image.open(frame_path) as image:
+                    counts.append(_counts(image))
+            return counts, True
+        source = os.fspath(path)
+
+    with _open(source) as image:
+        frames = PIL.ImageSequence.Iterator(image)
+        counts = [
+            _counts(frame)
+            for frame, _ in zip(frames, config['layers'])
+        ]
+        return counts, image.format != 'GIF'
+
+
+def _frame_size(pixels, opaque, rgba) -> int:
+    if rgba:
+        return _RGBA_PIXEL * pixels + _RGBA_OPAQUE * opaque
+    return _PALETTE_PIXEL * pixels
+
+
+def _amount(size: int) -> str:
+    if abs(size) < 1e6:
+        return f"{size / 1e3:.1f}kB"
+    return f"{size / 1e6:.1f}MB"
+
+
+def plan_memory(
+    source, *, config, budget: int, workers: Optional[int] = None,
+) -> MemoryPlan:
+    """Picks the fastest way of rendering a design whose peak memory, on top
+    of what the process is already using, is expected to fit in `budget`
+    bytes.  Raises `MemoryBudgetError` with the smallest estimate if none do.
+    """
+    counts, parallel = _frame_counts(source, config=config)
+    if not counts:
+        raise MemoryBudgetError("design has no frames")
+    available = budget - _resident()
+
+    frames = [_frame_size(*frame[:3]) for frame in counts]
+    opaque = [frame[1] for frame in counts]
+    layers = sum(_LAYER * count for count in opaque)
+    tracing = max(_TRACE * count for count in opaque)
+    threads = min(workers or os.cpu_count() or 1, len(counts))
+
+    # Each document is written out as soon as it is rendered, except for
+    # those of layers that are repeated later, which are held until their
+    # last repeat has been written.
+    first: Dict[bytes, int] = {}
+    for frame, count in zip(counts, opaque):
+        first.setdefault(frame[3], count)
+    repeated = [
+        first[digest] for digest, number in collections.Counter(
+            frame[3] for frame in counts
+        ).items() if number > 1
+    ]
+    documents = max(_DOCUMENT * count for count in opaque) + sum(
+        _DOCUMENT * count for count in repeated
+    )
+
+    # Frames are decoded while earlier layers are built, and every layer is
+    # held while each is rendered in turn.  Layers already set to be kept on
+    # disk are left that way.  The frames of a GIF are always decoded one at
+    # a time, so there is no faster way of loading one to try.
+    plans = []
+    storage = config.get('storage')
+    if storage is None:
+        held = layers + tracing + documents
+        if parallel and threads > 1:
+            plans.append(('parallel', workers, threads * max(frames) + held))
+        plans.append(('serial', 1, max(frames) + held))
+        storage = {'max_chunks': _BUDGET_CHUNKS}
+
+    stored = sum(_STORED_PIXEL * frame[0] for frame in counts)
+    plans.append(('chunked', 1, max(frames) + stored + documents))
+
+    for strategy, decoders, peak in plans:
+        if peak <= available:
+            if strategy == 'chunked':
+                config = Config({**config, 'storage': storage})
+            return MemoryPlan(
+                strategy, config=config, workers=decoders, peak=peak,
+            )
+    raise MemoryBudgetError(
+        f"rendering needs about {_amount(peak)} even with layers kept on "
+        f"disk, but only {_amount(max(available, 0))} of the "
+        f"{_amount(budget)} budget is free"
+    )
@@ -0,0 +1,173 @@
+"""
+Checking of designs for problems before they are rendered.
+
+The checks look at the decoded frames directly, without building any layers,
+and keep going after the first problem so that everything wrong with a
+design can be fixed in one go.
+"""
+import pathlib
+from typing import List, Optional, Tuple
+
+import PIL.Image
+import PIL.ImageSequence
+
+from pcdl.load import (
+    _TIFF_SUFFIXES, _directory_paths, _open, _out_of_bounds, _pixels,
+)
+
+
+# Positions listed when a problem is formatted.  The rest are only counted.
+_SHOWN_POSITIONS = 8
+
+
+class Problem(object):
+    """Something about a design that would stop it from rendering, or make
+    it render differently to how it looks.
+    """
+
+    def __init__(
+        self, layer: Optional[str], message: str,
+        positions: Optional[List[Tuple[int, int]]] = None,
+    ):
+        self.layer = layer
+        self.message = message
+        self.positions = positions if positions is not None else []
+
+    def __str__(self):
+        text = self.message
+        if self.layer is not None:
+            text = f"{self.layer}: {text}"
+        if self.positions:
+            shown = ', '.join(
+                f"({x}, {y})"
+                for x, y in self.positions[:_SHOWN_POSITIONS]
+            )
+            text = f"{text} at {shown}"
+            hidden = len(self.positions) - _SHOWN_POSITIONS
+            if hidden > 0:
+                text = f"{text} and {hidden} more"
+        return text
+
+    def __repr__(self):
+        return f"Problem({self.layer!r}, {self.message!r})"
+
+
+def _source_frames(source, *, config):
+    # Returns every frame in the source, including any that no layer will
+    # use.
+    if hasattr(source, 'read'):
+        source = source.read()
+
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        path = pathlib.Path(source)
+        if path.is_dir():
+            paths, unused = _directory_paths(path, config=config)
+            frames = []
+            for frame_path in paths + unused:
+                with PIL.Image.open(frame_path) as image:
+                    image.load()
+                    frames.append(image)
+            return frames
+        if path.suffix.lower() not in _TIFF_SUFFIXES:
+            source = path.read_bytes()
+        else:
+            source = path
+
+    image = _open(source)
+    return [frame.copy() for frame in PIL.ImageSequence.Iterator(image)]
+
+
+def _check_frame(image, name: str, *, config, first) -> List[Problem]:
+    problems = []
+    width, height = image.size
+
+    if first is not None and image.size != first.size:
+        problems.append(Problem(
+            name, f"frame is {width}x{height} pixels but the first frame is "
+            f"{first.size[0]}x{first.size[1]}",
+        ))
+
+    transparency = image.info.get('transparency')
+    if image.mode == 'P' and not isinstance(transparency, int):
+        problems.append(Problem(name, "frame has no transparent colour"))
+        return problems
+    if (
+        first is not None and image.mode == 'P' and first.mode == 'P' and
+        transparency != first.info.get('transparency')
+    ):
+        problems.append(Problem(
+            name, f"transparent index {transparency} differs from "
+            f"{first.info.get('transparency')} in the first frame",
+        ))
+
+    pixels = _pixels(image)
+
+    # Only the edges of the board can be out of bounds, so only they are
+    # looked at.
+    edges = set()
+    for x in range(1, width):
+        for y in (0, 1, height - 1):
+            edges.add((x, y))
+    for y in range(height):
+        for x in (1, width - 1):
+            edges.add((x, y))
+    outside = sorted((
+        (x, y) for x, y in edges
+        if 0 <= y < height and pixels[y * width + x] is not None and
+        _out_of_bounds(x, y, width, height)
+    ), key=lambda position: (position[1], position[0]))
+    if outside:
+        problems.append(Problem(
+            name, "pixels too close to the edge of the board", outside,
+        ))
+
+    legend = {
+        pixels[y * width]
+        for y in range(min(len(config['channels']), height))
+    }
+    colours = set()
+    for y in range(height):
+        colours.update(pixels[y * width + 1:(y + 1) * width])
+    unknown = colours - legend - {None}
+    if unknown:
+        positions = [
+            (offset % width, offset // width)
+            for offset, colour in enumerate(pixels)
+            if colour in unknown and offset % width
+        ]
+        problems.append(Problem(
+            name, f"{len(unknown)} colours not in the channel legend",
+            positions,
+        ))
+    return problems
+
+
+def check_design(source, *, config) -> List[Problem]:
+    """Checks a design for problems, taking the same sources as
+    `pcdl.load.load_design`.  Returns every problem found, in order of layer.
+    """
+    frames = _source_frames(source, config=config)
+    layers = config['layers']
+
+    problems = []
+    first = None
+    for index, image in enumerate(frames):
+        if index < len(layers):
+            name = layers[index].get('name', f"unknown{index + 1}")
+        else:
+            name = f"frame {index}"
+        problems.extend(_check_frame(image, name, config=config, first=first))
+        if first is None:
+            first = image
+
+    if len(frames) > len(layers):
+        problems.append(Problem(
+            None, f"design has {len(frames)} frames but only {len(layers)} "
+            f"layers are configured",
+        ))
+    for index in range(len(frames), len(layers)):
+        problems.append(Problem(
+            layers[index].get('name', f"unknown{index + 1}"),
+            "layer has no frame",
+        ))
+    return problems
@@ -0,0 +1,491 @@
+"""
+Out of core storage for layers that are too large to hold in memory.
+
+The board is split into square chunks of cells.  Each cell takes four bytes:
+a set of flags for the hole and the two links it owns, and an index into a
+table of radii for each of them.  Chunks live in a sparse scratch file and
+are mapped into memory on demand, with only the most recently used chunks
+kept mapped, so resident memory is bounded by the chunk size and the number
+of chunks kept rather than by the size of the board.
+
+Features are visited chunk by chunk.  Contours and holes are ordered by x
+before y, so the chunks of each column of the board are merged as they are
+visited, which gives the same order as the in memory renderer while only
+ever working on one column of chunks.  Contours are traced exactly as the in
+memory tracer does, from the smallest half edge not yet visited, following
+them across chunk boundaries as far as necessary.  Which half edges have been
+visited is marked in spare bits of the cells holding their links, so that
+it too stays on disk.
+"""
+import collections
+import heapq
+import mmap
+import re
+import tempfile
+from typing import Dict, Iterator, List, Optional
+
+from pcdl.grid import Coordinate2
+from pcdl.index import SpatialIndex
+from pcdl.layers import _Hole, _Link
+from pcdl.svg import _HalfEdge, _hedge_key, _next_edge
+
+
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_MAX_CHUNKS = 64
+
+_CELL_SIZE = 4
+
+_HOLE = 1
+_X_LINK = 2
+_Y_LINK = 4
+
+# Set on the cell holding a link once the half edge running along it in
+# either direction has been traced.
+_X_FORWARD = 8
+_X_BACKWARD = 16
+_Y_FORWARD = 32
+_Y_BACKWARD = 64
+_VISITED = _X_FORWARD | _X_BACKWARD | _Y_FORWARD | _Y_BACKWARD
+
+_NONZERO = re.compile(b'[^\x00]')
+
+
+def _mask(flag):
+    return bytes(1 if value & flag else 0 for value in range(256))
+
+
+_HOLE_MASK = _mask(_HOLE)
+_X_LINK_MASK = _mask(_X_LINK)
+_Y_LINK_MASK = _mask(_Y_LINK)
+_UNVISITED = bytes(value & ~_VISITED for value in range(256))
+
+
+class _ChunkStore(object):
+    """Fixed size blocks of a scratch file, mapped on demand and unmapped
+    again once `capacity` other blocks have been used more recently.
+    """
+
+    def __init__(
+        self, size: int, count: int, *,
+        capacity: int, directory: Optional[str] = None,
+    ):
+        if capacity < 2:
+            raise ValueError("at least two chunks must be kept in memory")
+
+        # Mappings have to start on a multiple of the allocation granularity.
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.size = size
+        self.stride = -(-size // granularity) * granularity
+        self.capacity = capacity
+
+        self._file = tempfile.TemporaryFile(dir=directory)
+        # Extending the file leaves a hole, so chunks that are never written
+        # take no space on disk.
+        self._file.truncate(self.stride * count)
+
+        self._mapped: collections.OrderedDict = collections.OrderedDict()
+
+    def get(self, chunk: int) -> mmap.mmap:
+        block = self._mapped.get(chunk)
+        if block is not None:
+            self._mapped.move_to_end(chunk)
+            return block
+
+        block = mmap.mmap(
+            self._file.fileno(), self.size, offset=chunk * self.stride,
+        )
+        self._mapped[chunk] = block
+        while len(self._mapped) > self.capacity:
+            _, evicted = self._mapped.popitem(last=False)
+            evicted.close()
+        return block
+
+    def resident(self) -> int:
+        """Returns the number of chunks currently mapped."""
+        return len(self._mapped)
+
+    def close(self) -> None:
+        for block in self._mapped.values():
+            block.close()
+        self._mapped.clear()
+        self._file.close()
+
+
+class _HalfEdgeView(object):
+    # Stands in for the set of half edges built by `svg._half_edges`, working
+    # out membership from the stored links instead.
+
+    def __init__(self, layer: 'ChunkedLayer'):
+        self._layer = layer
+
+    def __contains__(self, hedge: _HalfEdge) -> bool:
+        src, tgt = hedge.src, hedge.tgt
+        if not self._layer._linked(src, tgt):
+            return False
+        # Half edges that back onto the half edge of a parallel link are
+        # dropped in pairs, just as in `svg._half_edges`.  That half edge
+        # runs the other way along the link one step to the left.
+        dx, dy = src.y - tgt.y, tgt.x - src.x
+        return not self._layer._linked(
+            Coordinate2(src.x + dx, src.y + dy),
+            Coordinate2(tgt.x + dx, tgt.y + dy),
+        )
+
+
+class ChunkedLayer(object):
+    """A layer with the same interface as `pcdl.layers.Layer` but with its
+    features kept in a memory mapped scratch file.
+
+    Unlike `Layer`, every feature must lie within the bounds of the layer,
+    and at most 255 different radii can be used.
+    """
+
+    def __init__(
+        self, *, name: str,
+        grid: float = 3.0, width: int, height: int,
+        material: str = 'acrylic', thickness: float = 2.0,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_chunks: int = DEFAULT_MAX_CHUNKS,
+        directory: Optional[str] = None,
+    ):
+        self.name = name
+        self.material = material
+        self.thickness = thickness
+
+        self.grid = grid
+        self.width = width
+        self.height = height
+
+        self.chunk_size = chunk_size
+        self._columns = -(-width // chunk_size)
+        self._rows = -(-height // chunk_size)
+
+        self._store = _ChunkStore(
+            chunk_size * chunk_size * _CELL_SIZE, self._columns * self._rows,
+            capacity=max_chunks, directory=directory,
+        )
+        # Chunks that have ever been written to.  The rest are all zeroes
+        # and never need to be read.
+        self._occupied = bytearray(self._columns * self._rows)
+
+        # Index zero means no radius was given.
+        self._radii: List[Optional[float]] = [None]
+        self._radius_indexes: Dict[float, int] = {}
+
+        self._index: Optional[SpatialIndex] = None
+        # Whether any half edges may have been marked as visited.
+        self._marked = False
+
+    def close(self) -> None:
+        self._store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _locate(self, x: int, y: int):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"({x}, {y}) is outside of the layer")
+        size = self.chunk_size
+        chunk = (y // size) * self._columns + x // size
+        offset = ((y % size) * size + x % size) * _CELL_SIZE
+        return chunk, offset
+
+    def _read(self, x: int, y: int, field: int = 0) -> int:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return 0
+        chunk, offset = self._locate(x, y)
+        if not self._occupied[chunk]:
+            return 0
+        return self._store.get(chunk)[offset + field]
+
+    def _write(self, position, flag: int, field: int, radius) -> bool:
+        chunk, offset = self._locate(position.x, position.y)
+        block = self._store.get(chunk)
+        self._occupied[chunk] = 1
+
+        new = not block[offset] & flag
+        block[offset] |= flag
+        # As with `Layer`, relinking without a radius keeps the old one.
+        if radius is not None or flag == _HOLE:
+            block[offset + field] = self._radius_index(radius)
+        return new
+
+    def _radius_index(self, radius: Optional[float]) -> int:
+        if radius is None:
+            return 0
+        index = self._radius_indexes.get(radius)
+        if index is None:
+            if len(self._radii) > 255:
+                raise ValueError("too many different radii")
+            index = len(self._radii)
+            self._radii.append(radius)
+            self._radius_indexes[radius] = index
+        return index
+
+    def add_hole(self, position: Coordinate2, radius):
+        if self._write(position, _HOLE, 1, radius):
+            if self._index is not None:
+                self._index.insert_hole(position)
+        return _Hole(self, position, radius=radius)
+
+    def hole_radius(self, position: Coordinate2) -> float:
+        if not self._read(position.x, position.y) & _HOLE:
+            raise KeyError(position)
+        radius = self._radii[self._read(position.x, position.y, 1)]
+        # Only links can be added without a radius.
+        assert radius is not None
+        return radius
+
+    def add_link(
+        self, a: Coordinate2, b: Coordinate2, *,
+        radius: Optional[float] = None,
+    ):
+        """Adds a single step, horizontal or vertical link between two, drilled
+        holes.
+        """
+        if a.x == b.x:
+            if abs(b.y - a.y) != 1:
+                raise ValueError("Can only link adjacent nodes")
+            origin = Coordinate2(a.x, min(a.y, b.y))
+            flag, field = _Y_LINK, 3
+        elif a.y == b.y:
+            if abs(b.x - a.x) != 1:
+                raise ValueError("Can only link adjacent nodes")
+            origin = Coordinate2(min(a.x, b.x), a.y)
+            flag, field = _X_LINK, 2
+        else:
+            raise ValueError("Links must be either horizontal or vertical")
+
+        # Both ends have to be on the board.
+        self._locate(max(a.x, b.x), max(a.y, b.y))
+        if self._write(origin, flag, field, radius):
+            if self._index is not None:
+                self._index.insert_link(a, b)
+
+    def _linked(self, a: Coordinate2, b: Coordinate2) -> bool:
+        if a.x == b.x:
+            return bool(self._read(a.x, min(a.y, b.y)) & _Y_LINK)
+        return bool(self._read(min(a.x, b.x), a.y) & _X_LINK)
+
+    def chunks(self) -> Iterator[int]:
+        """Yields the numbers of the chunks that hold any features, in row
+        major order.
+        """
+        for chunk, occupied in enumerate(self._occupied):
+            if occupied:
+                yield chunk
+
+    def _origin(self, chunk: int):
+        return (
+            (chunk % self._columns) * self.chunk_size,
+            (chunk // self._columns) * self.chunk_size,
+        )
+
+    def _scan(self, chunk: int, mask: bytes) -> Iterator[Coordinate2]:
+        # Finds the cells of a chunk with a flag set without looping over
+        # every cell in Python.
+        if not self._occupied[chunk]:
+            return
+        x0, y0 = self._origin(chunk)
+        size = self.chunk_size
+        flags = self._store.get(chunk)[0::_CELL_SIZE].translate(mask)
+        for match in _NONZERO.finditer(flags):
+            y, x = divmod(match.start(), size)
+            yield Coordinate2(x0 + x, y0 + y)
+
+    def holes(self):
+        for chunk in self.chunks():
+            for position in list(self._scan(chunk, _HOLE_MASK)):
+                yield _Hole(
+                    self, position, radius=self.hole_radius(position),
+                )
+
+    def _chunk_columns(self, chunks) -> Iterator[List[int]]:
+        # Groups chunks into the columns of the board, from left to right.
+        columns = collections.defaultdict(list)
+        for chunk in sorted(chunks):
+            columns[chunk % self._columns].append(chunk)
+        for column in sorted(columns):
+            yield columns[column]
+
+    def _chunk_holes(self, chunk: int):
+        holes = list(self._scan(chunk, _HOLE_MASK))
+        holes.sort(key=tuple)
+        for position in holes:
+            yield _Hole(self, position, radius=self.hole_radius(position))
+
+    def ordered_holes(self):
+        """Yields holes in the same order as the SVG renderer sorts the holes
+        of a whole layer, working through one column of chunks at a time.
+        """
+        for column in self._chunk_columns(self.chunks()):
+            yield from heapq.merge(
+                *(self._chunk_holes(chunk) for chunk in column),
+                key=lambda hole: tuple(hole.position),
+            )
+
+    def links(self):
+        for chunk in self.chunks():
+            for origin in list(self._scan(chunk, _X_LINK_MASK)):
+                yield _Link(
+                    self, origin, Coordinate2(origin.x + 1, origin.y),
+                    radius=self._radii[self._read(origin.x, origin.y, 2)],
+                )
+            for origin in list(self._scan(chunk, _Y_LINK_MASK)):
+                yield _Link(
+                    self, origin, Coordinate2(origin.x, origin.y + 1),
+                    radius=self._radii[self._read(origin.x, origin.y, 3)],
+                )
+
+    def index(self) -> SpatialIndex:
+        """Returns a spatial index over the holes and links in this layer.
+
+        Note that the index itself is held in memory.
+        """
+        if self._index is None:
+            self._index = SpatialIndex(self)
+        return self._index
+
+    def cells(self):
+        """Returns the set of all nodes that are either drilled or linked to
+        another node.
+        """
+        cells = set()
+        for hole in self.holes():
+            cells.add(hole.position)
+        for link in self.links():
+            cells.add(link.a)
+            cells.add(link.b)
+        return cells
+
+    def neighbours(self, pos):
+        """Returns an iterator over all coordinates adjacent to a point.
+
+        These do not have to be linked.
+        """
+        x, y = pos
+        return {
+            Coordinate2(x - 1, y),
+            Coordinate2(x, y - 1),
+            Coordinate2(x + 1, y),
+            Coordinate2(x, y + 1),
+        }
+
+    def connected(self, pos):
+        """Returns an iterator over all of the points that are connected to the
+        origin by a link.
+        """
+        connected = set()
+        x, y = pos
+        if self._read(x - 1, y) & _X_LINK:
+            connected.add(Coordinate2(x - 1, y))
+        if self._read(x, y - 1) & _Y_LINK:
+            connected.add(Coordinate2(x, y - 1))
+        flags = self._read(x, y)
+        if flags & _X_LINK:
+            connected.add(Coordinate2(x + 1, y))
+        if flags & _Y_LINK:
+            connected.add(Coordinate2(x, y + 1))
+        return connected
+
+    def _chunk_half_edges(self, chunk: int, hedges) -> List[_HalfEdge]:
+        # Every half edge leaving a cell in the chunk.  Links owned by the
+        # chunks to the left and above can lead out of this one.
+        x0, y0 = self._origin(chunk)
+        x1 = min(x0 + self.chunk_size, self.width)
+        y1 = min(y0 + self.chunk_size, self.height)
+
+        candidates = []
+        for a in self._scan(chunk, _X_LINK_MASK):
+            b = Coordinate2(a.x + 1, a.y)
+            candidates.append(_HalfEdge(a, b))
+            if b.x < x1:
+                candidates.append(_HalfEdge(b, a))
+        for a in self._scan(chunk, _Y_LINK_MASK):
+            b = Coordinate2(a.x, a.y + 1)
+            candidates.append(_HalfEdge(a, b))
+            if b.y < y1:
+                candidates.append(_HalfEdge(b, a))
+        for y in range(y0, y1):
+            if self._read(x0 - 1, y) & _X_LINK:
+                candidates.append(_HalfEdge(
+                    Coordinate2(x0, y), Coordinate2(x0 - 1, y),
+                ))
+        for x in range(x0, x1):
+            if self._read(x, y0 - 1) & _Y_LINK:
+                candidates.append(_HalfEdge(
+                    Coordinate2(x, y0), Coordinate2(x, y0 - 1),
+                ))
+
+        candidates = [hedge for hedge in candidates if hedge in hedges]
+        candidates.sort(key=_hedge_key)
+        return candidates
+
+    def _visit(self, hedge: _HalfEdge) -> bool:
+        # Marks a half edge as visited, and returns whether it already was.
+        src, tgt = hedge.src, hedge.tgt
+        if src.y == tgt.y:
+            x, y = min(src.x, tgt.x), src.y
+            flag = _X_FORWARD if src.x < tgt.x else _X_BACKWARD
+        else:
+            x, y = src.x, min(src.y, tgt.y)
+            flag = _Y_FORWARD if src.y < tgt.y else _Y_BACKWARD
+        chunk, offset = self._locate(x, y)
+        block = self._store.get(chunk)
+        if block[offset] & flag:
+            return True
+        block[offset] |= flag
+        return False
+
+    def _clear_visited(self) -> None:
+        for chunk in self.chunks():
+            block = self._store.get(chunk)
+            block[0::_CELL_SIZE] = block[0::_CELL_SIZE].translate(_UNVISITED)
+
+    def trace_contours(self):
+        """Splits the outline of the routes into contours, in the same form
+        and order as `svg._trace_contours`, but working through the board a
+        column of chunks at a time.
+
+        The half edges of the chunks in each column are merged into order,
+        and a contour is traced from each one not already visited, just as
+        the in memory tracer does, so every half edge is followed only once.
+        Tracing marks the cells of the layer, so a layer must not be traced
+        by two threads at once.
+        """
+        if self._marked:
+            self._clear_visited()
+        self._marked = True
+
+        hedges = _HalfEdgeView(self)
+        chunks = list(self.chunks())
+        # Chunks to the right of and below occupied chunks can own half edges
+        # that lead back out of them.
+        owners = set(chunks)
+        for chunk in chunks:
+            if (chunk + 1) % self._columns:
+                owners.add(chunk + 1)
+            if chunk + self._columns < len(self._occupied):
+                owners.add(chunk + self._columns)
+
+        for column in self._chunk_columns(owners):
+            for start in heapq.merge(
+                *(self._chunk_half_edges(chunk, hedges) for chunk in column),
+                key=_hedge_key,
+            ):
+                if self._visit(start):
+                    continue
+
+                contour = [start]
+                hedge = _next_edge(hedges, start)
+                while hedge is not None and not self._visit(hedge):
+                    contour.append(hedge)
+                    hedge = _next_edge(hedges, hedge)
+
+                if hedge == start:
+                    contour.append(start)
+
+                yield contour
@@ -0,0 +1,197 @@
+"""
+Common line cutting.
+
+Where the cut paths of neighbouring parts run along the same line, cutting
+both would trace the shared stretch twice.  Straight segments are bucketed by
+the line they lie on, with coordinates snapped to a fine grid so that
+coincident segments hash together.  Each stretch of a line is then cut only
+by the first segment to cover it, and later segments are trimmed to what is
+left.  Every edge is still cut once, so every enclosed region is still cut
+free.  Lines that are merely close together are left alone, as merging them
+would change the size of the parts.
+"""
+import math
+from typing import Dict, List, Tuple
+
+from pcdl.path import ARC, CLOSE, CUBIC, LINE, MOVE, QUADRATIC, PathBuilder
+
+
+DEFAULT_TOLERANCE = 1e-6
+
+
+class CommonLines(object):
+    """The result of merging shared edges between a list of paths."""
+
+    def __init__(
+        self, paths: List[PathBuilder], *,
+        length_before: float, length_after: float,
+    ):
+        self.paths = paths
+        self.length_before = length_before
+        self.length_after = length_after
+
+    @property
+    def saving(self) -> float:
+        """Cut length saved, in the units of the paths."""
+        return self.length_before - self.length_after
+
+
+def _line(ax, ay, bx, by, tolerance):
+    # Identifies the infinite line through a segment by its snapped unit
+    # direction and offset from the origin, and gives the positions of the
+    # ends of the segment along it.
+    length = math.hypot(bx - ax, by - ay)
+    dx = (bx - ax) / length
+    dy = (by - ay) / length
+    if round(dx / tolerance) < 0 or (
+        round(dx / tolerance) == 0 and round(dy / tolerance) < 0
+    ):
+        dx, dy = -dx, -dy
+    key = (
+        round(dx / tolerance), round(dy / tolerance),
+        round((dx * ay - dy * ax) / tolerance),
+    )
+    return key, dx * ax + dy * ay, dx * bx + dy * by
+
+
+def _subtract(t0, t1, covered, tolerance):
+    # Returns the parts of the interval from `t0` to `t1` not in the sorted
+    # list of disjoint `covered` intervals.
+    remaining = []
+    for c0, c1 in covered:
+        if c1 <= t0 or c0 >= t1:
+            continue
+        if c0 - t0 > tolerance:
+            remaining.append((t0, c0))
+        t0 = max(t0, c1)
+    if t1 - t0 > tolerance:
+        remaining.append((t0, t1))
+    return remaining
+
+
+def _cover(t0, t1, covered):
+    merged = []
+    for c0, c1 in sorted(covered + [(t0, t1)]):
+        if merged and c0 <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], c1))
+        else:
+            merged.append((c0, c1))
+    return merged
+
+
+def _trim(paths, tolerance):
+    # Finds the parts of each straight segment still to be cut, for those
+    # segments that share their line with another.  Keyed by the index of the
+    # path and of the segment within it.
+    lines: Dict[tuple, List[tuple]] = {}
+    for i, path in enumerate(paths):
+        for k, (code, args) in enumerate(path.segments()):
+            if code not in (LINE, CLOSE):
+                continue
+            ax, ay, bx, by = args
+            if math.hypot(bx - ax, by - ay) <= tolerance:
+                continue
+            key, t0, t1 = _line(ax, ay, bx, by, tolerance)
+            lines.setdefault(key, []).append((i, k, t0, t1))
+
+    # Each entry gives the start and end of every piece left, as fractions of
+    # the way along the segment.
+    trimmed: Dict[Tuple[int, int], List[float]] = {}
+    for segments in lines.values():
+        if len(segments) < 2:
+            continue
+        covered: List[Tuple[float, float]] = []
+        for i, k, t0, t1 in segments:
+            lo, hi = min(t0, t1), max(t0, t1)
+            remaining = _subtract(lo, hi, covered, tolerance)
+            if remaining != [(lo, hi)]:
+                if t1 < t0:
+                    remaining = [(b, a) for a, b in reversed(remaining)]
+                trimmed[i, k] = [
+                    (a - t0) / (t1 - t0) for piece in remaining for a in piece
+                ]
+            covered = _cover(lo, hi, covered)
+    return trimmed
+
+
+def _rebuild(path: PathBuilder, trimmed, tolerance) -> PathBuilder:
+    result = PathBuilder()
+
+    # Moves are only written once something is drawn from them, so dropped
+    # segments do not leave moves behind.  Once part of a contour has been
+    # dropped it can no longer be closed by returning to its start.
+    x = y = 0.0
+    drawing = False
+    broken = False
+
+    def start_at(px, py):
+        nonlocal drawing
+        if not (
+            drawing and
+            abs(px - x) <= tolerance and abs(py - y) <= tolerance
+        ):
+            result.move_to(px, py)
+            drawing = True
+
+    for k, (code, args) in enumerate(path.segments()):
+        if code == MOVE:
+            x, y = args[2:]
+            drawing = False
+            broken = False
+            continue
+
+        ax, ay = args[:2]
+        if code in (LINE, CLOSE) and k in trimmed:
+            bx, by = args[2:4]
+            fractions = trimmed[k]
+            for s0, s1 in zip(fractions[0::2], fractions[1::2]):
+                start_at(ax + (bx - ax) * s0, ay + (by - ay) * s0)
+                x, y = ax + (bx - ax) * s1, ay + (by - ay) * s1
+                result.line_to(x, y)
+            broken = True
+            continue
+
+        start_at(ax, ay)
+
+        if code == CLOSE:
+            if broken:
+                result.line_to(*args[2:])
+            else:
+                result.close_path()
+        elif code == LINE:
+            result.line_to(*args[2:])
+        elif code == QUADRATIC:
+            result.quadratic_to(*args[2:])
+        elif code == CUBIC:
+            result.cubic_to(*args[2:])
+        elif code == ARC:
+            px, py, r, large, sweep = args[2:]
+            result.arc_to(
+                px, py, rx=r, ry=r, large=bool(large), clockwise=not sweep,
+            )
+        x, y = args[2:4] if code == ARC else args[-2:]
+    return result
+
+
+def merge_common_lines(
+    paths: List[PathBuilder], *, tolerance: float = DEFAULT_TOLERANCE,
+) -> CommonLines:
+    """Trims every straight stretch already cut by an earlier path, or an
+    earlier segment of the same path, so that it is only cut once.
+
+    Paths are returned in the same order.  Trimmed contours may no longer be
+    closed and may be split into several strokes.
+    """
+    trimmed: Dict[int, Dict[int, List[float]]] = {}
+    for (i, k), fractions in _trim(paths, tolerance).items():
+        trimmed.setdefault(i, {})[k] = fractions
+
+    merged = [
+        _rebuild(path, trimmed[i], tolerance) if i in trimmed else path
+        for i, path in enumerate(paths)
+    ]
+    return CommonLines(
+        merged,
+        length_before=sum(path.length() for path in paths),
+        length_after=sum(path.length() for path in merged),
+    )
@@ -0,0 +1,61 @@
+"""
+Immutable, parsed configuration.
+
+A config is parsed once and can then be shared freely, including between
+threads rendering different designs at the same time.  Tables become nested
+`Config` objects and arrays become tuples, so nothing reachable from a config
+can be modified after it is built.
+"""
+import collections.abc
+from typing import Any, Mapping
+
+import toml
+
+
+def _freeze(value):
+    if isinstance(value, collections.abc.Mapping):
+        return Config(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class Config(collections.abc.Mapping):
+    """A read only view of a parsed config.
+
+    Behaves like the dictionary returned by `toml.load`, so can be passed
+    anywhere a config is accepted.
+    """
+    __slots__ = ('_values',)
+    _values: Mapping[str, Any]
+
+    def __init__(self, values=()):
+        object.__setattr__(self, '_values', {
+            key: _freeze(value) for key, value in dict(values).items()
+        })
+
+    @classmethod
+    def parse(cls, text: str) -> 'Config':
+        return cls(toml.loads(text))
+
+    @classmethod
+    def load(cls, file) -> 'Config':
+        return cls(toml.load(file))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("config is immutable")
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __reduce__(self):
+        return (Config, (self._values,))
+
+    def __repr__(self):
+        return f"Config({self._values!r})"
@@ -0,0 +1,186 @@
+"""
+Comparison of two revisions of a layer stack.
+
+Layers are compared by their features rather than by their rendered output,
+and only the features that changed are traced when drawing an overlay.
+"""
+import xml.etree.ElementTree
+from typing import Dict, List, Optional, Set, Tuple
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.sets import DisjointSet
+from pcdl.svg import _isolated_holes, _route_paths
+
+
+_Link = Tuple[Coordinate2, Coordinate2, Optional[float]]
+
+
+class LayerDiff(object):
+
+    def __init__(self, old: Layer, new: Layer):
+        self.old = old
+        self.new = new
+
+        old_holes = {(hole.position, hole.radius) for hole in old.holes()}
+        new_holes = {(hole.position, hole.radius) for hole in new.holes()}
+        self.added_holes: Set[Tuple[Coordinate2, float]] = (
+            new_holes - old_holes
+        )
+        self.removed_holes: Set[Tuple[Coordinate2, float]] = (
+            old_holes - new_holes
+        )
+
+        # Links are compared with their radius, so that widening a channel
+        # shows up as its links being removed and added again.
+        old_links = {(link.a, link.b, link.radius) for link in old.links()}
+        new_links = {(link.a, link.b, link.radius) for link in new.links()}
+        self.added_links: Set[_Link] = new_links - old_links
+        self.removed_links: Set[_Link] = old_links - new_links
+
+    @property
+    def name(self):
+        return self.new.name
+
+    def __bool__(self):
+        return bool(
+            self.added_holes or self.removed_holes or
+            self.added_links or self.removed_links
+        )
+
+    def cells(self) -> Set[Coordinate2]:
+        """Returns every node touched by a change."""
+        cells = set()
+        for position, _ in self.added_holes | self.removed_holes:
+            cells.add(position)
+        for a, b, _ in self.added_links | self.removed_links:
+            cells.add(a)
+            cells.add(b)
+        return cells
+
+    def regions(self, *, margin: int = 2) -> List[Tuple[int, int, int, int]]:
+        """Groups changed nodes that are within `margin` steps of each other
+        and returns the inclusive bounding box of each group as `(x0, y0, x1,
+        y1)`, sorted by position.
+        """
+        cells = self.cells()
+
+        groups = DisjointSet()
+        for cell in cells:
+            groups.add(cell)
+
+        # Bucket the cells so that each only needs to be compared against the
+        # cells in neighbouring buckets.
+        size = margin + 1
+        buckets: Dict[Tuple[int, int], List[Coordinate2]] = {}
+        for cell in cells:
+            buckets.setdefault((cell.x // size, cell.y // size), []).append(
+                cell,
+            )
+        for (bx, by), members in buckets.items():
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for other in buckets.get((bx + dx, by + dy), ()):
+                        for cell in members:
+                            if (
+                                abs(cell.x - other.x) <= margin and
+                                abs(cell.y - other.y) <= margin
+                            ):
+                                groups.union(cell, other)
+
+        regions = []
+        for group in groups.groups():
+            regions.append((
+                min(cell.x for cell in group),
+                min(cell.y for cell in group),
+                max(cell.x for cell in group),
+                max(cell.y for cell in group),
+            ))
+        return sorted(regions)
+
+
+def diff_stacks(old: List[Layer], new: List[Layer]) -> List[LayerDiff]:
+    if len(old) != len(new):
+        raise ValueError(
+            f"stacks have different numbers of layers "
+            f"({len(old)} and {len(new)})"
+        )
+    return [LayerDiff(a, b) for a, b in zip(old, new)]
+
+
+def format_report(diffs: List[LayerDiff]) -> str:
+    lines = []
+    for diff in diffs:
+        if not diff:
+            lines.append(f"{diff.name}: unchanged")
+            continue
+
+        lines.append(
+            f"{diff.name}: "
+            f"+{len(diff.added_holes)} -{len(diff.removed_holes)} holes, "
+            f"+{len(diff.added_links)} -{len(diff.removed_links)} links"
+        )
+        for x0, y0, x1, y1 in diff.regions():
+            lines.append(f"  ({x0}, {y0}) to ({x1}, {y1})")
+    return '\n'.join(lines)
+
+
+def _partial_layer(layer: Layer, holes, links) -> Layer:
+    partial = Layer(
+        name=layer.name, grid=layer.grid,
+        width=layer.width, height=layer.height,
+    )
+    for position, radius in holes:
+        partial.add_hole(position, radius=radius)
+    for a, b, radius in links:
+        partial.add_link(a, b, radius=radius)
+    return partial
+
+
+def _render_changes(svg, layer: Layer, colour: str) -> None:
+    svg.start("g", {"stroke": colour, "stroke-width": "0.25", "fill": "none"})
+    path = ' '.join(_route_paths(layer))
+    if path:
+        svg.start("path", {"d": path})
+        svg.end("path")
+    for x, y, r in _isolated_holes(layer):
+        svg.start("circle", {"cx": str(x), "cy": str(y), "r": str(r)})
+        svg.end("circle")
+    svg.end("g")
+
+
+def render_diff(diffs: List[LayerDiff], output) -> None:
+    """Renders an SVG containing only the contours that changed.  Removed
+    features are drawn in red and added features in green.
+    """
+    layer = diffs[0].new
+    width = layer.width * layer.grid
+    height = layer.height * layer.grid
+
+    svg = xml.etree.ElementTree.TreeBuilder()
+    svg.start("svg", {
+        "version": "1.1",
+        "baseProfile": "full",
+        "width": f"{width}mm",
+        "height": f"{height}mm",
+        "viewBox": f"0 0 {width} {height}",
+        "xmlns": "http://www.w3.org/2000/svg",
+    })
+
+    for diff in diffs:
+        if not diff:
+            continue
+        svg.start("g", {"id": diff.name})
+        _render_changes(svg, _partial_layer(
+            diff.old, diff.removed_holes, diff.removed_links,
+        ), "red")
+        _render_changes(svg, _partial_layer(
+            diff.new, diff.added_holes, diff.added_links,
+        ), "green")
+        svg.end("g")
+
+    svg.end("svg")
+    element = svg.close()
+    element_tree = xml.etree.ElementTree.ElementTree(element)
+
+    element_tree.write(output)
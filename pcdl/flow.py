@@ -0,0 +1,368 @@
+"""
+Solvers for the pressure and flow of air through the channels of a layer.
+
+Every drilled or linked node of a layer becomes a node in a resistor network.
+Channels are cut all of the way through their layer, so each link is modelled
+as a rectangular duct as wide as the channel, as deep as the layer is thick,
+and as long as the grid pitch.  Channel radiuses are given in grid units, as
+for rendering, and everything else is in SI units.  Pressures are gauge
+pressures.
+"""
+import collections
+import math
+import operator
+from array import array
+from typing import Dict, List, Tuple
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.svg import RADIUS
+
+
+AIR_VISCOSITY = 1.81e-5  # Pa s
+ATMOSPHERIC_PRESSURE = 101325.0  # Pa
+
+
+class FlowError(Exception):
+    pass
+
+
+def _duct_conductance(
+    width: float, depth: float, length: float, viscosity: float,
+) -> float:
+    # Approximation for laminar flow through a rectangular duct, accurate to
+    # within a few percent for all aspect ratios.
+    a = max(width, depth)
+    b = min(width, depth)
+    return a * b ** 3 * (1 - 0.63 * b / a) / (12 * viscosity * length)
+
+
+class Network(object):
+    """The conductance graph of a single layer.
+
+    Nodes are numbered in sorted order of position.
+    """
+
+    def __init__(self, layer: Layer, *, viscosity: float = AIR_VISCOSITY):
+        self.layer = layer
+        self.nodes: List[Coordinate2] = sorted(layer.cells(), key=tuple)
+        self._index = {node: index for index, node in enumerate(self.nodes)}
+
+        depth = layer.thickness * 1e-3
+        length = layer.grid * 1e-3
+
+        # Neighbours of each node and the conductance of the link to them.
+        self.adjacent: List[List[Tuple[int, float]]] = [
+            [] for _ in self.nodes
+        ]
+        self.volume = array('d', [0.0]) * len(self.nodes)
+
+        for link in layer.links():
+            radius = RADIUS if link.radius is None else link.radius
+            width = 2 * radius * layer.grid * 1e-3
+
+            a = self._index[link.a]
+            b = self._index[link.b]
+            conductance = _duct_conductance(width, depth, length, viscosity)
+            self.adjacent[a].append((b, conductance))
+            self.adjacent[b].append((a, conductance))
+
+            self.volume[a] += width * depth * length / 2
+            self.volume[b] += width * depth * length / 2
+
+        for hole in layer.holes():
+            index = self._index[hole.position]
+            if not self.adjacent[index]:
+                radius = hole.radius * layer.grid * 1e-3
+                self.volume[index] = math.pi * radius ** 2 * depth
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def index(self, position: Coordinate2) -> int:
+        try:
+            return self._index[position]
+        except KeyError:
+            raise FlowError(
+                f"no channel at ({position.x}, {position.y})"
+            ) from None
+
+
+class Solution(object):
+    """Pressures at every node of a network.
+
+    Nodes that are not connected to any fixed pressure have a pressure of
+    NaN.
+    """
+
+    def __init__(self, network: Network, pressures: array):
+        self.network = network
+        self.pressures = pressures
+
+    def pressure(self, position: Coordinate2) -> float:
+        return self.pressures[self.network.index(position)]
+
+    def flow(self, a: Coordinate2, b: Coordinate2) -> float:
+        """Returns the volumetric flow from `a` to the adjacent node `b`."""
+        i = self.network.index(a)
+        j = self.network.index(b)
+        for neighbour, conductance in self.network.adjacent[i]:
+            if neighbour == j:
+                return conductance * (self.pressures[i] - self.pressures[j])
+        raise FlowError("nodes are not linked")
+
+    def flows(self):
+        """Yields the position of both ends of every link, and the flow from
+        the first to the second.
+        """
+        nodes = self.network.nodes
+        pressures = self.pressures
+        for i, neighbours in enumerate(self.network.adjacent):
+            for j, conductance in neighbours:
+                if i < j:
+                    yield (
+                        nodes[i], nodes[j],
+                        conductance * (pressures[i] - pressures[j]),
+                    )
+
+
+def _conjugate_gradient(
+    diagonal, off_diagonal, rhs, x, *, tolerance, max_iterations,
+):
+    # Solves `A x = b` for a symmetric, positive definite `A` given as a
+    # diagonal and, for each row, a pair of tuples holding the columns and
+    # negated values of the off diagonal entries.  Uses a Jacobi
+    # preconditioner, which is free to apply and helps a great deal with the
+    # wide range of conductances found in a real design.
+    def multiply(v):
+        get = v.__getitem__
+        return [
+            d * vi - sum(map(operator.mul, values, map(get, columns)))
+            for d, vi, (columns, values) in zip(diagonal, v, off_diagonal)
+        ]
+
+    def dot(u, v):
+        return sum(map(operator.mul, u, v))
+
+    limit = tolerance * math.sqrt(dot(rhs, rhs))
+
+    r = [bi - ai for bi, ai in zip(rhs, multiply(x))]
+    z = list(map(operator.truediv, r, diagonal))
+    p = list(z)
+    rz = dot(r, z)
+
+    for _ in range(max_iterations):
+        if math.sqrt(dot(r, r)) <= limit:
+            return x
+
+        ap = multiply(p)
+        alpha = rz / dot(p, ap)
+        x = [xi + alpha * pi for xi, pi in zip(x, p)]
+        r = [ri - alpha * api for ri, api in zip(r, ap)]
+        z = list(map(operator.truediv, r, diagonal))
+
+        rz, rz_previous = dot(r, z), rz
+        beta = rz / rz_previous
+        p = [zi + beta * pi for zi, pi in zip(z, p)]
+
+    if math.sqrt(dot(r, r)) <= limit:
+        return x
+    raise FlowError("solver did not converge")
+
+
+def _assemble(adjacent, unknowns, fixed, pressures):
+    # Builds the rows of the nodal equations for the unknown nodes, moving the
+    # contribution of fixed nodes to the right hand side.
+    column = {node: index for index, node in enumerate(unknowns)}
+    diagonal = []
+    off_diagonal = []
+    rhs = []
+    for node in unknowns:
+        total = 0.0
+        columns = []
+        values = []
+        known = 0.0
+        for neighbour, conductance in adjacent[node]:
+            total += conductance
+            if neighbour in fixed:
+                known += conductance * pressures[neighbour]
+            elif neighbour in column:
+                columns.append(column[neighbour])
+                values.append(conductance)
+        diagonal.append(total)
+        off_diagonal.append((tuple(columns), tuple(values)))
+        rhs.append(known)
+    return diagonal, off_diagonal, rhs
+
+
+def _reachable(adjacent, sources):
+    seen = set(sources)
+    queue = collections.deque(seen)
+    while queue:
+        node = queue.popleft()
+        for neighbour, _ in adjacent[node]:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return seen
+
+
+def solve_steady(
+    network: Network, pressures: Dict[Coordinate2, float], *,
+    tolerance: float = 1e-10, max_iterations: int = 10000,
+) -> Solution:
+    """Solves for the steady state pressure at every node when the nodes in
+    `pressures` are held at fixed pressures.
+
+    Channels are mostly long unbranched runs, so before solving, every chain
+    of nodes with exactly two neighbours is collapsed into a single series
+    conductance.  Only the junctions are solved for, with pressures along
+    the chains recovered afterwards by interpolation.
+    """
+    adjacent = network.adjacent
+    fixed = {network.index(p): value for p, value in pressures.items()}
+
+    size = len(network)
+    keep = [
+        len(adjacent[node]) != 2 or node in fixed for node in range(size)
+    ]
+
+    # Walk out from every junction along each of its links to the next
+    # junction, recording the cumulative resistance at each node on the way.
+    chains = []
+    reduced: List[Dict[int, float]] = [{} for _ in range(size)]
+    walked = bytearray(size)
+    for start in range(size):
+        if not keep[start]:
+            continue
+        for node, conductance in adjacent[start]:
+            if walked[node] or (keep[node] and node < start):
+                continue
+
+            previous = start
+            resistance = 1 / conductance
+            interior = []
+            while not keep[node]:
+                walked[node] = 1
+                interior.append((node, resistance))
+                (a, ga), (b, gb) = adjacent[node]
+                if a == previous:
+                    previous, node, conductance = node, b, gb
+                else:
+                    previous, node, conductance = node, a, ga
+                resistance += 1 / conductance
+
+            chains.append((start, node, interior, resistance))
+            if node != start:
+                reduced[start][node] = (
+                    reduced[start].get(node, 0.0) + 1 / resistance
+                )
+                reduced[node][start] = reduced[start][node]
+
+    reduced_adjacent = [list(neighbours.items()) for neighbours in reduced]
+
+    result = array('d', [math.nan]) * size
+    for node, value in fixed.items():
+        result[node] = value
+
+    unknowns = sorted(
+        node for node in _reachable(reduced_adjacent, fixed)
+        if node not in fixed
+    )
+    if unknowns:
+        diagonal, off_diagonal, rhs = _assemble(
+            reduced_adjacent, unknowns, fixed, result,
+        )
+        solution = _conjugate_gradient(
+            diagonal, off_diagonal, rhs, [0.0] * len(unknowns),
+            tolerance=tolerance, max_iterations=max_iterations,
+        )
+        for node, value in zip(unknowns, solution):
+            result[node] = value
+
+    for start, end, interior, total in chains:
+        first = result[start]
+        last = result[end]
+        for node, resistance in interior:
+            result[node] = first + (last - first) * resistance / total
+
+    return Solution(network, result)
+
+
+class Transient(object):
+    """Steps the pressures in a network forward in time.
+
+    Each node is treated as an isothermal volume of air with a capacitance
+    proportional to the volume of the channels that meet at it.  Steps are
+    taken with backward Euler, which is stable for any step size.
+    """
+
+    def __init__(
+        self, network: Network, pressures: Dict[Coordinate2, float], *,
+        initial: float = 0.0,
+        tolerance: float = 1e-10, max_iterations: int = 10000,
+    ):
+        self.network = network
+        self.time = 0.0
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+
+        self._fixed = {
+            network.index(p): value for p, value in pressures.items()
+        }
+        self._unknowns = [
+            node for node in range(len(network)) if node not in self._fixed
+        ]
+        self._capacitance = [
+            network.volume[node] / ATMOSPHERIC_PRESSURE
+            for node in self._unknowns
+        ]
+
+        self.pressures = array('d', [initial]) * len(network)
+        for node, value in self._fixed.items():
+            self.pressures[node] = value
+
+        self._diagonal, self._off_diagonal, self._rhs = _assemble(
+            network.adjacent, self._unknowns, self._fixed, self.pressures,
+        )
+
+    def step(self, dt: float) -> Solution:
+        unknowns = self._unknowns
+        diagonal = [
+            d + c / dt for d, c in zip(self._diagonal, self._capacitance)
+        ]
+        rhs = [
+            b + c / dt * self.pressures[node]
+            for b, c, node in zip(self._rhs, self._capacitance, unknowns)
+        ]
+        solution = _conjugate_gradient(
+            diagonal, self._off_diagonal, rhs,
+            [self.pressures[node] for node in unknowns],
+            tolerance=self.tolerance, max_iterations=self.max_iterations,
+        )
+        for node, value in zip(unknowns, solution):
+            self.pressures[node] = value
+
+        self.time += dt
+        return Solution(self.network, self.pressures)
+
+
+def actuation_time(
+    network: Network, pressures: Dict[Coordinate2, float],
+    position: Coordinate2, threshold: float, *,
+    dt: float, max_time: float,
+) -> float:
+    """Returns the time taken for the pressure at `position` to reach
+    `threshold` after the fixed pressures are applied to a network at rest.
+    """
+    index = network.index(position)
+    transient = Transient(network, pressures)
+    rising = threshold >= 0
+
+    while transient.time < max_time:
+        transient.step(dt)
+        pressure = transient.pressures[index]
+        if (pressure >= threshold) if rising else (pressure <= threshold):
+            return transient.time
+
+    raise FlowError(f"pressure did not reach {threshold} within {max_time}s")
@@ -0,0 +1,220 @@
+"""
+Export of traced geometry as flat numeric arrays.
+
+The arrays are plain `array.array` objects, which support the buffer protocol,
+so they can be wrapped by NumPy (`numpy.frombuffer`) or passed to native code
+without copying or creating an object per feature.  They can also be written
+to an `.npz` archive, which NumPy loads directly, or to a flat binary file with
+the layout below, which needs nothing but a struct reader.
+
+The binary file starts with a header of little endian values::
+
+    magic      8 bytes   b"PCDLGEOM"
+    version    uint32    1
+    reserved   uint32    0
+    width      float64   width of the layer in millimetres
+    height     float64   height of the layer in millimetres
+    counts     7 uint64  number of items in each array, in the order below
+
+The arrays follow in the order of `ARRAYS`, each as raw little endian items
+padded with zeros to a multiple of eight bytes.
+"""
+import struct
+import sys
+import zipfile
+from array import array
+from typing import List, Optional
+
+from pcdl.layers import Layer
+from pcdl.path import ARC, PathBuilder, _ARC_PARAMETERS
+from pcdl.svg import _isolated_holes, _route_builders
+
+
+MAGIC = b"PCDLGEOM"
+VERSION = 1
+
+# Names of the arrays making up the geometry of a layer, in file order.
+ARRAYS = (
+    'codes', 'points', 'arcs', 'contours', 'contour_points',
+    'hole_centres', 'hole_radii',
+)
+
+_HEADER = struct.Struct('<8sIIdd7Q')
+
+_TYPECODES = {
+    'codes': 'B',
+    'points': 'd',
+    'arcs': 'd',
+    'contours': 'q',
+    'contour_points': 'q',
+    'hole_centres': 'd',
+    'hole_radii': 'd',
+}
+
+# NumPy type descriptors for each typecode, as written in `.npy` headers.
+_DESCRIPTORS = {'B': '|u1', 'd': '<f8', 'q': '<i8'}
+
+# Shapes of the arrays when written as NumPy arrays, by number of columns.
+_COLUMNS = {
+    'points': 2,
+    'arcs': _ARC_PARAMETERS,
+    'hole_centres': 2,
+}
+
+
+class Geometry(object):
+    """The cut geometry of a single layer, in millimetres.
+
+    `codes`, `points` and `arcs` hold every route contour as recorded by
+    `pcdl.path.PathBuilder`: one command code per segment, the x and y
+    coordinates of each point, and for each arc its radii, axis rotation and
+    large arc and sweep flags.  Contour `i` covers commands
+    `contours[i]:contours[i + 1]` and points
+    `contour_points[i]:contour_points[i + 1]`, so both offset arrays have one
+    more entry than there are contours.
+
+    Isolated holes, which are cut as circles, are given separately by the x
+    and y coordinates of their centres and their radii.
+    """
+
+    def __init__(
+        self, *, width: float, height: float,
+        codes: array, points: array, arcs: array,
+        contours: array, contour_points: array,
+        hole_centres: array, hole_radii: array,
+    ):
+        self.width = width
+        self.height = height
+        self.codes = codes
+        self.points = points
+        self.arcs = arcs
+        self.contours = contours
+        self.contour_points = contour_points
+        self.hole_centres = hole_centres
+        self.hole_radii = hole_radii
+
+    def __len__(self):
+        return len(self.contours) - 1
+
+    def contour(self, index: int) -> PathBuilder:
+        """Returns a copy of a single contour as a path."""
+        path = PathBuilder()
+        path.codes = self.codes[self.contours[index]:self.contours[index + 1]]
+        path.points = self.points[
+            2 * self.contour_points[index]:2 * self.contour_points[index + 1]
+        ]
+
+        arcs = self.codes[:self.contours[index]].count(ARC)
+        path.arcs = self.arcs[
+            _ARC_PARAMETERS * arcs:
+            _ARC_PARAMETERS * (arcs + path.codes.count(ARC))
+        ]
+        return path
+
+
+def layer_geometry(
+    layer: Layer, *, processes: Optional[int] = None,
+    routes: Optional[List[PathBuilder]] = None,
+) -> Geometry:
+    """Traces a layer and collects its geometry into flat arrays.  Routes
+    already traced by `pcdl.svg.layer_routes` can be given as `routes`.
+    """
+    if routes is None:
+        routes = _route_builders(layer, processes=processes)
+
+    path = PathBuilder()
+    contours = array('q', [0])
+    contour_points = array('q', [0])
+    for builder in routes:
+        path.extend(builder)
+        contours.append(len(path.codes))
+        contour_points.append(len(path.points) // 2)
+
+    hole_centres = array('d')
+    hole_radii = array('d')
+    for x, y, r in _isolated_holes(layer):
+        hole_centres.append(x)
+        hole_centres.append(y)
+        hole_radii.append(r)
+
+    return Geometry(
+        width=layer.width * layer.grid, height=layer.height * layer.grid,
+        codes=path.codes, points=path.points, arcs=path.arcs,
+        contours=contours, contour_points=contour_points,
+        hole_centres=hole_centres, hole_radii=hole_radii,
+    )
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == 'little':
+        return values
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values
+
+
+def write_binary(geometry: Geometry, output) -> None:
+    """Writes geometry to a file object in the flat binary format described
+    at the top of this module.
+    """
+    output.write(_HEADER.pack(
+        MAGIC, VERSION, 0, geometry.width, geometry.height,
+        *(len(getattr(geometry, name)) for name in ARRAYS),
+    ))
+    for name in ARRAYS:
+        data = _little_endian(getattr(geometry, name)).tobytes()
+        output.write(data)
+        output.write(bytes(-len(data) % 8))
+
+
+def read_binary(data) -> Geometry:
+    """Reads geometry back from bytes in the flat binary format."""
+    view = memoryview(data)
+    magic, version, _, width, height, *counts = _HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a pcdl geometry file")
+
+    arrays = {}
+    offset = _HEADER.size
+    for name, count in zip(ARRAYS, counts):
+        values = array(_TYPECODES[name])
+        size = count * values.itemsize
+        values.frombytes(view[offset:offset + size])
+        if sys.byteorder != 'little':
+            values.byteswap()
+        arrays[name] = values
+        offset += size + -size % 8
+    return Geometry(width=width, height=height, **arrays)
+
+
+def _npy(values: array, columns: int) -> bytes:
+    # Version 1.0 of the NumPy array format: a magic string, a header giving
+    # the type and shape as a Python literal, padded so that the data starts
+    # on a 64 byte boundary, and then the raw data.
+    if columns == 1:
+        shape = f"({len(values)},)"
+    else:
+        shape = f"({len(values) // columns}, {columns})"
+    header = (
+        f"{{'descr': '{_DESCRIPTORS[values.typecode]}', "
+        f"'fortran_order': False, 'shape': {shape}, }}"
+    ).encode('latin1')
+    header += b' ' * (-(10 + len(header) + 1) % 64) + b'\n'
+    return b''.join([
+        b'\x93NUMPY\x01\x00', struct.pack('<H', len(header)), header,
+        _little_endian(values).tobytes(),
+    ])
+
+
+def write_npz(geometry: Geometry, output) -> None:
+    """Writes geometry to a file object as an uncompressed `.npz` archive,
+    with one array per attribute plus `size`, holding the width and height.
+    """
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('size.npy', _npy(
+            array('d', [geometry.width, geometry.height]), 1,
+        ))
+        for name in ARRAYS:
+            archive.writestr(f'{name}.npy', _npy(
+                getattr(geometry, name), _COLUMNS.get(name, 1),
+            ))
@@ -0,0 +1,170 @@
+"""
+Uniform grid bucket index over the holes and links of a layer.
+
+Queries return flat `array('i')` objects rather than feature objects.  Hole
+queries return `x, y` pairs and link queries return `ax, ay, bx, by`
+quadruples, in both cases ordered by distance for nearest neighbour queries
+and by position otherwise.
+"""
+import heapq
+import math
+from array import array
+from typing import Dict, Set, Tuple
+
+from pcdl.grid import Coordinate2
+
+
+def _segment_distance(x, y, a, b):
+    # Links are always axis aligned and one step long so the nearest point on
+    # the link can be found by clamping.
+    nx = min(max(x, min(a.x, b.x)), max(a.x, b.x))
+    ny = min(max(y, min(a.y, b.y)), max(a.y, b.y))
+    return math.hypot(x - nx, y - ny)
+
+
+class SpatialIndex(object):
+
+    def __init__(self, layer, *, bucket_size: int = 16):
+        self.bucket_size = bucket_size
+        self._extent = self._bucket(layer.width, layer.height)
+
+        self._holes: Dict[Tuple[int, int], Set[Coordinate2]] = {}
+        self._links: Dict[
+            Tuple[int, int], Set[Tuple[Coordinate2, Coordinate2]]
+        ] = {}
+
+        for hole in layer.holes():
+            self.insert_hole(hole.position)
+        for link in layer.links():
+            self.insert_link(link.a, link.b)
+
+    def _bucket(self, x, y):
+        return x // self.bucket_size, y // self.bucket_size
+
+    def insert_hole(self, position: Coordinate2) -> None:
+        bucket = self._bucket(position.x, position.y)
+        self._holes.setdefault(bucket, set()).add(position)
+
+    def remove_hole(self, position: Coordinate2) -> None:
+        bucket = self._bucket(position.x, position.y)
+        self._holes[bucket].discard(position)
+
+    def insert_link(self, a: Coordinate2, b: Coordinate2) -> None:
+        a, b = sorted((a, b), key=tuple)
+        bucket = self._bucket(a.x, a.y)
+        self._links.setdefault(bucket, set()).add((a, b))
+
+    def remove_link(self, a: Coordinate2, b: Coordinate2) -> None:
+        a, b = sorted((a, b), key=tuple)
+        bucket = self._bucket(a.x, a.y)
+        self._links[bucket].discard((a, b))
+
+    def _buckets_in(self, x0, y0, x1, y1):
+        bx0, by0 = self._bucket(x0, y0)
+        bx1, by1 = self._bucket(x1, y1)
+        for bx in range(bx0, bx1 + 1):
+            for by in range(by0, by1 + 1):
+                yield bx, by
+
+    def holes_in(self, x0: int, y0: int, x1: int, y1: int) -> array:
+        """Returns the holes inside the inclusive rectangle from `(x0, y0)` to
+        `(x1, y1)`.
+        """
+        found = []
+        for bucket in self._buckets_in(x0, y0, x1, y1):
+            for position in self._holes.get(bucket, ()):
+                if x0 <= position.x <= x1 and y0 <= position.y <= y1:
+                    found.append(tuple(position))
+
+        result = array('i')
+        for point in sorted(found):
+            result.extend(point)
+        return result
+
+    def links_in(self, x0: int, y0: int, x1: int, y1: int) -> array:
+        """Returns the links with at least one end inside the inclusive
+        rectangle from `(x0, y0)` to `(x1, y1)`.
+        """
+        def inside(point):
+            return x0 <= point.x <= x1 and y0 <= point.y <= y1
+
+        # Links are filed under their top left end, which may be just outside
+        # the rectangle.
+        found = []
+        for bucket in self._buckets_in(x0 - 1, y0 - 1, x1, y1):
+            for a, b in self._links.get(bucket, ()):
+                if inside(a) or inside(b):
+                    found.append((*a, *b))
+
+        result = array('i')
+        for link in sorted(found):
+            result.extend(link)
+        return result
+
+    def _rings(self, x, y):
+        # Yields rings of buckets around the bucket containing `(x, y)`, along
+        # with a lower bound on the distance to any feature filed in the ring,
+        # until the whole layer has been covered.
+        cx, cy = self._bucket(int(x), int(y))
+        ex, ey = self._extent
+        reach = max(abs(cx), abs(cy), abs(ex - cx), abs(ey - cy))
+        for radius in range(reach + 1):
+            if radius == 0:
+                ring = [(cx, cy)]
+            else:
+                ring = []
+                for offset in range(-radius, radius + 1):
+                    ring.append((cx + offset, cy - radius))
+                    ring.append((cx + offset, cy + radius))
+                for offset in range(-radius + 1, radius):
+                    ring.append((cx - radius, cy + offset))
+                    ring.append((cx + radius, cy + offset))
+            # Links can reach one step outside of the bucket they are filed
+            # under.
+            yield max(0, (radius - 1) * self.bucket_size - 1), ring
+
+    def _nearest(self, x, y, k, buckets, distance):
+        # Max heap of the best `k` features so far, ordered by distance then
+        # by position.
+        best = []
+        if k < 1:
+            return best
+        for minimum, ring in self._rings(x, y):
+            if len(best) == k and -best[0][0] < minimum:
+                break
+            for bucket in ring:
+                for feature in buckets.get(bucket, ()):
+                    key = _key(feature)
+                    entry = (-distance(feature), tuple(-c for c in key), key)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+        return [key for _, _, key in sorted(best, reverse=True)]
+
+    def nearest_holes(self, x: float, y: float, k: int = 1) -> array:
+        """Returns up to `k` holes, nearest first."""
+        result = array('i')
+        for key in self._nearest(
+            x, y, k, self._holes,
+            lambda position: math.hypot(x - position.x, y - position.y),
+        ):
+            result.extend(key)
+        return result
+
+    def nearest_links(self, x: float, y: float, k: int = 1) -> array:
+        """Returns up to `k` links, nearest first."""
+        result = array('i')
+        for key in self._nearest(
+            x, y, k, self._links,
+            lambda link: _segment_distance(x, y, *link),
+        ):
+            result.extend(key)
+        return result
+
+
+def _key(feature):
+    if isinstance(feature, Coordinate2):
+        return tuple(feature)
+    a, b = feature
+    return (*a, *b)
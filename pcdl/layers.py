@@ -1,16 +1,16 @@
-from typing import Set, Optional
+from typing import Dict, List, Set, Optional
 
 from pcdl.grid import Coordinate2
-
-_UNNAMED_LAYER_COUNT = 0
+from pcdl.index import SpatialIndex
 
 
 class _Link(object):
 
-    def __init__(self, layer, a, b):
+    def __init__(self, layer, a, b, *, radius=None):
         self.layer = layer
         self.a = a
         self.b = b
+        self.radius = radius
 
     def __eq__(self, other):
         return (
@@ -64,17 +64,30 @@ class _Hole(object):
         return str(self)
 
 
+class Journal(object):
+    """Records the nodes touched by changes to a layer, so that anything
+    derived from the layer can be brought up to date without starting over.
+    """
+
+    def __init__(self):
+        self.dirty: Set[Coordinate2] = set()
+
+    def __bool__(self):
+        return bool(self.dirty)
+
+    def take(self) -> Set[Coordinate2]:
+        """Returns the nodes touched since the last call, and forgets them."""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+
 class Layer(object):
 
     def __init__(
-        self, *, name: Optional[str] = None,
+        self, *, name: str = "unknown",
         grid: float = 3.0, width: int, height: int,
         material: str = 'acrylic', thickness: float=2.0,
     ):
-        if name is None:
-            global _UNNAMED_LAYER_COUNT
-            _UNNAMED_LAYER_COUNT += 1
-            name = f"unknown{_UNNAMED_LAYER_COUNT}"
         self.name: str = name
 
         self.material: str = material
@@ -86,7 +99,7 @@ class Layer(object):
 
         # The set of drilled nodes
         self.__holes: Set[Coordinate2] = set()
-        self.__hole_radiuses: Map[Coordinate2, float] = {}
+        self.__hole_radiuses: Dict[Coordinate2, float] = {}
 
         # The set of nodes with a link to the node on their right
         self.__x_links: Set[Coordinate2] = set()
@@ -94,37 +107,156 @@ class Layer(object):
         # The set of nodes with a link going down
         self.__y_links: Set[Coordinate2] = set()
 
+        # The radius of the channel cut for each link, if known
+        self.__x_link_radiuses: Dict[Coordinate2, float] = {}
+        self.__y_link_radiuses: Dict[Coordinate2, float] = {}
+
+        # Built on first use and then kept up to date.
+        self.__index: Optional[SpatialIndex] = None
+
+        # Journals that want to hear about changes.
+        self.__journals: List[Journal] = []
+
+    def __touch(self, *positions: Coordinate2) -> None:
+        for journal in self.__journals:
+            journal.dirty.update(positions)
+
+    def journal(self) -> Journal:
+        """Returns a new journal recording every node touched by a change to
+        this layer from now on.
+        """
+        journal = Journal()
+        self.__journals.append(journal)
+        return journal
+
     def add_hole(self, position: Coordinate2, radius):
+        if self.__index is not None and position not in self.__holes:
+            self.__index.insert_hole(position)
         self.__holes.add(position)
         self.__hole_radiuses[position] = radius
+        self.__touch(position)
         return _Hole(self, position, radius=radius)
 
+    def remove_hole(self, position: Coordinate2) -> None:
+        if position not in self.__holes:
+            raise KeyError(position)
+        if self.__index is not None:
+            self.__index.remove_hole(position)
+        self.__holes.remove(position)
+        del self.__hole_radiuses[position]
+        self.__touch(position)
+
+    def hole_radius(self, position: Coordinate2) -> float:
+        return self.__hole_radiuses[position]
+
     def holes(self):
         for hole in self.__holes:
             radius = self.__hole_radiuses[hole]
             yield _Hole(self, hole, radius=radius)
 
-    def add_link(self, a: Coordinate2, b: Coordinate2):
+    def add_link(
+        self, a: Coordinate2, b: Coordinate2, *,
+        radius: Optional[float] = None,
+    ):
         """Adds a single step, horizontal or vertical link between two, drilled
         holes.
         """
+        links, radiuses, origin = self.__link_origin(a, b)
+        if self.__index is not None and origin not in links:
+            self.__index.insert_link(a, b)
+        links.add(origin)
+        if radius is not None:
+            radiuses[origin] = radius
+        self.__touch(a, b)
+
+    def remove_link(self, a: Coordinate2, b: Coordinate2) -> None:
+        links, radiuses, origin = self.__link_origin(a, b)
+        if origin not in links:
+            raise KeyError((a, b))
+        if self.__index is not None:
+            self.__index.remove_link(a, b)
+        links.remove(origin)
+        radiuses.pop(origin, None)
+        self.__touch(a, b)
+
+    def __link_origin(self, a: Coordinate2, b: Coordinate2):
+        # Finds the set of links, and the radiuses, that a link between two
+        # nodes belongs in, and the node it is stored under.
         # Vertical link
         if a.x == b.x:
             if abs(b.y - a.y) != 1:
                 raise ValueError("Can only link adjacent nodes")
 
-            self.__y_links.add(Coordinate2(a.x, min(a.y, b.y)))
+            origin = Coordinate2(a.x, min(a.y, b.y))
+            return self.__y_links, self.__y_link_radiuses, origin
 
         # Horizontal link
         elif a.y == b.y:
             if abs(b.x - a.x) != 1:
                 raise ValueError("Can only link adjacent nodes")
 
-            self.__x_links.add(Coordinate2(min(a.x, b.x), a.y))
+            origin = Coordinate2(min(a.x, b.x), a.y)
+            return self.__x_links, self.__x_link_radiuses, origin
 
         else:
             raise ValueError("Links must be either horizontal or vertical")
 
+    def link_radius(self, a: Coordinate2, b: Coordinate2) -> Optional[float]:
+        _, radiuses, origin = self.__link_origin(a, b)
+        return radiuses.get(origin)
+
+    def patch(
+        self, other: 'Layer', x0: int, y0: int, x1: int, y1: int,
+    ) -> None:
+        """Replaces every feature touching a node in the inclusive rectangle
+        from `(x0, y0)` to `(x1, y1)` with the features of `other` touching
+        the same nodes.
+        """
+        index = self.index()
+        holes = index.holes_in(x0, y0, x1, y1)
+        for i in range(0, len(holes), 2):
+            self.remove_hole(Coordinate2(holes[i], holes[i + 1]))
+        links = index.links_in(x0, y0, x1, y1)
+        for i in range(0, len(links), 4):
+            self.remove_link(
+                Coordinate2(links[i], links[i + 1]),
+                Coordinate2(links[i + 2], links[i + 3]),
+            )
+
+        index = other.index()
+        holes = index.holes_in(x0, y0, x1, y1)
+        for i in range(0, len(holes), 2):
+            position = Coordinate2(holes[i], holes[i + 1])
+            self.add_hole(position, radius=other.hole_radius(position))
+        links = index.links_in(x0, y0, x1, y1)
+        for i in range(0, len(links), 4):
+            a = Coordinate2(links[i], links[i + 1])
+            b = Coordinate2(links[i + 2], links[i + 3])
+            self.add_link(a, b, radius=other.link_radius(a, b))
+
+    def index(self) -> SpatialIndex:
+        """Returns a spatial index over the holes and links in this layer.
+
+        The index is built on first use and kept up to date as features are
+        added.
+        """
+        if self.__index is None:
+            self.__index = SpatialIndex(self)
+        return self.__index
+
+    def cells(self):
+        """Returns the set of all nodes that are either drilled or linked to
+        another node.
+        """
+        cells = set(self.__holes)
+        for origin in self.__x_links:
+            cells.add(origin)
+            cells.add(Coordinate2(origin.x + 1, origin.y))
+        for origin in self.__y_links:
+            cells.add(origin)
+            cells.add(Coordinate2(origin.x, origin.y + 1))
+        return cells
+
     def neighbours(self, pos):
         """Returns an iterator over all coordinates adjacent to a point.
 
@@ -156,7 +288,13 @@ class Layer(object):
 
     def links(self):
         for origin in self.__x_links:
-            yield _Link(self, origin, Coordinate2(origin.x + 1, origin.y))
+            yield _Link(
+                self, origin, Coordinate2(origin.x + 1, origin.y),
+                radius=self.__x_link_radiuses.get(origin),
+            )
 
         for origin in self.__y_links:
-            yield _Link(self, origin, Coordinate2(origin.x, origin.y + 1))
+            yield _Link(
+                self, origin, Coordinate2(origin.x, origin.y + 1),
+                radius=self.__y_link_radiuses.get(origin),
+            )
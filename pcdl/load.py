@@ -1,70 +1,359 @@
-from typing import Optional
+"""
+Loading of designs from images.
+
+A design is a stack of frames, one per entry in the `[[layers]]` list of the
+config.  Frames can come from a single animated GIF, a multi-page TIFF, or a
+directory holding one PNG per layer.  Transparent pixels are empty, and every
+other pixel is part of a channel identified by its colour.
+"""
+import concurrent.futures
+import io
+import itertools
+import os
+import pathlib
+from typing import List, Optional, Union
 
 import PIL.Image
 import PIL.ImageSequence
 
+from pcdl.chunked import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_CHUNKS, ChunkedLayer
 from pcdl.grid import Coordinate2
 from pcdl.layers import Layer
+from pcdl.memory import BUILD, DECODE, MemoryProfile, measure
+from pcdl.progress import COLUMNS, FRAMES, Progress
+
+
+_TIFF_SUFFIXES = {'.tif', '.tiff'}
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return PIL.Image.open(source)
+
+
+def _pixels(image):
+    # Returns the pixels of a frame as a flat, row major list, with `None` in
+    # place of transparent pixels.  Palette images that mark a single index as
+    # transparent keep their indices as colours.  Anything else is compared as
+    # RGBA, with fully transparent pixels empty.
+    transparency = image.info.get('transparency')
+    if image.mode == 'P' and isinstance(transparency, int):
+        return [
+            None if colour == transparency else colour
+            for colour in image.tobytes()
+        ]
+
+    image = image.convert('RGBA')
+    colours = memoryview(image.tobytes()).cast('I')
+    return [
+        None if alpha == 0 else colour
+        for alpha, colour in zip(image.getchannel('A').tobytes(), colours)
+    ]
+
 
+def _out_of_bounds(x: int, y: int, width: int, height: int) -> bool:
+    # The first column holds the legend of channel colours.  Nothing else may
+    # come within one pixel of the edge of the board, so that every
+    # neighbour of a feature can be looked up.
+    return x < 2 or x > width - 2 or y < 2 or y > height - 2
 
-def load_gif(filename, *, config):
-    gif = PIL.Image.open(filename)
 
+def _decode(image, memory: Optional[MemoryProfile] = None):
+    # Decoding is done by Pillow without holding the GIL, so this can be run
+    # for several frames at once from a pool of threads.
+    with measure(memory, DECODE):
+        return image.size, _pixels(image)
+
+
+def _build_layer(
+    size, pixels, index: int, layer_config, *, config,
+    progress: Optional[Progress] = None,
+):
     grid = config.get('grid', 2.0)
 
-    layers = []
-    for image, layer_config in zip(
-        PIL.ImageSequence.Iterator(gif), config['layers']
-    ):
-        name: Optional[str] = layer_config.get('name')
+    # Boards that are too large to hold in memory can be kept in chunks in a
+    # scratch file instead.
+    storage = config.get('storage')
 
-        material: str = layer_config.get('material', 'acrylic')
-        thickness: float = layer_config.get('thickness', 2.0)
+    # Unnamed layers are numbered within the design, rather than globally, so
+    # that loading the same design always gives the same names.
+    name: str = layer_config.get('name', f"unknown{index + 1}")
 
-        width, height = image.size
-        transparency = image.info['transparency']
+    material: str = layer_config.get('material', 'acrylic')
+    thickness: float = layer_config.get('thickness', 2.0)
 
-        radius_lookup = {}
-        for y, channel in enumerate(config['channels']):
-            colour = image.getpixel((0, y))
-            if colour == transparency:
-                continue
-            radius_lookup[colour] = channel['radius']
+    width, height = size
+
+    radius_lookup = {}
+    for y, channel in enumerate(config['channels']):
+        colour = pixels[y * width]
+        if colour is None:
+            continue
+        radius_lookup[colour] = channel['radius']
 
+    layer: Union[Layer, ChunkedLayer]
+    if storage is None:
         layer = Layer(
             name=name, material=material, thickness=thickness,
             grid=grid, width=width, height=height,
         )
-        for x in range(1, width):
-            for y in range(height):
-                if image.getpixel((x, y)) == transparency:
-                    continue
-
-                if x < 2 or x > width - 2 or y < 2 or x > height - 2:
-                    raise Exception("out of bounds")
-
-                radius = radius_lookup[image.getpixel((x, y))]
-
-                above = image.getpixel((x, y - 1)) != transparency
-                below = image.getpixel((x, y + 1)) != transparency
-                left = image.getpixel((x - 1, y)) != transparency
-                right = image.getpixel((x + 1, y)) != transparency
-
-                # Pixel has no neighbours.
-                if not any([above, below, left, right]):
-                    layer.add_hole(Coordinate2(x, y), radius=radius)
-
-                if right:
-                    layer.add_link(
-                        Coordinate2(x, y),
-                        Coordinate2(x + 1, y),
-                    )
-
-                if below:
-                    layer.add_link(
-                        Coordinate2(x, y),
-                        Coordinate2(x, y + 1),
-                    )
-
-        layers.append(layer)
+    else:
+        layer = ChunkedLayer(
+            name=name, material=material, thickness=thickness,
+            grid=grid, width=width, height=height,
+            chunk_size=storage.get('chunk_size', DEFAULT_CHUNK_SIZE),
+            max_chunks=storage.get('max_chunks', DEFAULT_MAX_CHUNKS),
+            directory=storage.get('directory'),
+        )
+    for x in range(1, width):
+        if progress is not None:
+            progress.report(COLUMNS, x, width)
+        for y in range(height):
+            offset = y * width + x
+            colour = pixels[offset]
+            if colour is None:
+                continue
+
+            if _out_of_bounds(x, y, width, height):
+                raise Exception("out of bounds")
+
+            radius = radius_lookup[colour]
+
+            above = pixels[offset - width] is not None
+            below = pixels[offset + width] is not None
+            left = pixels[offset - 1] is not None
+            right = pixels[offset + 1] is not None
+
+            # Pixel has no neighbours.
+            if not any([above, below, left, right]):
+                layer.add_hole(Coordinate2(x, y), radius=radius)
+
+            if right:
+                layer.add_link(
+                    Coordinate2(x, y),
+                    Coordinate2(x + 1, y),
+                    radius=radius,
+                )
+
+            if below:
+                layer.add_link(
+                    Coordinate2(x, y),
+                    Coordinate2(x, y + 1),
+                    radius=radius,
+                )
+
+    return layer
+
+
+def _build_layers(
+    frames, *, config, progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+) -> List[Layer]:
+    layers = []
+    for index, ((size, pixels), layer_config) in enumerate(
+        zip(frames, config['layers'])
+    ):
+        if progress is not None:
+            progress.report(FRAMES, index + 1, len(config['layers']))
+        with measure(memory, BUILD):
+            layers.append(_build_layer(
+                size, pixels, index, layer_config,
+                config=config, progress=progress,
+            ))
     return layers
+
+
+def _build_decoded_layers(
+    decode, items, *, config, workers, progress, memory,
+) -> List[Layer]:
+    # Decodes in a pool of threads, while the layers are built from the
+    # frames already decoded.  Frames not yet decoded are abandoned if
+    # building fails or is cancelled.  When measuring memory, frames are
+    # decoded one at a time as they are needed, so that each stage can be
+    # told apart.
+    if memory is not None:
+        return _build_layers(
+            (decode(item, memory) for item in items),
+            config=config, progress=progress, memory=memory,
+        )
+
+    executor = concurrent.futures.ThreadPoolExecutor(workers)
+    futures = [executor.submit(decode, item) for item in items]
+    try:
+        return _build_layers(
+            (future.result() for future in futures),
+            config=config, progress=progress,
+        )
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+
+
+def load_gif(
+    filename, *, config, progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+):
+    gif = _open(filename)
+
+    # The frames of a GIF can only be decoded in order, as each one may be
+    # drawn over the last.
+    frames = (
+        _decode(image, memory) for image in PIL.ImageSequence.Iterator(gif)
+    )
+    return _build_layers(
+        frames, config=config, progress=progress, memory=memory,
+    )
+
+
+def _decode_page(source, page: int, memory=None):
+    with _open(source) as image:
+        image.seek(page)
+        return _decode(image, memory)
+
+
+def load_tiff(
+    filename, *, config, workers: Optional[int] = None,
+    progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+):
+    """Loads a design from a multi-page TIFF, with one page per layer.
+
+    Pages are decoded in parallel by a pool of `workers` threads, each with
+    its own handle on the file.
+    """
+    if not isinstance(filename, (bytes, bytearray, memoryview)):
+        filename = os.fspath(filename)
+
+    with _open(filename) as image:
+        pages = min(getattr(image, 'n_frames', 1), len(config['layers']))
+
+    return _build_decoded_layers(
+        lambda page, memory=None: _decode_page(filename, page, memory),
+        range(pages),
+        config=config, workers=workers, progress=progress, memory=memory,
+    )
+
+
+def _decode_file(path, memory=None):
+    with PIL.Image.open(path) as image:
+        return _decode(image, memory)
+
+
+def _directory_paths(directory, *, config):
+    # Returns the image for each layer, stopping at the first layer without
+    # one, and the PNGs left over that no layer used.
+    directory = pathlib.Path(directory)
+    named = {
+        directory.joinpath(layer_config['file'])
+        for layer_config in config['layers'] if 'file' in layer_config
+    }
+    unnamed = iter(sorted(
+        path for path in directory.glob('*.png') if path not in named
+    ))
+
+    paths = []
+    for layer_config in config['layers']:
+        if 'file' in layer_config:
+            paths.append(directory.joinpath(layer_config['file']))
+            continue
+        path = next(unnamed, None)
+        if path is None:
+            break
+        paths.append(path)
+    return paths, list(unnamed)
+
+
+def load_directory(
+    directory, *, config, workers: Optional[int] = None,
+    progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+):
+    """Loads a design from a directory of images, one per layer.
+
+    Each entry in `[[layers]]` can name its image with a `file` key, relative
+    to the directory.  Layers without one take the PNGs in the directory in
+    order of filename.  Images are decoded in parallel by a pool of `workers`
+    threads.
+    """
+    paths, _ = _directory_paths(directory, config=config)
+    return _build_decoded_layers(
+        _decode_file, paths,
+        config=config, workers=workers, progress=progress, memory=memory,
+    )
+
+
+def load_design(
+    source, *, config, workers: Optional[int] = None,
+    progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+):
+    """Loads a design from a directory of per layer images, a multi-page
+    TIFF, or an animated GIF, depending on what `source` points to.
+
+    A `pcdl.progress.Progress` given as `progress` hears about each frame
+    decoded and each column of pixels scanned, and can cancel the load.  A
+    `pcdl.memory.MemoryProfile` given as `memory` records the memory used
+    decoding frames and building layers.
+    """
+    if hasattr(source, 'read'):
+        source = source.read()
+
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        path = pathlib.Path(source)
+        if path.is_dir():
+            return load_directory(
+                path, config=config, workers=workers, progress=progress,
+                memory=memory,
+            )
+        if path.suffix.lower() in _TIFF_SUFFIXES:
+            return load_tiff(
+                path, config=config, workers=workers, progress=progress,
+                memory=memory,
+            )
+        return load_gif(
+            path, config=config, progress=progress, memory=memory,
+        )
+
+    with _open(source) as image:
+        kind = image.format
+    if kind == 'TIFF':
+        return load_tiff(
+            source, config=config, workers=workers, progress=progress,
+            memory=memory,
+        )
+    return load_gif(
+        source, config=config, progress=progress, memory=memory,
+    )
+
+
+def _decode_design(
+    source, *, config, workers: Optional[int] = None,
+) -> List[tuple]:
+    # Decodes the frame for each layer of a design without building any
+    # layers, so that it can be built with several configs.
+    if hasattr(source, 'read'):
+        source = source.read()
+
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        path = pathlib.Path(source)
+        if path.is_dir():
+            paths, _ = _directory_paths(path, config=config)
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                return list(executor.map(_decode_file, paths))
+        source = os.fspath(path)
+
+    with _open(source) as image:
+        pages = min(getattr(image, 'n_frames', 1), len(config['layers']))
+        if image.format != 'TIFF':
+            return [
+                _decode(frame) for frame in itertools.islice(
+                    PIL.ImageSequence.Iterator(image), pages,
+                )
+            ]
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(
+            lambda page: _decode_page(source, page), range(pages),
+        ))
@@ -0,0 +1,159 @@
+"""
+Accounting of memory used by each stage of loading and rendering.
+
+A `MemoryProfile` is passed down through loading and rendering in the same
+way as a `pcdl.progress.Progress`, and each stage runs inside
+`MemoryProfile.stage`.  Python allocations are traced with `tracemalloc`,
+which gives the peak and retained memory of each stage on its own, and the
+resident set size of the whole process is sampled as each stage ends, which
+also covers memory allocated outside of Python, such as by Pillow.
+
+Tracing allocations slows everything down a good deal, so this is only for
+finding out where memory goes.
+"""
+import contextlib
+import resource
+import sys
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+# Stages recorded while loading and rendering.
+DECODE = 'decode'
+BUILD = 'build layer'
+HALF_EDGES = 'half edges'
+TRACE = 'trace'
+TREE = 'build tree'
+WRITE = 'write'
+
+
+def _reset_peak() -> None:
+    # Before Python 3.9 the peak can only be reset along with every trace, so
+    # it is left alone and the peaks of stages after the first can come out
+    # higher than they really were.
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    if reset_peak is not None:
+        reset_peak()
+
+
+def _resident() -> int:
+    # The resident set size of the process, in bytes.
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return _peak_resident()
+
+
+def _peak_resident() -> int:
+    # The largest resident set size the process has had, in bytes.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageMemory(object):
+    """Memory used by every run of one stage.
+
+    `peak` is the most memory the stage had allocated at once over what was
+    allocated when it started, and `retained` is the total left allocated
+    when it finished, summed over every run.  `resident` and `peak_resident`
+    are the resident set size of the process after the last run, and the
+    largest it had been by then.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.runs = 0
+        self.peak = 0
+        self.retained = 0
+        self.resident = 0
+        self.peak_resident = 0
+
+    def __str__(self):
+        return (
+            f"{self.name}: {self.runs} runs, peak {_megabytes(self.peak)}, "
+            f"retained {_megabytes(self.retained)}, "
+            f"rss {_megabytes(self.resident)} "
+            f"(peak {_megabytes(self.peak_resident)})"
+        )
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / 1e6:.1f}MB"
+
+
+class MemoryProfile(object):
+    """Records the memory used by each stage of a job.
+
+    Allocations are only traced between `start` and `stop`, or within a
+    `with` block.  Stages may be nested, in which case the allocations of the
+    inner stage count towards the outer one as well.  Before Python 3.9 the
+    traced peak cannot be reset when a stage starts, so the peaks of later
+    stages may be overestimated.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageMemory] = {}
+
+        # The traced memory when each open stage started, and the highest
+        # peak seen by it before any stage nested within it reset the peak.
+        self._open: List[List[int]] = []
+        self._started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self) -> None:
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in self._open:
+            frame[1] = max(frame[1], peak)
+        _reset_peak()
+        frame = [current, current]
+        self._open.append(frame)
+        try:
+            yield
+        finally:
+            self._open.pop()
+            current, peak = tracemalloc.get_traced_memory()
+
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = StageMemory(name)
+            stage.runs += 1
+            stage.peak = max(stage.peak, max(frame[1], peak) - frame[0])
+            stage.retained += current - frame[0]
+            # The two sizes are read in different ways, and the peak can
+            # lag behind the current size.
+            stage.resident = _resident()
+            stage.peak_resident = max(_peak_resident(), stage.resident)
+
+    def peak(self) -> Optional[StageMemory]:
+        """Returns the stage with the highest peak, if any were recorded."""
+        return max(
+            self.stages.values(), key=lambda stage: stage.peak, default=None,
+        )
+
+    def report(self) -> str:
+        return '\n'.join(str(stage) for stage in self.stages.values())
+
+
+def measure(memory: Optional[MemoryProfile], name: str):
+    """Runs a stage under `memory`, or just runs it if that is `None`."""
+    if memory is None:
+        return contextlib.nullcontext()
+    return memory.stage(name)
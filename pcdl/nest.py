@@ -0,0 +1,311 @@
+"""
+Packing of layers onto stock sheets.
+
+Layers are grouped by material and thickness, and the bounding rectangle of
+each is packed onto sheets using a bottom-left skyline heuristic.  Layers may
+be turned by 90 degrees if that gives a better fit.
+"""
+import xml.etree.ElementTree
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from pcdl.commonline import CommonLines, merge_common_lines
+from pcdl.grid import Angle, R0, R90, R270
+from pcdl.layers import Layer
+from pcdl.path import PathBuilder
+from pcdl.svg import (
+    _CUT_STYLE, Transformation, _isolated_holes, _render_layer_group,
+    _route_builders, _write_hole, _write_outline,
+)
+
+
+DEFAULT_SHEET_WIDTH = 600.0
+DEFAULT_SHEET_HEIGHT = 400.0
+DEFAULT_SPACING = 2.0
+
+
+@dataclass(frozen=True)
+class Placement(object):
+    layer: Layer
+    x: float
+    y: float
+    rotation: Angle
+
+    @property
+    def width(self) -> float:
+        if self.rotation == R90:
+            return self.layer.height * self.layer.grid
+        return self.layer.width * self.layer.grid
+
+    @property
+    def height(self) -> float:
+        if self.rotation == R90:
+            return self.layer.width * self.layer.grid
+        return self.layer.height * self.layer.grid
+
+
+@dataclass
+class Sheet(object):
+    material: str
+    thickness: float
+    width: float
+    height: float
+    placements: List[Placement] = field(default_factory=list)
+
+
+class _Skyline(object):
+    """Tracks the height of the highest placed rectangle across a bin."""
+
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+        # Sorted list of (x, y, width) segments covering the bin.
+        self._segments: List[Tuple[float, float, float]] = [(0.0, 0.0, width)]
+
+    def _fit(self, index, width, height):
+        # Returns the y position at which a rectangle starting at the left of
+        # segment `index` would rest, or None if it would not fit.
+        x, y, _ = self._segments[index]
+        if x + width > self.width:
+            return None
+        remaining = width
+        for _, segment_y, segment_width in self._segments[index:]:
+            y = max(y, segment_y)
+            if y + height > self.height:
+                return None
+            remaining -= segment_width
+            if remaining <= 0:
+                break
+        return y
+
+    def find(self, width, height):
+        """Returns the best `(x, y)` position for a rectangle, or None."""
+        best: Optional[Tuple[int, int]] = None
+        best_score: Optional[Tuple[int, int]] = None
+        for index, (x, _, _) in enumerate(self._segments):
+            y = self._fit(index, width, height)
+            if y is None:
+                continue
+            score = (y + height, x)
+            if best_score is None or score < best_score:
+                best_score = score
+                best = (x, y)
+        return best
+
+    def place(self, x, y, width, height):
+        top = y + height
+        right = x + width
+
+        segments = []
+        for segment_x, segment_y, segment_width in self._segments:
+            segment_right = segment_x + segment_width
+            if segment_right <= x or segment_x >= right:
+                segments.append((segment_x, segment_y, segment_width))
+                continue
+            if segment_x < x:
+                segments.append((segment_x, segment_y, x - segment_x))
+            if segment_right > right:
+                segments.append((right, segment_y, segment_right - right))
+        segments.append((x, top, width))
+        segments.sort()
+
+        # Merge neighbouring segments at the same height.
+        merged = [segments[0]]
+        for segment in segments[1:]:
+            last_x, last_y, last_width = merged[-1]
+            if segment[1] == last_y:
+                merged[-1] = (last_x, last_y, last_width + segment[2])
+            else:
+                merged.append(segment)
+        self._segments = merged
+
+
+def sheet_size(config, material: str, thickness: float) -> Tuple[float, float]:
+    """Looks up the size of the stock sheets for a material and thickness.
+
+    Each entry in `[[sheets]]` may restrict itself to a `material` and
+    `thickness`, and the first matching entry is used.
+    """
+    for sheet in config.get('sheets', []):
+        if sheet.get('material', material) != material:
+            continue
+        if sheet.get('thickness', thickness) != thickness:
+            continue
+        return sheet['width'], sheet['height']
+    return DEFAULT_SHEET_WIDTH, DEFAULT_SHEET_HEIGHT
+
+
+def nest_layers(
+    layers: List[Layer], *, config=None, spacing: float = DEFAULT_SPACING,
+) -> List[Sheet]:
+    """Packs layers, which may come from any number of designs, onto as few
+    sheets as possible.  Only layers of the same material and thickness share
+    a sheet.  Every layer is kept at least `spacing` from its neighbours and
+    from the edge of the sheet.
+    """
+    if config is None:
+        config = {}
+
+    groups: Dict[Tuple[str, float], List[Layer]] = {}
+    for layer in layers:
+        groups.setdefault((layer.material, layer.thickness), []).append(layer)
+
+    sheets = []
+    for (material, thickness), group in sorted(groups.items()):
+        width, height = sheet_size(config, material, thickness)
+
+        # Place the largest layers first.
+        group = sorted(
+            group, key=lambda layer: (
+                -max(layer.width, layer.height) * layer.grid,
+                -min(layer.width, layer.height) * layer.grid,
+            ),
+        )
+
+        skylines: List[_Skyline] = []
+        group_sheets: List[Sheet] = []
+        for layer in group:
+            w = layer.width * layer.grid + spacing
+            h = layer.height * layer.grid + spacing
+
+            for skyline, sheet in zip(skylines, group_sheets):
+                if _place(skyline, sheet, layer, w, h, spacing):
+                    break
+            else:
+                skyline = _Skyline(width - spacing, height - spacing)
+                sheet = Sheet(material, thickness, width, height)
+                if not _place(skyline, sheet, layer, w, h, spacing):
+                    raise ValueError(
+                        f"layer {layer.name!r} does not fit on a "
+                        f"{width}x{height}mm sheet"
+                    )
+                skylines.append(skyline)
+                group_sheets.append(sheet)
+
+        sheets.extend(group_sheets)
+    return sheets
+
+
+def _place(skyline, sheet, layer, w, h, spacing) -> bool:
+    candidates = []
+    for rotation, (rw, rh) in ((R0, (w, h)), (R90, (h, w))):
+        position = skyline.find(rw, rh)
+        if position is not None:
+            x, y = position
+            candidates.append(((y + rh, x), rotation, x, y, rw, rh))
+    if not candidates:
+        return False
+
+    _, rotation, x, y, rw, rh = min(candidates, key=lambda c: c[0])
+    skyline.place(x, y, rw, rh)
+    sheet.placements.append(Placement(
+        layer=layer, x=x + spacing, y=y + spacing, rotation=rotation,
+    ))
+    return True
+
+
+def _placement_transform(placement: Placement) -> Transformation:
+    transformation = Transformation.translation(placement.x, placement.y)
+    if placement.rotation == R90:
+        # Turn clockwise as seen on the sheet, which swings the layer into
+        # negative x, then shift it back into its slot.
+        transformation = Transformation.translation(
+            placement.x + placement.width, placement.y,
+        ) @ Transformation.turn(R270)
+    return transformation
+
+
+def _sheet_toolpaths(sheet: Sheet) -> List[Tuple[int, PathBuilder]]:
+    # Every cut on the sheet in sheet coordinates, tagged with the index of
+    # the placement it belongs to.  The insides of all layers are cut before
+    # any of the outlines, so that no part comes loose while it is still
+    # being cut.
+    inner = []
+    outlines = []
+    for index, placement in enumerate(sheet.placements):
+        layer = placement.layer
+        transformation = _placement_transform(placement)
+
+        paths = list(_route_builders(layer))
+        for x, y, r in _isolated_holes(layer):
+            path = PathBuilder()
+            _write_hole(path, x, y, r)
+            paths.append(path)
+        outline = PathBuilder()
+        _write_outline(outline, layer)
+
+        for path in paths:
+            path.apply(transformation)
+            inner.append((index, path))
+        outline.apply(transformation)
+        outlines.append((index, outline))
+    return inner + outlines
+
+
+def _render_merged(svg, sheet: Sheet, *, compact: bool) -> CommonLines:
+    toolpaths = _sheet_toolpaths(sheet)
+    merged = merge_common_lines([path for _, path in toolpaths])
+
+    groups: List[List[PathBuilder]] = [[] for _ in sheet.placements]
+    for (index, _), path in zip(toolpaths, merged.paths):
+        if len(path):
+            groups[index].append(path)
+
+    for index, (placement, paths) in enumerate(
+        zip(sheet.placements, groups)
+    ):
+        attributes = {"id": f"layer{index}_{placement.layer.name}"}
+        if compact:
+            compound = PathBuilder()
+            for path in paths:
+                compound.extend(path)
+            svg.start("g", {**attributes, **_CUT_STYLE})
+            svg.start("path", {"d": compound.to_svg()})
+            svg.end("path")
+        else:
+            svg.start("g", attributes)
+            for path in paths:
+                svg.start("path", {"d": path.to_svg(), **_CUT_STYLE})
+                svg.end("path")
+        svg.end("g")
+    return merged
+
+
+def render_sheet(
+    sheet: Sheet, output, *, compact: bool = False,
+    common_lines: bool = False,
+) -> Optional[CommonLines]:
+    """Renders every layer placed on a sheet as a single cut file.
+
+    If `common_lines` is set, edges shared by neighbouring layers, such as
+    the outlines of layers nested without spacing, are only cut once.  The
+    paths are then written in sheet coordinates and the result of merging
+    them is returned, so the saving can be reported.
+    """
+    svg = xml.etree.ElementTree.TreeBuilder()
+
+    svg.start("svg", {
+        "version": "1.1",
+        "baseProfile": "full",
+        "width": f"{sheet.width}mm",
+        "height": f"{sheet.height}mm",
+        "viewBox": f"0 0 {sheet.width} {sheet.height}",
+        "xmlns": "http://www.w3.org/2000/svg",
+    })
+
+    merged = None
+    if common_lines:
+        merged = _render_merged(svg, sheet, compact=compact)
+    else:
+        for index, placement in enumerate(sheet.placements):
+            _render_layer_group(svg, placement.layer, {
+                "id": f"layer{index}_{placement.layer.name}",
+                "transform": _placement_transform(placement).to_svg(),
+            }, compact=compact)
+
+    svg.end("svg")
+    element = svg.close()
+    element_tree = xml.etree.ElementTree.ElementTree(element)
+
+    element_tree.write(output)
+    return merged
@@ -0,0 +1,257 @@
+"""
+Writing of rendered files, loose or bundled and optionally compressed.
+
+Compression is done in a pool of threads, and the files are written out in
+order by a thread of their own, so both overlap with rendering the next
+layer.  `zlib` does not hold the GIL while it compresses, so this works even
+though rendering is pure Python.
+"""
+import concurrent.futures
+import contextlib
+import gzip
+import io
+import os
+import pathlib
+import tarfile
+import zipfile
+from typing import List, Optional, Tuple, Union
+
+
+DEFAULT_LEVEL = 6
+
+BUNDLES = ('tar', 'zip')
+
+
+def _compress(data: bytes, level: int) -> bytes:
+    # The modification time and file name are left out so that the same
+    # drawing always compresses to the same bytes.  `gzip.compress` only
+    # takes `mtime` from Python 3.8.
+    output = io.BytesIO()
+    with gzip.GzipFile(
+        filename='', mode='wb', fileobj=output, compresslevel=level, mtime=0,
+    ) as compressed:
+        compressed.write(data)
+    return output.getvalue()
+
+
+def _temporary(path: pathlib.Path) -> pathlib.Path:
+    # Files are written under a hidden name next to where they belong, and
+    # only renamed into place once complete.
+    return path.with_name(f".{path.name}.part")
+
+
+def _unlink(path: pathlib.Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class _Directory(object):
+    def __init__(self, directory: pathlib.Path):
+        self.directory = directory
+        # Files that are complete, under their hidden names, waiting to be
+        # renamed into place when the writer is closed.
+        self.complete: List[Tuple[pathlib.Path, pathlib.Path]] = []
+
+    def add(self, name: str, data: bytes) -> None:
+        with self.open(name) as output:
+            output.write(data)
+
+    @contextlib.contextmanager
+    def open(self, name: str):
+        path = self.directory.joinpath(name)
+        temporary = _temporary(path)
+        try:
+            with open(temporary, 'wb') as output:
+                yield output
+        except BaseException:
+            _unlink(temporary)
+            raise
+        self.complete.append((temporary, path))
+
+    def close(self) -> None:
+        for temporary, path in self.complete:
+            os.replace(temporary, path)
+        self.complete = []
+
+    def abort(self) -> None:
+        for temporary, _ in self.complete:
+            _unlink(temporary)
+        self.complete = []
+
+
+class _Archive(object):
+    archive: Union[tarfile.TarFile, zipfile.ZipFile]
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.temporary = _temporary(path)
+
+    def close(self) -> None:
+        self.archive.close()
+        os.replace(self.temporary, self.path)
+
+    def abort(self) -> None:
+        try:
+            self.archive.close()
+        finally:
+            _unlink(self.temporary)
+
+
+class _Tar(_Archive):
+    def __init__(self, path: pathlib.Path):
+        super().__init__(path)
+        self.archive: tarfile.TarFile = tarfile.open(self.temporary, 'w')
+
+    def add(self, name: str, data: bytes) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = 0o644
+        self.archive.addfile(info, io.BytesIO(data))
+
+
+class _Zip(_Archive):
+    def __init__(self, path: pathlib.Path, *, level: int):
+        super().__init__(path)
+        self.archive: zipfile.ZipFile = zipfile.ZipFile(
+            self.temporary, 'w',
+        )
+        self.level = level
+
+    def add(self, name: str, data: bytes) -> None:
+        # Dated like the tar entries, so bundles are reproducible.  Files
+        # that are already compressed are only stored.
+        info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+        info.external_attr = 0o644 << 16
+        if name.endswith('.svgz'):
+            self.archive.writestr(info, data, zipfile.ZIP_STORED)
+        else:
+            self.archive.writestr(
+                info, data, zipfile.ZIP_DEFLATED, compresslevel=self.level,
+            )
+
+
+class OutputWriter(object):
+    """Writes the files for a design to a directory, either as they are or
+    bundled into a single `tar` or `zip` archive within it.
+
+    With `compress`, SVG files are gzipped and their names given an `.svgz`
+    suffix.  Use `filename` to find the name a file will be written under, so
+    that documents referring to one another use the right names.  Files are
+    written in the order they are given, and are only guaranteed to be
+    complete once the writer has been closed.
+
+    Files are written under hidden names and only put in place once the
+    writer is closed.  If the writer is aborted, or left by an exception,
+    those are removed again, so an interrupted render leaves behind neither
+    partial files nor a mix of old and new ones, and any files it would have
+    replaced are left as they were.
+    """
+
+    def __init__(
+        self, directory: pathlib.Path, *, bundle: Optional[str] = None,
+        compress: bool = False, level: int = DEFAULT_LEVEL,
+        workers: Optional[int] = None,
+    ):
+        if bundle not in (None, *BUNDLES):
+            raise ValueError(f"unknown bundle format: {bundle}")
+        self.compress = compress
+        self.level = level
+
+        directory.mkdir(parents=True, exist_ok=True)
+        self._sink: Union[_Directory, _Tar, _Zip]
+        if bundle == 'tar':
+            self.path = directory.joinpath('layers.tar')
+            self._sink = _Tar(self.path)
+        elif bundle == 'zip':
+            self.path = directory.joinpath('layers.zip')
+            self._sink = _Zip(self.path, level=level)
+        else:
+            self.path = directory
+            self._sink = _Directory(directory)
+
+        self._compressors = concurrent.futures.ThreadPoolExecutor(workers)
+        self._writer = concurrent.futures.ThreadPoolExecutor(1)
+        self._pending: List[concurrent.futures.Future] = []
+        self._compressing: List[concurrent.futures.Future] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def filename(self, name: str) -> str:
+        if self.compress and name.endswith('.svg'):
+            return name + 'z'
+        return name
+
+    def _add(
+        self, name: str, data: Union[bytes, concurrent.futures.Future],
+    ) -> None:
+        if isinstance(data, concurrent.futures.Future):
+            self._sink.add(name, data.result())
+        else:
+            self._sink.add(name, data)
+
+    def write(self, name: str, data: bytes) -> str:
+        """Queues a file to be written, and returns the name it will be
+        written under.
+        """
+        contents: Union[bytes, concurrent.futures.Future] = data
+        if self.filename(name) != name:
+            name = self.filename(name)
+            contents = self._compressors.submit(_compress, data, self.level)
+            self._compressing.append(contents)
+        self._pending.append(self._writer.submit(self._add, name, contents))
+
+        # Errors are raised as soon as they are noticed, rather than only
+        # when the writer is closed.
+        while self._pending and self._pending[0].done():
+            self._pending.pop(0).result()
+        self._compressing = [
+            future for future in self._compressing if not future.done()
+        ]
+        return name
+
+    @contextlib.contextmanager
+    def stream(self, name: str):
+        """Opens a file to be written directly, for files too large to hand
+        over in one piece.  Files in bundles are still held in memory until
+        they are complete.
+        """
+        if isinstance(self._sink, _Directory):
+            with self._sink.open(name) as output:
+                yield output
+        else:
+            output = io.BytesIO()
+            yield output
+            self.write(name, output.getvalue())
+
+    def close(self) -> None:
+        """Waits for every file to be written, and finishes the bundle."""
+        try:
+            for future in self._pending:
+                future.result()
+        except BaseException:
+            self.abort()
+            raise
+        self._pending = []
+        self._compressing = []
+        self._compressors.shutdown()
+        self._writer.shutdown()
+        self._sink.close()
+
+    def abort(self) -> None:
+        """Stops writing, and removes everything written so far."""
+        for future in self._pending + self._compressing:
+            future.cancel()
+        self._pending = []
+        self._compressing = []
+        self._compressors.shutdown()
+        self._writer.shutdown()
+        self._sink.abort()
@@ -0,0 +1,478 @@
+"""
+Numeric representation of cut paths.
+
+Paths are recorded as a compact array of command codes and a flat array of
+point coordinates, so they can be measured, transformed and written out in
+different formats without ever going through SVG path text.  Text is only
+produced by the serialisers at the very end.
+"""
+import math
+from array import array
+from typing import Iterator, Optional, Tuple
+
+from pcdl.grid import Angle, R0, R90, R180, R270
+
+
+MOVE = 0
+LINE = 1
+QUADRATIC = 2
+CUBIC = 3
+ARC = 4
+CLOSE = 5
+
+# Number of points stored for each command.
+_POINTS = {MOVE: 1, LINE: 1, QUADRATIC: 2, CUBIC: 3, ARC: 1, CLOSE: 0}
+
+# Arcs additionally store their radii, the rotation of their axis and the
+# SVG large arc and sweep flags.
+_ARC_PARAMETERS = 5
+
+_SVG_TEMPLATES = {
+    MOVE: "M %r,%r",
+    LINE: "L %r,%r",
+    QUADRATIC: "Q %r,%r %r,%r",
+    CUBIC: "C %r,%r %r,%r %r,%r",
+    ARC: "A %r,%r %g %d,%d %r,%r",
+    CLOSE: "Z",
+}
+
+# Curves are approximated by this many straight segments when measured or
+# written to formats that cannot represent them.
+_CURVE_SEGMENTS = 16
+
+
+def _arc_geometry(px, py, x, y, r, large, sweep):
+    """Finds the centre, radius, start angle and signed sweep angle of a
+    circular arc from `(px, py)` to `(x, y)`, following the SVG
+    implementation notes, appendix F.6.5.  Angles increase in the direction
+    of SVG's positive sweep.  Returns None for a degenerate arc.
+    """
+    hx = (px - x) / 2
+    hy = (py - y) / 2
+    half = math.hypot(hx, hy)
+    if not half:
+        return None
+
+    # Semicircles put the centre on the chord, where rounding error in the
+    # end points would otherwise swing it noticeably to one side.
+    r = r if r - half > 1e-9 * r else half
+    offset = math.sqrt(r * r - half * half) / half
+    if bool(large) == bool(sweep):
+        offset = -offset
+    cx = (px + x) / 2 + offset * hy
+    cy = (py + y) / 2 - offset * hx
+
+    a0 = math.atan2(py - cy, px - cx)
+    delta = math.atan2(y - cy, x - cx) - a0
+    if sweep and delta < 0:
+        delta += math.tau
+    elif not sweep and delta > 0:
+        delta -= math.tau
+    return cx, cy, r, a0, delta
+
+
+def _bezier(points, t):
+    # De Casteljau evaluation of a curve given as a list of (x, y) points.
+    while len(points) > 1:
+        points = [
+            (ax + (bx - ax) * t, ay + (by - ay) * t)
+            for (ax, ay), (bx, by) in zip(points, points[1:])
+        ]
+    return points[0]
+
+
+class PathBuilder(object):
+    """Records SVG style path commands as numbers.
+
+    Relative commands are converted to absolute ones as they are recorded.
+    Arcs are always circular, using `rx` as the radius.
+    """
+
+    def __init__(self):
+        self.codes = array('B')
+        self.points = array('d')
+        self.arcs = array('d')
+
+        self._x = 0.0
+        self._y = 0.0
+        self._start_x = 0.0
+        self._start_y = 0.0
+
+    def __len__(self):
+        return len(self.codes)
+
+    def close(self) -> str:
+        return self.to_svg()
+
+    def _point(self, x, y):
+        self.points.append(x)
+        self.points.append(y)
+        self._x = x
+        self._y = y
+
+    def move(self, dx, dy):
+        self.move_to(self._x + dx, self._y + dy)
+
+    def move_to(self, x, y):
+        self.codes.append(MOVE)
+        self._point(x, y)
+        self._start_x = x
+        self._start_y = y
+
+    def line(self, dx, dy):
+        self.line_to(self._x + dx, self._y + dy)
+
+    def line_to(self, x, y):
+        self.codes.append(LINE)
+        self._point(x, y)
+
+    def quadratic(self, dcx, dcy, dx, dy):
+        x, y = self._x, self._y
+        self.quadratic_to(x + dcx, y + dcy, x + dx, y + dy)
+
+    def quadratic_to(self, cx, cy, x, y):
+        self.codes.append(QUADRATIC)
+        self.points.extend((cx, cy))
+        self._point(x, y)
+
+    def cubic(self, dcax, dcay, dcbx, dcby, dx, dy):
+        x, y = self._x, self._y
+        self.cubic_to(
+            x + dcax, y + dcay, x + dcbx, y + dcby, x + dx, y + dy,
+        )
+
+    def cubic_to(self, cax, cay, cbx, cby, x, y):
+        self.codes.append(CUBIC)
+        self.points.extend((cax, cay, cbx, cby))
+        self._point(x, y)
+
+    def _arc(self, x, y, r, axis, large, sweep):
+        self.codes.append(ARC)
+        self.arcs.extend((r, r, axis, 1 if large else 0, sweep))
+        self._point(x, y)
+
+    def arc(self, dx, dy, rx, ry, axis=0, large=False, clockwise=True):
+        self._arc(
+            self._x + dx, self._y + dy, rx, axis, large,
+            1 if clockwise else 0,
+        )
+
+    def arc_to(self, x, y, rx, ry, axis=0, large=False, clockwise=True):
+        # The y axis is flipped in SVG.
+        self._arc(x, y, rx, axis, large, 0 if clockwise else 1)
+
+    def close_path(self):
+        self.codes.append(CLOSE)
+        self._x = self._start_x
+        self._y = self._start_y
+
+    def extend(self, other: 'PathBuilder') -> None:
+        """Appends every command of another path."""
+        self.codes.extend(other.codes)
+        self.points.extend(other.points)
+        self.arcs.extend(other.arcs)
+        self._x, self._y = other._x, other._y
+        self._start_x, self._start_y = other._start_x, other._start_y
+
+    def segments(self) -> Iterator[Tuple[int, Tuple[float, ...]]]:
+        """Yields each command as its code and a tuple of its arguments.
+
+        Every command starts with the current point, followed by its stored
+        points.  Arcs append their radius, large arc and sweep flags.  Close
+        commands carry the point they return to.
+        """
+        points = self.points
+        arcs = self.arcs
+        p = 0
+        a = 0
+        x = y = 0.0
+        start_x = start_y = 0.0
+        for code in self.codes:
+            if code == CLOSE:
+                yield code, (x, y, start_x, start_y)
+                x, y = start_x, start_y
+                continue
+
+            n = 2 * _POINTS[code]
+            args = (x, y, *points[p:p + n])
+            p += n
+            x, y = args[-2:]
+            if code == MOVE:
+                start_x, start_y = x, y
+            elif code == ARC:
+                args += (arcs[a], arcs[a + 3], arcs[a + 4])
+                a += _ARC_PARAMETERS
+            yield code, args
+
+    def contours(self) -> Iterator['PathBuilder']:
+        """Splits the path at each move into separate paths."""
+        # Offsets of each move into the code, point and arc arrays.
+        starts = []
+        p = 0
+        a = 0
+        for index, code in enumerate(self.codes):
+            if code == MOVE:
+                starts.append((index, p, a))
+            p += 2 * _POINTS[code]
+            if code == ARC:
+                a += _ARC_PARAMETERS
+        starts.append((len(self.codes), p, a))
+
+        for (c0, p0, a0), (c1, p1, a1) in zip(starts, starts[1:]):
+            contour = PathBuilder()
+            contour.codes = self.codes[c0:c1]
+            contour.points = self.points[p0:p1]
+            contour.arcs = self.arcs[a0:a1]
+            contour._start_x, contour._start_y = contour.points[:2]
+            if contour.codes[-1] == CLOSE:
+                contour._x, contour._y = contour.points[:2]
+            else:
+                contour._x, contour._y = contour.points[-2:]
+            yield contour
+
+    def transform(
+        self, *, scale: float = 1.0, rotation: Angle = R0,
+        offset: Tuple[float, float] = (0.0, 0.0),
+    ) -> None:
+        """Rotates, then scales, then offsets every point in place.
+
+        Only quarter turns and uniform scales are supported, which keeps arcs
+        circular and their sweep unchanged.
+        """
+        xx, xy, yx, yy = {
+            R0: (1, 0, 0, 1),
+            R90: (0, 1, -1, 0),
+            R180: (-1, 0, 0, -1),
+            R270: (0, -1, 1, 0),
+        }[rotation]
+        ox, oy = offset
+
+        points = self.points
+        xs = points[0::2]
+        ys = points[1::2]
+        points[0::2] = array('d', [
+            (xx * x + xy * y) * scale + ox for x, y in zip(xs, ys)
+        ])
+        points[1::2] = array('d', [
+            (yx * x + yy * y) * scale + oy for x, y in zip(xs, ys)
+        ])
+
+        radius = abs(scale)
+        arcs = self.arcs
+        arcs[0::_ARC_PARAMETERS] = array('d', [
+            r * radius for r in arcs[0::_ARC_PARAMETERS]
+        ])
+        arcs[1::_ARC_PARAMETERS] = array('d', [
+            r * radius for r in arcs[1::_ARC_PARAMETERS]
+        ])
+
+        def move(x, y):
+            return (
+                (xx * x + xy * y) * scale + ox,
+                (yx * x + yy * y) * scale + oy,
+            )
+
+        self._x, self._y = move(self._x, self._y)
+        self._start_x, self._start_y = move(self._start_x, self._start_y)
+
+    def apply(self, transformation) -> None:
+        """Applies a `pcdl.svg.Transformation` to every point in place.  Arc
+        radii are scaled with it and reflections reverse the sweep of arcs.
+        """
+        self.points = transformation.transform_points(self.points)
+
+        arcs = self.arcs
+        for index in (0, 1):
+            arcs[index::_ARC_PARAMETERS] = array('d', [
+                transformation.transform_distance(r)
+                for r in arcs[index::_ARC_PARAMETERS]
+            ])
+        if transformation.reflects:
+            arcs[4::_ARC_PARAMETERS] = array('d', [
+                1 - sweep for sweep in arcs[4::_ARC_PARAMETERS]
+            ])
+
+        self._x, self._y = transformation.transform_point((self._x, self._y))
+        self._start_x, self._start_y = transformation.transform_point(
+            (self._start_x, self._start_y),
+        )
+
+    def bounds(self) -> Optional[Tuple[float, float, float, float]]:
+        """Returns the exact `(x0, y0, x1, y1)` extent of the path, or None
+        if it is empty.
+        """
+        if not len(self.points):
+            return None
+
+        xs = self.points[0::2]
+        ys = self.points[1::2]
+        x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+
+        # Arcs can bulge past their end points where they cross an axis.
+        for code, args in self.segments():
+            if code != ARC:
+                continue
+            geometry = _arc_geometry(*args)
+            if geometry is None:
+                continue
+            cx, cy, r, a0, delta = geometry
+            lo, hi = sorted((a0, a0 + delta))
+            for quarter in range(
+                math.ceil(lo / (math.pi / 2)),
+                math.floor(hi / (math.pi / 2)) + 1,
+            ):
+                angle = quarter * math.pi / 2
+                x = cx + r * math.cos(angle)
+                y = cy + r * math.sin(angle)
+                x0, y0 = min(x0, x), min(y0, y)
+                x1, y1 = max(x1, x), max(y1, y)
+        return x0, y0, x1, y1
+
+    def length(self) -> float:
+        """Returns the total length drawn, excluding moves."""
+        total = 0.0
+        for code, args in self.segments():
+            if code == MOVE:
+                continue
+            elif code == ARC:
+                geometry = _arc_geometry(*args)
+                if geometry is not None:
+                    total += geometry[2] * abs(geometry[4])
+            elif code in (LINE, CLOSE):
+                total += math.hypot(args[2] - args[0], args[3] - args[1])
+            else:
+                points = _flatten(code, args)
+                for (ax, ay), (bx, by) in zip(points, points[1:]):
+                    total += math.hypot(bx - ax, by - ay)
+        return total
+
+    def to_svg(self) -> str:
+        """Formats the path as SVG path data."""
+        templates = [_SVG_TEMPLATES[code] for code in self.codes]
+        if not templates:
+            return ''
+
+        if not len(self.arcs):
+            return ' '.join(templates) % tuple(self.points)
+
+        # Interleave the arc parameters with the points of each arc.
+        values = []
+        points = self.points
+        arcs = self.arcs
+        p = 0
+        a = 0
+        for code in self.codes:
+            n = 2 * _POINTS[code]
+            if code == ARC:
+                values.extend(arcs[a:a + 3])
+                values.append(int(arcs[a + 3]))
+                values.append(int(arcs[a + 4]))
+                a += _ARC_PARAMETERS
+            values.extend(points[p:p + n])
+            p += n
+        return ' '.join(templates) % tuple(values)
+
+    def to_dxf(self, *, layer: str = "0") -> str:
+        """Formats the path as the entities section of an R12 DXF drawing.
+
+        DXF has its y axis pointing up, so the path is mirrored to keep it
+        the same way round as the SVG.  Curves are approximated by lines.
+        """
+        entities = []
+
+        def line(ax, ay, bx, by):
+            if (ax, ay) != (bx, by):
+                entities.append(
+                    f"0\nLINE\n8\n{layer}\n"
+                    f"10\n{ax!r}\n20\n{-ay!r}\n11\n{bx!r}\n21\n{-by!r}\n"
+                )
+
+        for code, args in self.segments():
+            if code in (LINE, CLOSE):
+                line(*args)
+            elif code == ARC:
+                geometry = _arc_geometry(*args)
+                if geometry is None:
+                    continue
+                cx, cy, r, a0, delta = geometry
+                # Negating y negates the angles too.  DXF arcs always run
+                # anticlockwise from the start angle to the end angle.
+                start, end = -a0, -(a0 + delta)
+                if delta > 0:
+                    start, end = end, start
+                entities.append(
+                    f"0\nARC\n8\n{layer}\n"
+                    f"10\n{cx!r}\n20\n{-cy!r}\n40\n{r!r}\n"
+                    f"50\n{math.degrees(start)!r}\n"
+                    f"51\n{math.degrees(end)!r}\n"
+                )
+            elif code in (QUADRATIC, CUBIC):
+                points = _flatten(code, args)
+                for (ax, ay), (bx, by) in zip(points, points[1:]):
+                    line(ax, ay, bx, by)
+
+        return (
+            "0\nSECTION\n2\nENTITIES\n" + ''.join(entities) +
+            "0\nENDSEC\n0\nEOF\n"
+        )
+
+    def to_gcode(self, *, feed: float, travel: Optional[float] = None) -> str:
+        """Formats the path as G-code for a laser cutter, with `feed` and
+        `travel` given in mm/min.  The laser is switched on with M3 for each
+        contour and off with M5 before moving to the next.
+
+        As with DXF the y axis is flipped.  Curves are approximated by lines.
+        """
+        lines = ["G21", "G90"]
+
+        def position(x, y):
+            return f"X{x:.4f} Y{-y:.4f}"
+
+        cutting = False
+        for code, args in self.segments():
+            if code == MOVE:
+                if cutting:
+                    lines.append("M5")
+                    cutting = False
+                rapid = f"G0 {position(*args[2:])}"
+                if travel is not None:
+                    rapid += f" F{travel:g}"
+                lines.append(rapid)
+                continue
+
+            if not cutting:
+                lines.append("M3")
+                cutting = True
+
+            if code in (LINE, CLOSE):
+                if args[:2] != args[2:4]:
+                    lines.append(f"G1 {position(*args[2:4])} F{feed:g}")
+            elif code == ARC:
+                geometry = _arc_geometry(*args)
+                if geometry is None:
+                    continue
+                cx, cy = geometry[:2]
+                px, py, x, y = args[:4]
+                # A positive sweep in SVG is clockwise once y is flipped.
+                command = "G2" if args[6] else "G3"
+                lines.append(
+                    f"{command} {position(x, y)} "
+                    f"I{cx - px:.4f} J{py - cy:.4f} F{feed:g}"
+                )
+            else:
+                for x, y in _flatten(code, args)[1:]:
+                    lines.append(f"G1 {position(x, y)} F{feed:g}")
+
+        if cutting:
+            lines.append("M5")
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(code, args):
+    points = [
+        (args[index], args[index + 1]) for index in range(0, len(args), 2)
+    ]
+    return [
+        _bezier(points, step / _CURVE_SEGMENTS)
+        for step in range(_CURVE_SEGMENTS + 1)
+    ]
@@ -0,0 +1,97 @@
+"""
+Progress reporting and cancellation for long running loads and renders.
+
+A `Progress` is passed down through loading and rendering, which report to it
+at natural boundaries: each frame decoded, each column of pixels scanned,
+each contour traced and each block of output written.  Every report is also
+a chance to cancel, so a job stops soon after `cancel` is called, from any
+thread, by raising `Cancelled` out of whatever it was doing.  Where no
+`Progress` is given none of this is done at all.
+"""
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+
+# Stages reported, each with a count of what has been done so far and, where
+# it is known, the total.
+FRAMES = 'frames'
+COLUMNS = 'columns'
+CONTOURS = 'contours'
+BYTES = 'bytes'
+
+# Bytes written between reports.
+_BYTES_INTERVAL = 1 << 16
+
+T = TypeVar('T')
+
+
+class Cancelled(Exception):
+    """Raised from within a job that has been cancelled."""
+    pass
+
+
+class Progress(object):
+    """Receives progress reports from a job and can cancel it.
+
+    `callback` is called as `callback(stage, done, total)` from the thread
+    doing the work, with `total` as `None` where it is not known in advance.
+    Counts for `columns`, `contours` and `bytes` start again for each layer
+    or file.
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[str, int, Optional[int]], None]] = None,
+    ):
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """Asks the job to stop at the next report."""
+        self.cancelled = True
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise Cancelled()
+
+    def report(
+        self, stage: str, done: int, total: Optional[int] = None,
+    ) -> None:
+        self.check()
+        if self.callback is not None:
+            self.callback(stage, done, total)
+
+    def iterate(
+        self, stage: str, items: Iterable[T], total: Optional[int] = None,
+    ) -> Iterator[T]:
+        """Passes items through, reporting after each one."""
+        self.check()
+        for done, item in enumerate(items, 1):
+            yield item
+            self.report(stage, done, total)
+
+
+class ProgressWriter(object):
+    """Wraps a binary file object, reporting the number of bytes written to
+    it every so often.
+    """
+
+    def __init__(self, output, progress: Progress):
+        self.output = output
+        self.progress = progress
+        self.written = 0
+        self._reported = 0
+
+    def write(self, data) -> int:
+        self.progress.check()
+        count = self.output.write(data)
+        self.written += len(data)
+        if self.written - self._reported >= _BYTES_INTERVAL:
+            self._reported = self.written
+            self.progress.report(BYTES, self.written)
+        return count
+
+    def flush(self) -> None:
+        self.output.flush()
+        if self.written != self._reported:
+            self._reported = self.written
+            self.progress.report(BYTES, self.written)
@@ -0,0 +1,199 @@
+"""
+Rendering of whole designs in memory.
+
+Nothing here touches the file system or any global state, so designs can be
+rendered concurrently from many threads, each with its own description but
+sharing a single parsed `pcdl.config.Config`.
+"""
+import hashlib
+import io
+import pathlib
+import xml.etree.ElementTree
+from typing import Dict, Iterator, List, Optional, Sequence
+from xml.etree.ElementTree import Element
+
+from pcdl.config import Config
+from pcdl.layers import Layer
+from pcdl.load import _build_layers, _decode_design, load_design
+from pcdl.path import PathBuilder
+from pcdl.progress import Progress
+from pcdl.svg import (
+    _composite_document, _inline_group, _layer_document, _layer_group,
+    _route_builders,
+)
+
+
+def layer_filename(index: int, layer: Layer) -> str:
+    return (
+        f"layer{index}_{layer.name}_{layer.material}_{layer.thickness}mm.svg"
+    )
+
+
+def layer_digest(layer: Layer) -> bytes:
+    """Hashes everything about a layer that ends up in its cut file: its
+    size, holes and links, but not its name, material or thickness.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((layer.width, layer.height, layer.grid)).encode())
+    digest.update(repr(sorted(
+        (tuple(hole.position), hole.radius) for hole in layer.holes()
+    )).encode())
+    digest.update(repr(sorted(
+        (tuple(link.a), tuple(link.b), link.radius) for link in layer.links()
+    )).encode())
+    return digest.digest()
+
+
+def shared_layers(layers: Sequence[Layer]) -> List[int]:
+    """Returns, for each layer, the index of the first layer with the same
+    cut file, which is its own index unless it repeats an earlier layer.
+    """
+    first: Dict[bytes, int] = {}
+    return [
+        first.setdefault(layer_digest(layer), index)
+        for index, layer in enumerate(layers)
+    ]
+
+
+def _to_bytes(element) -> bytes:
+    output = io.BytesIO()
+    xml.etree.ElementTree.ElementTree(element).write(output)
+    return output.getvalue()
+
+
+class Rendering(object):
+    """The cut files for every layer of a design, keyed by the filename that
+    `render.py` would have written them to, and a composite of all layers
+    with the layers inlined.
+    """
+
+    def __init__(self, layers: Dict[str, bytes], composite: bytes):
+        self.layers = layers
+        self.composite = composite
+
+
+def render_design(
+    description, *, config, compact: bool = False,
+    processes: Optional[int] = None, progress: Optional[Progress] = None,
+) -> Rendering:
+    """Renders a design given as GIF or TIFF encoded bytes, or as a path.
+
+    Each layer is traced once and the result shared between its own document
+    and the composite.  Layers that repeat an earlier layer are not traced at
+    all: they share its document, and the composite refers back to it.
+
+    A `pcdl.progress.Progress` given as `progress` is passed on to loading
+    and tracing.  A cancelled render raises `pcdl.progress.Cancelled`.
+    """
+    layers = load_design(description, config=config, progress=progress)
+    return _assemble(layers, lambda layer, index: _layer_group(
+        layer, {"id": "root"}, compact=compact, processes=processes,
+        progress=progress,
+    ))
+
+
+def _assemble(layers: Sequence[Layer], group) -> Rendering:
+    # Renders the layers with the group that `group(layer, index)` gives for
+    # each, which is only asked for the first of any repeated layers.
+    rendered: Dict[str, bytes] = {}
+    children: List[Element] = []
+    documents: List[bytes] = []
+    for index, (layer, first) in enumerate(zip(
+        layers, shared_layers(layers),
+    )):
+        id = f"layer{index}_{layer.name}"
+        if first != index:
+            documents.append(documents[first])
+            children.append(Element("use", {
+                "id": id, "href": f"#{children[first].get('id')}",
+            }))
+        else:
+            element = group(layer, index)
+            documents.append(_to_bytes(_layer_document(layer, element)))
+            children.append(_inline_group(element, id))
+        rendered[layer_filename(index, layer)] = documents[index]
+
+    composite = _to_bytes(_composite_document(
+        children,
+        width=layers[0].width, height=layers[0].height, grid=layers[0].grid,
+    ))
+    return Rendering(rendered, composite)
+
+
+def _scaled(path: PathBuilder, grid: float) -> PathBuilder:
+    scaled = PathBuilder()
+    scaled.extend(path)
+    scaled.transform(scale=grid)
+    return scaled
+
+
+def variant_directories(paths: Sequence[pathlib.Path]) -> List[str]:
+    """Returns the name of the directory that the rendering for each variant
+    config is written to, which is its file name without the suffix.
+
+    Raises `ValueError` if two configs would be written to the same
+    directory, such as `a/fast.toml` and `b/fast.toml`.
+    """
+    seen: Dict[str, pathlib.Path] = {}
+    for path in paths:
+        other = seen.setdefault(path.stem, path)
+        if other is not path:
+            raise ValueError(
+                f"variants {other} and {path} would both be written to "
+                f"{path.stem}"
+            )
+    return list(seen)
+
+
+def render_variants(
+    description, configs: Sequence[Config], *, compact: bool = False,
+    processes: Optional[int] = None, workers: Optional[int] = None,
+) -> Iterator[Rendering]:
+    """Renders a design once for each of several configs, which may differ in
+    grid pitch, channel radii and layer details, but must describe the same
+    layers with the same channel colours.  Yields a rendering for each config
+    in turn.
+
+    The frames are decoded and the routes traced once, on a grid of unit
+    pitch.  Each variant only scales the traced routes and writes them out,
+    which gives exactly the same documents as rendering it on its own.
+
+    Raises `ValueError` straight away if the configs have different numbers
+    of layers or channels, as the colour of each channel is read from the
+    same pixel of every frame.
+    """
+    configs = list(configs)
+    for index, config in enumerate(configs[1:], 1):
+        for key in ('layers', 'channels'):
+            if len(config[key]) != len(configs[0][key]):
+                raise ValueError(
+                    f"variant {index} has {len(config[key])} {key} but "
+                    f"variant 0 has {len(configs[0][key])}"
+                )
+    return _render_variants(
+        description, configs, compact=compact, processes=processes,
+        workers=workers,
+    )
+
+
+def _render_variants(
+    description, configs: List[Config], *, compact: bool,
+    processes: Optional[int], workers: Optional[int],
+) -> Iterator[Rendering]:
+    frames = _decode_design(description, config=configs[0], workers=workers)
+
+    # Routes are traced with everything measured in grid cells.
+    unit = _build_layers(frames, config=Config({**configs[0], 'grid': 1.0}))
+    shared = shared_layers(unit)
+    routes = {
+        index: list(_route_builders(layer, processes=processes))
+        for index, layer in enumerate(unit) if shared[index] == index
+    }
+
+    for config in configs:
+        layers = _build_layers(frames, config=config)
+        yield _assemble(layers, lambda layer, index: _layer_group(
+            layer, {"id": "root"}, compact=compact, routes=[
+                _scaled(path, layer.grid) for path in routes[shared[index]]
+            ],
+        ))
@@ -0,0 +1,186 @@
+"""
+Incremental retracing of the routes in a layer.
+
+Whether a half edge exists depends only on the links within a couple of nodes
+of it, and so does the half edge that follows it around a contour.  After an
+edit, only the contours passing near a changed node can be different.  The
+tracer keeps the contours of the last trace, drops those near the changes,
+and traces the half edges they leave behind again.  The result is the same
+as tracing the whole layer from scratch.
+"""
+import xml.etree.ElementTree
+from typing import Dict, List, Set
+
+from pcdl.grid import Coordinate2, Vector2, UP, RIGHT, DOWN, LEFT
+from pcdl.layers import Layer
+from pcdl.path import PathBuilder
+from pcdl.svg import (
+    _HalfEdge, _half_edges, _hedge_key, _layer_document, _layer_group,
+    _next_edge, _trace_contours, _turn_left, _write_contour,
+)
+
+
+_STEPS = [Vector2.unit_vector(direction) for direction in (
+    UP, RIGHT, DOWN, LEFT,
+)]
+
+# Half edges leaving nodes this close to a change may have been added or
+# removed.
+_MEMBERSHIP_DISTANCE = 2
+
+# Half edges leaving nodes this close to a change may have a different half
+# edge following them.
+_SUCCESSOR_DISTANCE = _MEMBERSHIP_DISTANCE + 1
+
+
+def _around(cells: Set[Coordinate2], distance: int) -> Set[Coordinate2]:
+    around = set()
+    for cell in cells:
+        for dx in range(-distance, distance + 1):
+            for dy in range(-distance, distance + 1):
+                around.add(Coordinate2(cell.x + dx, cell.y + dy))
+    return around
+
+
+def _leaving(cells: Set[Coordinate2]):
+    for cell in cells:
+        for step in _STEPS:
+            yield _HalfEdge(cell, cell + step)
+
+
+class _Unstitchable(Exception):
+    # Raised when the retraced half edges do not close into contours of their
+    # own, which only happens in layers with dead ends.
+    pass
+
+
+class IncrementalTracer(object):
+    """Keeps the traced routes of a layer up to date as it is edited.
+
+    Changes are picked up from a journal on the layer the next time the paths
+    are asked for.  Layers with dead ends, where contours do not close, are
+    traced from scratch after every change.
+    """
+
+    def __init__(self, layer: Layer):
+        self.layer = layer
+        self._journal = layer.journal()
+        self._trace()
+
+    def _trace(self) -> None:
+        self._hedges = _half_edges(self.layer)
+        self._contours: Dict[tuple, List[_HalfEdge]] = {}
+        self._paths: Dict[tuple, PathBuilder] = {}
+        self._owners: Dict[_HalfEdge, tuple] = {}
+
+        # Only layers in which every contour closes can be retraced in part.
+        self._closed = True
+        for contour in _trace_contours(self._hedges):
+            if contour[-1] != contour[0] or len(contour) < 2:
+                self._closed = False
+            self._add(contour)
+
+    def _add(self, contour: List[_HalfEdge]) -> None:
+        key = _hedge_key(contour[0])
+        path = PathBuilder()
+        _write_contour(path, contour, self.layer.grid)
+        self._contours[key] = contour
+        self._paths[key] = path
+        for hedge in contour:
+            self._owners[hedge] = key
+
+    def _remove(self, key: tuple) -> List[_HalfEdge]:
+        contour = self._contours.pop(key)
+        del self._paths[key]
+        for hedge in contour:
+            self._owners.pop(hedge, None)
+        return contour
+
+    def _linked(self, a: Coordinate2, b: Coordinate2) -> bool:
+        return b in self.layer.connected(a)
+
+    def update(self) -> int:
+        """Retraces the contours near any changes since the last update.
+        Returns the number of contours that were traced.
+        """
+        dirty = self._journal.take()
+        if not dirty:
+            return 0
+
+        if not self._closed:
+            self._trace()
+            return len(self._contours)
+
+        # Bring the set of half edges up to date, with the same rule as
+        # `svg._link_half_edges`.
+        nearby = _around(dirty, _MEMBERSHIP_DISTANCE)
+        for hedge in _leaving(nearby):
+            redge = _turn_left(_turn_left(hedge))
+            if (
+                self._linked(hedge.src, hedge.tgt) and
+                not self._linked(redge.src, redge.tgt)
+            ):
+                self._hedges.add(hedge)
+            else:
+                self._hedges.discard(hedge)
+
+        affected = {
+            self._owners[hedge]
+            for hedge in _leaving(_around(dirty, _SUCCESSOR_DISTANCE))
+            if hedge in self._owners
+        }
+        pending = set()
+        for key in affected:
+            pending.update(self._remove(key))
+        pending.update(
+            hedge for hedge in _leaving(nearby) if hedge not in self._owners
+        )
+        pending &= self._hedges
+
+        try:
+            contours = self._retrace(pending)
+        except _Unstitchable:
+            self._trace()
+            return len(self._contours)
+
+        for contour in contours:
+            self._add(contour)
+        return len(contours)
+
+    def _retrace(self, pending: Set[_HalfEdge]) -> List[List[_HalfEdge]]:
+        contours = []
+        visited = set()
+        for start in sorted(pending, key=_hedge_key):
+            if start in visited:
+                continue
+
+            contour = [start]
+            visited.add(start)
+            hedge = _next_edge(self._hedges, start)
+            while hedge != start:
+                if hedge not in pending or hedge in visited:
+                    raise _Unstitchable()
+                contour.append(hedge)
+                visited.add(hedge)
+                hedge = _next_edge(self._hedges, hedge)
+            contour.append(start)
+            contours.append(contour)
+        return contours
+
+    def paths(self) -> List[PathBuilder]:
+        """Returns one path per contour, identical to and in the same order
+        as those produced by tracing the whole layer.
+        """
+        self.update()
+        return [self._paths[key] for key in sorted(self._paths)]
+
+    def render_layer(self, output, *, compact: bool = False) -> None:
+        """Renders the layer exactly as `pcdl.svg.render_layer` would."""
+        group = _layer_group(
+            self.layer, {"id": "root"}, compact=compact, routes=self.paths(),
+        )
+        element_tree = xml.etree.ElementTree.ElementTree(
+            _layer_document(self.layer, group),
+        )
+
+        element_tree.write(output)
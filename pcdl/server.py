@@ -0,0 +1,243 @@
+"""
+Local HTTP server for browsing tiled previews of a design.
+
+The server watches the design, which can be anything `pcdl.load_design`
+accepts, and reloads it whenever it changes.  Only the tiles of frames whose
+pixels actually changed are invalidated.  Tiles are also keyed by the parts
+of the config that affect each layer, and by `pcdl.tiles.TILE_VERSION`, so
+that tiles cached on disk are not served for a different config or by a
+different renderer.
+Tiles are rendered on demand in a pool of worker threads so that many can be
+served at once.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from pcdl.layers import Layer
+from pcdl.load import _build_layers, _decode_design
+from pcdl.tiles import (
+    TILE_SIZE, TILE_VERSION, TileCache, frame_digests, layer_colour, max_zoom,
+    render_tile,
+)
+
+
+_TILE_PATH = re.compile(r'^/tiles/(\d+)/(\d+)/(\d+)/(\d+)\.png$')
+
+_VIEWER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>pcdl preview</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; background: #fff; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+fetch('/layers.json').then(r => r.json()).then(stack => {
+  const map = L.map('map', {crs: L.CRS.Simple, minZoom: 0});
+  const overlays = {};
+  stack.layers.forEach((layer, index) => {
+    overlays[layer.name] = L.tileLayer(`/tiles/${index}/{z}/{x}/{y}.png`, {
+      tileSize: stack.tile_size, maxZoom: layer.max_zoom,
+      maxNativeZoom: layer.max_zoom, opacity: 0.6, noWrap: true,
+    }).addTo(map);
+  });
+  L.control.layers(null, overlays).addTo(map);
+  map.setView(map.unproject([stack.tile_size / 2, stack.tile_size / 2], 0), 1);
+});
+</script>
+</body>
+</html>
+"""
+
+
+def _modified(path) -> int:
+    # A directory is only touched when files are added or removed, so the
+    # images within it are checked as well.
+    modified = os.stat(path).st_mtime_ns
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            modified = max(modified, entry.stat().st_mtime_ns)
+    return modified
+
+
+def _tile_key(config, index: int, frame_digest: str) -> str:
+    # Everything that goes into the tiles of one layer: the pixels of its
+    # frame, the parts of the config used to build it, and the renderer.
+    settings = {
+        'grid': config.get('grid'),
+        'channels': config['channels'],
+        'layer': config['layers'][index],
+    }
+    digest = hashlib.sha1()
+    digest.update(f"{TILE_VERSION}-{frame_digest}".encode())
+    digest.update(json.dumps(settings, sort_keys=True, default=dict).encode())
+    return f"{index}-{digest.hexdigest()}"
+
+
+class PreviewServer(object):
+
+    def __init__(
+        self, filename, *, config,
+        cache: Optional[TileCache] = None, workers: Optional[int] = None,
+    ):
+        self.filename = filename
+        self.config = config
+        self.cache = cache if cache is not None else TileCache()
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+        self._mtime = None
+        self._layers: List[Layer] = []
+        self._keys: List[str] = []
+        self._reload_lock = None
+        self._pending: Dict[tuple, asyncio.Future] = {}
+
+    def _load(self):
+        frames = _decode_design(self.filename, config=self.config)
+        digests = frame_digests(frames)
+        layers = _build_layers(frames, config=self.config)
+        return layers, [
+            _tile_key(self.config, index, digest)
+            for index, digest in enumerate(digests)
+        ]
+
+    async def _refresh(self):
+        loop = asyncio.get_running_loop()
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+
+        async with self._reload_lock:
+            mtime = _modified(self.filename)
+            if mtime == self._mtime:
+                return
+
+            layers, keys = await loop.run_in_executor(
+                self._executor, self._load,
+            )
+
+            # Keep layers whose frames did not change so that their spatial
+            # indexes stay warm.
+            previous = dict(zip(self._keys, self._layers))
+            self._layers = [
+                previous.get(key, layer) for key, layer in zip(keys, layers)
+            ]
+            self._keys = keys
+            self._mtime = mtime
+
+            await loop.run_in_executor(
+                self._executor, self.cache.retain, keys,
+            )
+
+    async def _tile(self, index, z, x, y):
+        layer = self._layers[index]
+        key = (self._keys[index], z, x, y)
+
+        tile = self.cache.get(key)
+        if tile is not None:
+            return tile
+
+        # Share a single render between concurrent requests for a tile.
+        if key not in self._pending:
+            loop = asyncio.get_running_loop()
+            self._pending[key] = loop.run_in_executor(
+                self._executor, self._render, key, layer, index,
+            )
+        try:
+            return await self._pending[key]
+        finally:
+            self._pending.pop(key, None)
+
+    def _render(self, key, layer, index):
+        _, z, x, y = key
+        tile = render_tile(layer, z, x, y, colour=layer_colour(index))
+        self.cache.put(key, tile)
+        return tile
+
+    def _stack(self):
+        return {
+            'tile_size': TILE_SIZE,
+            'layers': [
+                {
+                    'name': layer.name,
+                    'width': layer.width,
+                    'height': layer.height,
+                    'max_zoom': max_zoom(layer),
+                }
+                for layer in self._layers
+            ],
+        }
+
+    async def _respond(self, path):
+        if path == '/':
+            return 200, 'text/html; charset=utf-8', _VIEWER.encode()
+
+        await self._refresh()
+
+        if path == '/layers.json':
+            return 200, 'application/json', json.dumps(self._stack()).encode()
+
+        match = _TILE_PATH.match(path)
+        if match is None:
+            return 404, 'text/plain', b'not found'
+
+        index, z, x, y = (int(group) for group in match.groups())
+        if index >= len(self._layers):
+            return 404, 'text/plain', b'no such layer'
+        if z > max_zoom(self._layers[index]) or max(x, y) >= 2 ** z:
+            return 404, 'text/plain', b'no such tile'
+
+        return 200, 'image/png', await self._tile(index, z, x, y)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+
+            try:
+                method, path, _ = request.decode('latin-1').split(' ', 2)
+            except ValueError:
+                status, content_type, body = 400, 'text/plain', b'bad request'
+            else:
+                if method != 'GET':
+                    status, content_type, body = (
+                        405, 'text/plain', b'method not allowed'
+                    )
+                else:
+                    status, content_type, body = await self._respond(
+                        path.split('?', 1)[0],
+                    )
+
+            writer.write(
+                f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Cache-Control: no-cache\r\n"
+                f"Connection: close\r\n"
+                f"\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = 'localhost', port: int = 8000):
+        await self._refresh()
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+}
@@ -0,0 +1,39 @@
+"""
+Grouping of items into disjoint sets.
+"""
+import collections
+from typing import Dict, Hashable, List
+
+
+class DisjointSet(object):
+    """Groups items into sets that can be merged, with path halving so that
+    finding the set an item belongs to stays cheap.
+    """
+
+    def __init__(self) -> None:
+        self._parent: Dict[Hashable, Hashable] = {}
+
+    def __contains__(self, item):
+        return item in self._parent
+
+    def add(self, item):
+        self._parent.setdefault(item, item)
+
+    def find(self, item):
+        parent = self._parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a = self.find(a)
+        b = self.find(b)
+        if a != b:
+            self._parent[b] = a
+
+    def groups(self) -> List[list]:
+        groups = collections.defaultdict(list)
+        for item in self._parent:
+            groups[self.find(item)].append(item)
+        return list(groups.values())
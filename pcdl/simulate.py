@@ -0,0 +1,391 @@
+"""
+Switch level simulation of pneumatic circuits.
+
+A circuit is recognised from the named layers of a stack as returned by
+`load_design`:
+
+  - Channels in the `bottom` and `top` layers are grouped into nets, with each
+    connected set of linked nodes forming a single net.
+  - Holes cut through the `membrane` are vias.  They join whatever channels
+    and wells they pass through.
+  - Connected regions of the `wells` layer that contain a via simply join the
+    bottom-layer channels that open into them.  Every other region is a
+    valve.  The bottom-layer nets that open into the well are its channels,
+    and the top-layer net that passes over the membrane covering it is its
+    gate.
+
+Every layer with one of these names takes part, and layers are told apart by
+their position in the stack rather than by name.
+
+Valves are normally closed and open while their gate is asserted.  A valve
+without a gate is always open.
+
+Values are resolved at the switch level.  A net takes the value of any input
+that it is connected to through open valves.  If it is not connected to an
+input it takes the value of any pull that it is connected to, and otherwise
+keeps whatever value was trapped in it when it was last isolated.  Nets that
+are driven to both values at once are flagged as conflicted.
+
+Only the part of the circuit reached from an input that has changed, or
+from a valve that has just switched, is resolved again at each step, so a
+change rippling through a large circuit costs little more than the nets it
+reaches.
+
+Simulations are run in lanes, with each value stored as an integer bit mask
+holding one bit per lane.  This lets many independent sets of stimuli be
+evaluated with the same number of Python operations as one.
+"""
+import collections
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pcdl.grid import Coordinate2
+from pcdl.sets import DisjointSet
+
+
+class SimulationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Valve(object):
+    position: Coordinate2
+    channels: Tuple[int, ...]
+    gate: Optional[int]
+
+
+class Circuit(object):
+    """Describes the nets and valves of a layer stack.
+
+    Layers are told apart by their index in the stack, so a stack may have
+    more than one layer with the same name.  Nets are identified by
+    consecutive integers.
+    """
+
+    def __init__(self, layers):
+        self._indexes: Dict[str, List[int]] = collections.defaultdict(list)
+        for index, layer in enumerate(layers):
+            self._indexes[layer.name].append(index)
+        bottoms = self._indexes.get('bottom', [])
+        tops = self._indexes.get('top', [])
+        channels = bottoms + tops
+
+        nodes = DisjointSet()
+        for index in channels:
+            layer = layers[index]
+            for cell in layer.cells():
+                nodes.add((index, cell))
+            for link in layer.links():
+                nodes.union((index, link.a), (index, link.b))
+
+        vias = set()
+        for index in self._indexes.get('membrane', []):
+            vias.update(layers[index].cells())
+
+        regions = DisjointSet()
+        for index in self._indexes.get('wells', []):
+            wells = layers[index]
+            for cell in wells.cells():
+                regions.add((index, cell))
+            for link in wells.links():
+                regions.union((index, link.a), (index, link.b))
+
+        # Wells that are reached by a via are just part of a net.
+        chambers = []
+        for region in regions.groups():
+            if vias.isdisjoint(cell for _, cell in region):
+                chambers.append(sorted(
+                    (cell for _, cell in region), key=tuple,
+                ))
+                continue
+
+            for node in region:
+                nodes.add(node)
+                nodes.union(region[0], node)
+                for index in bottoms:
+                    if (index, node[1]) in nodes:
+                        nodes.union(node, (index, node[1]))
+
+        layered = sorted(channels + self._indexes.get('wells', []))
+        for cell in vias:
+            present = [
+                (index, cell) for index in layered if (index, cell) in nodes
+            ]
+            for node in present[1:]:
+                nodes.union(present[0], node)
+
+        self._nets: Dict[Tuple[int, Coordinate2], int] = {}
+        for net, group in enumerate(
+            sorted(nodes.groups(), key=lambda group: min(
+                (index, tuple(cell)) for index, cell in group
+            ))
+        ):
+            for node in group:
+                self._nets[node] = net
+        self.nets: int = len(set(self._nets.values()))
+
+        self.valves: List[Valve] = []
+        for chamber in chambers:
+            channels = sorted({
+                self._nets[(index, cell)]
+                for cell in chamber for index in bottoms
+                if (index, cell) in self._nets
+            })
+            gates = {
+                self._nets[(index, cell)]
+                for cell in chamber for index in tops
+                if (index, cell) in self._nets
+            }
+            if len(gates) > 1:
+                raise SimulationError(
+                    f"well at {tuple(chamber[0])} is covered by more than "
+                    f"one gate"
+                )
+            if len(channels) < 2:
+                # A dead end chamber can't switch anything.
+                continue
+            self.valves.append(Valve(
+                position=chamber[0],
+                channels=tuple(channels),
+                gate=gates.pop() if gates else None,
+            ))
+
+    def _index(self, layer) -> int:
+        if isinstance(layer, int):
+            return layer
+        indexes = self._indexes.get(layer, [])
+        if len(indexes) > 1:
+            raise SimulationError(
+                f"more than one layer is named {layer!r}, so it has to be "
+                f"given by its index"
+            )
+        if not indexes:
+            raise SimulationError(f"no layer is named {layer!r}")
+        return indexes[0]
+
+    def net_at(self, layer, position: Coordinate2) -> int:
+        """Returns the net passing through a node on a layer, which is given
+        either by its index in the stack or by its name if that is unique.
+        """
+        try:
+            return self._nets[(self._index(layer), position)]
+        except KeyError:
+            raise SimulationError(
+                f"no net at ({position.x}, {position.y}) on layer {layer!r}"
+            ) from None
+
+
+class Simulator(object):
+    """Event driven switch level simulator for a `Circuit`."""
+
+    def __init__(self, circuit: Circuit, *, lanes: int = 1):
+        self.circuit = circuit
+        self.lanes = lanes
+        self._mask = (1 << lanes) - 1
+
+        nets = circuit.nets
+        self._drive_high = [0] * nets
+        self._drive_low = [0] * nets
+        self._pull_high = [0] * nets
+        self._pull_low = [0] * nets
+
+        self._value = [0] * nets
+        self._conflict = [0] * nets
+
+        # Valves that connect each net to its neighbours.
+        self._adjacent: List[List[Tuple[int, int]]] = [
+            [] for _ in range(nets)
+        ]
+        # Valves that are switched by each net.
+        self._gated: List[List[int]] = [[] for _ in range(nets)]
+        self._open = []
+        for index, valve in enumerate(circuit.valves):
+            first, *rest = valve.channels
+            for other in rest:
+                self._adjacent[first].append((index, other))
+                self._adjacent[other].append((index, first))
+            if valve.gate is None:
+                self._open.append(self._mask)
+            else:
+                self._open.append(0)
+                self._gated[valve.gate].append(index)
+
+        # Nets whose inputs have changed since the circuit last settled.
+        # Only the nets connected to these are resolved again.
+        self._dirty = set(range(nets))
+
+    def drive(self, net: int, value: int) -> None:
+        """Connects a net to an input.  Each bit of `value` sets the level of
+        the input in the corresponding lane.
+        """
+        self._drive_high[net] = value & self._mask
+        self._drive_low[net] = ~value & self._mask
+        self._dirty.add(net)
+
+    def release(self, net: int) -> None:
+        self._drive_high[net] = 0
+        self._drive_low[net] = 0
+        self._dirty.add(net)
+
+    def pull(self, net: int, value: int) -> None:
+        """Weakly connects a net to a supply.  Pulls are overridden by any
+        input that the net is connected to.
+        """
+        self._pull_high[net] = value & self._mask
+        self._pull_low[net] = ~value & self._mask
+        self._dirty.add(net)
+
+    def value(self, net: int) -> int:
+        return self._value[net]
+
+    def conflict(self, net: int) -> int:
+        """Returns a mask of the lanes in which a net is driven both high and
+        low.
+        """
+        return self._conflict[net]
+
+    def _region(self, nets, was_open: Dict[int, int]) -> List[int]:
+        # Every net connected to one of `nets` through a valve that conducts
+        # in any lane, or did before the valves in `was_open` switched.
+        # Nothing outside of this can have been affected.
+        region = set(nets)
+        queue = collections.deque(region)
+        while queue:
+            net = queue.popleft()
+            for valve, other in self._adjacent[net]:
+                if other in region:
+                    continue
+                if self._open[valve] | was_open.get(valve, 0):
+                    region.add(other)
+                    queue.append(other)
+        return sorted(region)
+
+    def _spread(self, region, high, low):
+        high = {net: high[net] for net in region}
+        low = {net: low[net] for net in region}
+        queue = collections.deque(
+            net for net in region if high[net] | low[net]
+        )
+        while queue:
+            net = queue.popleft()
+            for valve, other in self._adjacent[net]:
+                conducting = self._open[valve]
+                if not conducting:
+                    continue
+                new_high = high[net] & conducting & ~high[other]
+                new_low = low[net] & conducting & ~low[other]
+                if new_high or new_low:
+                    high[other] |= new_high
+                    low[other] |= new_low
+                    queue.append(other)
+        return high, low
+
+    def _resolve(self, region) -> List[int]:
+        # Resolves the nets in a region, which is closed under conduction,
+        # and returns those whose value changed.
+        high, low = self._spread(region, self._drive_high, self._drive_low)
+        pull_high, pull_low = self._spread(
+            region, self._pull_high, self._pull_low,
+        )
+
+        changed = []
+        for net in region:
+            strong = high[net] ^ low[net]
+            weak = (pull_high[net] ^ pull_low[net]) & ~(high[net] | low[net])
+            held = ~(strong | weak) & self._mask
+
+            value = (
+                (high[net] & strong) |
+                (pull_high[net] & weak) |
+                (self._value[net] & held)
+            )
+            self._conflict[net] = high[net] & low[net]
+            if value != self._value[net]:
+                self._value[net] = value
+                changed.append(net)
+        return changed
+
+    def settle(self, *, max_events: int = 1000) -> None:
+        """Propagates values until no more valves change state.
+
+        Only the nets connected to a changed input, or to a valve that has
+        switched, are resolved again at each step.  Raises a
+        `SimulationError` if the circuit oscillates.
+        """
+        dirty = self._dirty
+        was_open: Dict[int, int] = {}
+        for _ in range(max_events):
+            changed = self._resolve(self._region(dirty, was_open))
+
+            # Valves without a gate never switch, and are not listed in
+            # `_gated`, so each event comes with the net of its gate.
+            events: Dict[int, int] = {}
+            for net in changed:
+                for index in self._gated[net]:
+                    events[index] = net
+
+            dirty = set()
+            was_open = {}
+            for index, gate in sorted(events.items()):
+                if self._open[index] != self._value[gate]:
+                    was_open[index] = self._open[index]
+                    self._open[index] = self._value[gate]
+                    dirty.update(self.circuit.valves[index].channels)
+
+            if not dirty:
+                self._dirty = set()
+                return
+
+        self._dirty = dirty
+        raise SimulationError("circuit did not settle")
+
+
+def _port_net(circuit: Circuit, port) -> int:
+    return circuit.net_at(
+        port.get('layer', 'bottom'), Coordinate2(port['x'], port['y']),
+    )
+
+
+def simulate(layers, *, config) -> Dict[str, List[int]]:
+    """Runs the stimuli described in the `[simulation]` section of a config.
+
+    Each entry in `inputs` gives a list of `values`, one per timestep, which
+    are applied in turn.  Inputs with fewer values than there are timesteps
+    hold their last value.  Each `pulls` entry gives a constant `value`.
+    Ports are located by `x`, `y` and, optionally, `layer`, which is the name
+    or stack index of a layer and defaults to `bottom`.
+
+    Returns a dictionary mapping the name of each probe to its value after
+    each timestep has settled.
+    """
+    simulation = config['simulation']
+
+    circuit = Circuit(layers)
+    simulator = Simulator(circuit, lanes=simulation.get('lanes', 1))
+
+    for pull in simulation.get('pulls', []):
+        simulator.pull(_port_net(circuit, pull), pull['value'])
+
+    inputs = [
+        (_port_net(circuit, port), port['values'])
+        for port in simulation.get('inputs', [])
+    ]
+    probes = [
+        (port['name'], _port_net(circuit, port))
+        for port in simulation.get('probes', [])
+    ]
+
+    steps = max((len(values) for _, values in inputs), default=1)
+
+    results: Dict[str, List[int]] = {name: [] for name, _ in probes}
+    for step in range(steps):
+        for net, values in inputs:
+            if step < len(values):
+                simulator.drive(net, values[step])
+
+        simulator.settle()
+
+        for name, net in probes:
+            results[name].append(simulator.value(net))
+
+    return results
@@ -0,0 +1,244 @@
+"""
+Geometry statistics and machine time estimates for cut files.
+
+The statistics are gathered by replaying the same path commands that are
+written to the SVG into a builder that measures them, so arcs are measured
+exactly and nothing needs to be parsed back out of the output.
+"""
+import math
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from pcdl.layers import Layer
+from pcdl.path import _arc_geometry
+from pcdl.svg import (
+    _isolated_holes, _layer_contours,
+    _write_contour, _write_hole, _write_outline,
+)
+
+
+DEFAULT_SPEED = 20.0
+DEFAULT_ACCELERATION = 1000.0
+DEFAULT_TRAVEL_SPEED = 200.0
+DEFAULT_PIERCE_TIME = 0.1
+
+# Consecutive segments whose directions differ by less than this many
+# radians are treated as one continuous stroke.
+_SMOOTH_ANGLE = math.radians(5.0)
+
+
+@dataclass(frozen=True)
+class CuttingParameters(object):
+    speed: float = DEFAULT_SPEED
+    acceleration: float = DEFAULT_ACCELERATION
+    travel_speed: float = DEFAULT_TRAVEL_SPEED
+    pierce_time: float = DEFAULT_PIERCE_TIME
+
+
+def cutting_parameters(
+    config, material: str, thickness: float,
+) -> CuttingParameters:
+    """Looks up the cutting parameters for a material and thickness.
+
+    Each entry in `[[materials]]` names a material and may restrict itself to
+    a `thickness`.  The first matching entry is used and any parameters it
+    leaves out take their defaults.  Speeds are in mm/s, accelerations in
+    mm/s^2 and times in seconds.
+    """
+    for entry in config.get('materials', []):
+        if entry.get('name') != material:
+            continue
+        if entry.get('thickness', thickness) != thickness:
+            continue
+        return CuttingParameters(
+            speed=entry.get('speed', DEFAULT_SPEED),
+            acceleration=entry.get('acceleration', DEFAULT_ACCELERATION),
+            travel_speed=entry.get('travel_speed', DEFAULT_TRAVEL_SPEED),
+            pierce_time=entry.get('pierce_time', DEFAULT_PIERCE_TIME),
+        )
+    return CuttingParameters()
+
+
+def _move_time(length: float, speed: float, acceleration: float) -> float:
+    # Trapezoidal velocity profile starting and ending at rest.  Short moves
+    # never reach full speed and become triangular.
+    if acceleration <= 0:
+        return length / speed
+    ramp = speed * speed / acceleration
+    if length >= ramp:
+        return length / speed + speed / acceleration
+    return 2.0 * math.sqrt(length / acceleration)
+
+
+class PathMeter(object):
+    """Accepts the same absolute commands as `PathBuilder` but measures the
+    path instead of formatting it.
+
+    Cut segments are grouped into strokes.  A stroke ends wherever the
+    direction of the path changes abruptly, as the head has to slow to a
+    stop there.  The head is assumed to start at the origin.
+    """
+
+    def __init__(self):
+        self.cut_length = 0.0
+        self.travel_length = 0.0
+        self.pierces = 0
+
+        # Lengths of each continuous cut and of each rapid move.
+        self.strokes: List[float] = []
+        self.travels: List[float] = []
+
+        self._position = (0.0, 0.0)
+        self._start: Optional[Tuple[float, float]] = None
+        self._stroke = 0.0
+        self._heading: Optional[float] = None
+
+    def _end_stroke(self):
+        if self._stroke:
+            self.strokes.append(self._stroke)
+        self._stroke = 0.0
+        self._heading = None
+
+    def _cut(self, length: float, start: float, end: float) -> None:
+        # `start` and `end` are the headings at either end of the segment.
+        if self._heading is not None:
+            turn = abs((start - self._heading + math.pi) % math.tau - math.pi)
+            if turn > _SMOOTH_ANGLE:
+                self._end_stroke()
+        self._stroke += length
+        self.cut_length += length
+        self._heading = end
+
+    def move_to(self, x, y):
+        self._end_stroke()
+        px, py = self._position
+        distance = math.hypot(x - px, y - py)
+        if distance:
+            self.travels.append(distance)
+            self.travel_length += distance
+        self.pierces += 1
+        self._position = self._start = (x, y)
+
+    def line_to(self, x, y):
+        px, py = self._position
+        length = math.hypot(x - px, y - py)
+        if length:
+            heading = math.atan2(y - py, x - px)
+            self._cut(length, heading, heading)
+        self._position = (x, y)
+
+    def arc_to(self, x, y, rx, ry, axis=0, large=False, clockwise=True):
+        # Only circular arcs are emitted, so `ry` is ignored just as it is by
+        # `PathBuilder`.  The y axis is flipped in SVG.
+        px, py = self._position
+        sweep = not clockwise
+        geometry = _arc_geometry(px, py, x, y, rx, large, sweep)
+        if geometry is None:
+            return
+        _, _, r, a0, delta = geometry
+
+        # The tangent leads the radius by a quarter turn in the direction of
+        # travel.
+        quarter = math.pi / 2 if sweep else -math.pi / 2
+        self._cut(r * abs(delta), a0 + quarter, a0 + delta + quarter)
+        self._position = (x, y)
+
+    def close_path(self):
+        if self._start is not None:
+            self.line_to(*self._start)
+        self._end_stroke()
+
+
+@dataclass
+class LayerStats(object):
+    name: str
+    material: str
+    thickness: float
+    contours: int
+    holes: int
+    pierces: int
+    cut_length: float
+    travel_length: float
+    cut_time: float
+    travel_time: float
+    pierce_time: float
+
+    @property
+    def time(self) -> float:
+        return self.cut_time + self.travel_time + self.pierce_time
+
+
+def layer_stats(layer: Layer, *, config=None) -> LayerStats:
+    """Measures the cut file for a layer and estimates how long it will take
+    to cut, following the same order in which the paths are rendered.
+    """
+    if config is None:
+        config = {}
+    parameters = cutting_parameters(config, layer.material, layer.thickness)
+
+    meter = PathMeter()
+
+    contours = 0
+    for contour in _layer_contours(layer):
+        _write_contour(meter, contour, layer.grid)
+        contours += 1
+
+    holes = 0
+    for x, y, r in _isolated_holes(layer):
+        _write_hole(meter, x, y, r)
+        holes += 1
+
+    _write_outline(meter, layer)
+
+    return LayerStats(
+        name=layer.name,
+        material=layer.material,
+        thickness=layer.thickness,
+        contours=contours,
+        holes=holes,
+        pierces=meter.pierces,
+        cut_length=meter.cut_length,
+        travel_length=meter.travel_length,
+        cut_time=sum(
+            _move_time(
+                length, parameters.speed, parameters.acceleration,
+            )
+            for length in meter.strokes
+        ),
+        travel_time=sum(
+            _move_time(
+                length, parameters.travel_speed, parameters.acceleration,
+            )
+            for length in meter.travels
+        ),
+        pierce_time=meter.pierces * parameters.pierce_time,
+    )
+
+
+def stack_stats(layers: List[Layer], *, config=None) -> List[LayerStats]:
+    return [layer_stats(layer, config=config) for layer in layers]
+
+
+def format_stats(stats: List[LayerStats]) -> str:
+    lines = [
+        f"{'layer':<12} {'material':<14} {'contours':>8} {'holes':>6} "
+        f"{'pierces':>7} {'cut mm':>10} {'travel mm':>10} {'time s':>9}"
+    ]
+    for entry in stats:
+        lines.append(
+            f"{entry.name:<12} "
+            f"{f'{entry.material} {entry.thickness}mm':<14} "
+            f"{entry.contours:>8} {entry.holes:>6} {entry.pierces:>7} "
+            f"{entry.cut_length:>10.1f} {entry.travel_length:>10.1f} "
+            f"{entry.time:>9.1f}"
+        )
+    lines.append(
+        f"{'total':<12} {'':<14} "
+        f"{sum(entry.contours for entry in stats):>8} "
+        f"{sum(entry.holes for entry in stats):>6} "
+        f"{sum(entry.pierces for entry in stats):>7} "
+        f"{sum(entry.cut_length for entry in stats):>10.1f} "
+        f"{sum(entry.travel_length for entry in stats):>10.1f} "
+        f"{sum(entry.time for entry in stats):>9.1f}"
+    )
+    return '\n'.join(lines)
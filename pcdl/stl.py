@@ -0,0 +1,344 @@
+"""
+Export of a stack of layers as a 3D model, for fit checks and assembly
+instructions.
+
+Each layer is cut on a grid of its own, whose lines are the edges of the
+board and of every channel and hole.  Channels are drawn as the straight
+strips between linked nodes, and holes as squares around their centres, so
+the cells of this grid are either entirely solid or entirely cut away.  The
+solid cells are then merged greedily into as few rectangles as possible: runs
+of solid cells along each row, with identical runs in neighbouring rows
+joined together.  Side walls are merged the same way.  Rounded corners and
+round holes are not modelled.
+
+Merged rectangles meet smaller neighbours partway along their edges, so each
+edge is split at every corner lying on it before the rectangles are cut into
+triangles.  That leaves no corner of one triangle partway along an edge of
+another, which slicers would take for a hole in the surface.
+
+Triangles are written out a layer at a time, so only the grid and rectangles
+of a single layer are ever held in memory.
+"""
+import bisect
+import collections
+import re
+import struct
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from pcdl.layers import Layer
+from pcdl.svg import RADIUS, _isolated_holes
+
+
+_HEADER_SIZE = 80
+_COUNT = struct.Struct('<I')
+_TRIANGLE = struct.Struct('<12fH')
+
+# Triangles are packed into a buffer and written out in batches of this many
+# bytes.
+_BATCH = 1 << 16
+
+_SOLID_RUN = re.compile(rb'\x01+')
+
+Point = Tuple[float, float, float]
+Triangle = Tuple[Point, Point, Point, Point]
+
+
+def _cuts(layer: Layer) -> List[Tuple[float, float, float, float]]:
+    # Returns every region cut out of the layer as a rectangle, in
+    # millimetres.
+    grid = layer.grid
+    cuts = []
+    for link in layer.links():
+        x0 = min(link.a.x, link.b.x)
+        y0 = min(link.a.y, link.b.y)
+        x1 = max(link.a.x, link.b.x)
+        y1 = max(link.a.y, link.b.y)
+        cuts.append((
+            (x0 + 0.5 - RADIUS) * grid, (y0 + 0.5 - RADIUS) * grid,
+            (x1 + 0.5 + RADIUS) * grid, (y1 + 0.5 + RADIUS) * grid,
+        ))
+    for x, y, r in _isolated_holes(layer):
+        cuts.append((x - r, y - r, x + r, y + r))
+    return cuts
+
+
+def _solid(layer: Layer, cuts):
+    # Builds the grid of the layer: the coordinates of its lines along each
+    # axis, and one byte per cell that is one where the cell is solid.
+    width = layer.width * layer.grid
+    height = layer.height * layer.grid
+
+    xs = sorted({0.0, width}.union(
+        x for x0, _, x1, _ in cuts for x in (x0, x1) if 0.0 < x < width
+    ))
+    ys = sorted({0.0, height}.union(
+        y for _, y0, _, y1 in cuts for y in (y0, y1) if 0.0 < y < height
+    ))
+    column = {x: i for i, x in enumerate(xs)}
+    row = {y: j for j, y in enumerate(ys)}
+
+    columns = len(xs) - 1
+    cells = bytearray(b'\x01') * (columns * (len(ys) - 1))
+    for x0, y0, x1, y1 in cuts:
+        i0 = column.get(x0, 0)
+        i1 = column.get(x1, columns)
+        empty = bytes(i1 - i0)
+        for j in range(row.get(y0, 0), row.get(y1, len(ys) - 1)):
+            cells[j * columns + i0:j * columns + i1] = empty
+    return xs, ys, cells
+
+
+def _runs(row: bytes) -> List[Tuple[int, int]]:
+    return [match.span() for match in _SOLID_RUN.finditer(row)]
+
+
+def _difference(a: bytes, b: bytes) -> bytes:
+    # The cells set in `a` but not in `b`.  Cells are single bytes holding
+    # zero or one, so the rows can be treated as big integers.
+    difference = int.from_bytes(a, 'big') & ~int.from_bytes(b, 'big')
+    return difference.to_bytes(len(a), 'big')
+
+
+def _rectangle(sides, normal) -> Iterator[Triangle]:
+    # Yields a rectangle as triangles wound anticlockwise when seen from the
+    # side that `normal` points to.  Each side is given as its first corner
+    # followed by any points lying along it.
+    corners = [side[0] for side in sides]
+    if _winding(normal, *corners[:3]) < 0:
+        # Going the other way round, each corner is followed by the points
+        # along the side that used to lead up to it.
+        sides = [
+            [corners[k]] + sides[k - 1][:0:-1] for k in (0, 3, 2, 1)
+        ]
+        corners = [side[0] for side in sides]
+
+    # Fanning out from a corner with no points along either of its sides
+    # gives no slivers of zero area.  Failing that, the fan comes from the
+    # middle of the rectangle.
+    loop = [point for side in sides for point in side]
+    start = 0
+    for side, before in zip(sides, sides[-1:] + sides[:-1]):
+        if len(side) == 1 and len(before) == 1:
+            fan = loop[start:] + loop[:start]
+            for b, c in zip(fan[1:-1], fan[2:]):
+                yield normal, fan[0], b, c
+            return
+        start += len(side)
+
+    middle = tuple(
+        sum(corner[i] for corner in corners) / 4 for i in range(3)
+    )
+    for b, c in zip(loop, loop[1:] + loop[:1]):
+        yield normal, middle, b, c
+
+
+def _strip(lower, upper, normal) -> Iterator[Triangle]:
+    # Yields a wall between two parallel edges, given as the points along
+    # each in the same order, as a strip of triangles that each join two
+    # neighbouring points on one edge to a point on the other.
+    axis = 0 if lower[0][0] != lower[-1][0] else 1
+    forward = lower[-1][axis] > lower[0][axis]
+
+    def before(a, b):
+        return a[axis] < b[axis] if forward else a[axis] > b[axis]
+
+    i = j = 0
+    while i < len(lower) - 1 or j < len(upper) - 1:
+        if j == len(upper) - 1 or (
+            i < len(lower) - 1 and before(lower[i + 1], upper[j + 1])
+        ):
+            a, b, c = lower[i], lower[i + 1], upper[j]
+            i += 1
+        else:
+            a, b, c = lower[i], upper[j + 1], upper[j]
+            j += 1
+        if _winding(normal, a, b, c) < 0:
+            b, c = c, b
+        yield normal, a, b, c
+
+
+def _winding(normal, a, b, c) -> float:
+    u = [b[i] - a[i] for i in range(3)]
+    v = [c[i] - a[i] for i in range(3)]
+    return (
+        normal[0] * (u[1] * v[2] - u[2] * v[1]) +
+        normal[1] * (u[2] * v[0] - u[0] * v[2]) +
+        normal[2] * (u[0] * v[1] - u[1] * v[0])
+    )
+
+
+def _between(values: List[int], low: int, high: int) -> List[int]:
+    # The values strictly between two others, in ascending order.
+    return values[bisect.bisect_right(values, low):
+                  bisect.bisect_left(values, high)]
+
+
+def _rectangles(xs, ys, cells) -> Iterator[tuple]:
+    # Merges the solid cells into rectangles, yielding the top and bottom of
+    # each as `('face', i0, i1, j0, j1)`, and the walls around them as
+    # `('x', i, j0, j1, direction)` or `('y', j, i0, i1, direction)`.
+    columns = len(xs) - 1
+    rows = len(ys) - 1
+
+    # Rectangles and walls along `y` still being extended, by the row they
+    # started on.
+    faces: Dict[Tuple[int, int], int] = {}
+    walls: Dict[Tuple[int, float], int] = {}
+
+    above = bytes(columns)
+    for j in range(rows + 1):
+        if j < rows:
+            row = bytes(cells[j * columns:(j + 1) * columns])
+        else:
+            row = bytes(columns)
+
+        if row != above:
+            # Walls between this row and the one above, facing whichever way
+            # is open.  In model space that is `+y` for the row above.
+            for i0, i1 in _runs(_difference(row, above)):
+                yield 'y', j, i0, i1, 1.0
+            for i0, i1 in _runs(_difference(above, row)):
+                yield 'y', j, i0, i1, -1.0
+            above = row
+
+            runs = _runs(row)
+            current = set(runs)
+            for run in list(faces):
+                if run not in current:
+                    yield ('face', *run, faces.pop(run), j)
+            for run in runs:
+                faces.setdefault(run, j)
+
+            edges = {(i0, -1.0) for i0, _ in runs}
+            edges.update((i1, 1.0) for _, i1 in runs)
+            for edge in list(walls):
+                if edge not in edges:
+                    yield 'x', edge[0], walls.pop(edge), j, edge[1]
+            for edge in edges:
+                walls.setdefault(edge, j)
+
+
+def layer_triangles(
+    layer: Layer, *, z: float = 0.0,
+) -> Iterator[Triangle]:
+    """Yields the triangles of the solid material of a layer, extruded from
+    `z` to `z + layer.thickness`, as a normal followed by three corners.
+
+    The surface is closed, with every edge shared by exactly two triangles,
+    as long as no two cuts meet only at a corner.
+
+    The board is drawn with its top left corner at the far left and `y`
+    pointing away, so that it is seen from above the right way round.
+    """
+    xs, ys, cells = _solid(layer, _cuts(layer))
+    height = layer.height * layer.grid
+    zs = (z, z + layer.thickness)
+
+    rectangles = list(_rectangles(xs, ys, cells))
+    del cells
+
+    # Every corner of a rectangle or wall, by the grid line along `x` and
+    # along `y` that it lies on, at the bottom (0) or top (1) of the layer.
+    # Edges running past any of these are split there, so that no corner
+    # lies partway along another edge.
+    along_x = collections.defaultdict(set)
+    along_y = collections.defaultdict(set)
+
+    def corner(i, j):
+        for k in (0, 1):
+            along_x[j, k].add(i)
+            along_y[i, k].add(j)
+
+    for rectangle in rectangles:
+        if rectangle[0] == 'face':
+            _, i0, i1, j0, j1 = rectangle
+            for i, j in ((i0, j0), (i1, j0), (i1, j1), (i0, j1)):
+                corner(i, j)
+        elif rectangle[0] == 'x':
+            _, i, j0, j1, _ = rectangle
+            corner(i, j0)
+            corner(i, j1)
+        else:
+            _, j, i0, i1, _ = rectangle
+            corner(i0, j)
+            corner(i1, j)
+    sorted_x = {line: sorted(values) for line, values in along_x.items()}
+    sorted_y = {line: sorted(values) for line, values in along_y.items()}
+
+    def point(i, j, k):
+        return xs[i], height - ys[j], zs[k]
+
+    def x_edge(j, k, i0, i1):
+        # The points from one corner up to but not including the next, along
+        # a line of constant `y`.
+        between = _between(sorted_x[j, k], min(i0, i1), max(i0, i1))
+        if i1 < i0:
+            between.reverse()
+        return [point(i0, j, k)] + [point(i, j, k) for i in between]
+
+    def y_edge(i, k, j0, j1):
+        between = _between(sorted_y[i, k], min(j0, j1), max(j0, j1))
+        if j1 < j0:
+            between.reverse()
+        return [point(i, j0, k)] + [point(i, j, k) for j in between]
+
+    for rectangle in rectangles:
+        if rectangle[0] == 'face':
+            _, i0, i1, j0, j1 = rectangle
+            for k, direction in ((1, 1.0), (0, -1.0)):
+                yield from _rectangle(
+                    [
+                        x_edge(j0, k, i0, i1), y_edge(i1, k, j0, j1),
+                        x_edge(j1, k, i1, i0), y_edge(i0, k, j1, j0),
+                    ],
+                    (0.0, 0.0, direction),
+                )
+        elif rectangle[0] == 'x':
+            _, i, j0, j1, direction = rectangle
+            yield from _strip(
+                y_edge(i, 0, j0, j1) + [point(i, j1, 0)],
+                y_edge(i, 1, j0, j1) + [point(i, j1, 1)],
+                (direction, 0.0, 0.0),
+            )
+        else:
+            _, j, i0, i1, direction = rectangle
+            yield from _strip(
+                x_edge(j, 0, i0, i1) + [point(i1, j, 0)],
+                x_edge(j, 1, i0, i1) + [point(i1, j, 1)],
+                (0.0, direction, 0.0),
+            )
+
+
+def _stack(layers: Sequence[Layer]) -> Iterator[Triangle]:
+    z = 0.0
+    for layer in layers:
+        yield from layer_triangles(layer, z=z)
+        z += layer.thickness
+
+
+def write_stl(layers: Sequence[Layer], output) -> int:
+    """Writes a binary STL model of layers stacked in order, the first at the
+    bottom, to a seekable file object.  Returns the number of triangles.
+
+    The triangle count in the header is filled in once every triangle has
+    been written, so the model never has to be held in memory.
+    """
+    start = output.tell()
+    output.write(b'pcdl'.ljust(_HEADER_SIZE, b' '))
+    output.write(_COUNT.pack(0))
+
+    count = 0
+    buffer = bytearray()
+    for (nx, ny, nz), a, b, c in _stack(layers):
+        buffer += _TRIANGLE.pack(nx, ny, nz, *a, *b, *c, 0)
+        count += 1
+        if len(buffer) >= _BATCH:
+            output.write(buffer)
+            buffer.clear()
+    output.write(buffer)
+
+    end = output.tell()
+    output.seek(start + _HEADER_SIZE)
+    output.write(_COUNT.pack(count))
+    output.seek(end)
+    return count
@@ -1,7 +1,9 @@
-from typing import Tuple
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
 
 import xml.etree.ElementTree
-from xml.etree.ElementTree import TreeBuilder
+from xml.etree.ElementTree import Element, TreeBuilder
 
 from pcdl.grid import (
     Vector2, Coordinate2,
@@ -9,64 +11,43 @@ from pcdl.grid import (
     Angle, R0, R90, R180, R270,
 )
 from pcdl.layers import Layer
+from pcdl.memory import (
+    HALF_EDGES, TRACE, TREE, WRITE, MemoryProfile, measure,
+)
+from pcdl.path import PathBuilder
+from pcdl.progress import CONTOURS, Progress, ProgressWriter
 
 
 RADIUS = 0.4
 
+_CUT_STYLE = {
+    "stroke": "red",
+    "stroke-width": "0.25",
+    "fill": "none",
+}
 
-class PathBuilder(object):
-    def __init__(self):
-        self._elements = []
-
-    def close(self):
-        return ' '.join(self._elements)
-
-    def _write(self, element):
-        self._elements.append(element)
-
-    def move(self, dx, dy):
-        self._write(f"m {dx},{dy}")
-
-    def move_to(self, x, y):
-        self._write(f"M {x},{y}")
-
-    def line(self, dx, dy):
-        self._write(f"l {dx},{dy}")
-
-    def line_to(self, x, y):
-        self._write(f"L {x},{y}")
-
-    def quadratic(self, dcx, dcy, dx, dy):
-        self._write(f"q {dcx},{dcy} {dx},{dy}")
-
-    def quadratic_to(self, cx, cy, x, y):
-        self._write(f"Q {cx},{cy} {x},{y}")
 
-    def cubic(self, dcax, dcay, dcbx, dcby, dx, dy):
-        self._write(f"c {dcax},{dcay} {dcbx},{dcby} {dx},{dy}")
+# Coefficients `(xx, xy, yx, yy)` of each quarter turn, which moves a point
+# `(x, y)` to `(xx * x + xy * y, yx * x + yy * y)`.
+_ROTATIONS = {
+    R0: (1, 0, 0, 1),
+    R90: (0, 1, -1, 0),
+    R180: (-1, 0, 0, -1),
+    R270: (0, -1, 1, 0),
+}
 
-    def cubic_to(self, cax, cay, cbx, cby, x, y):
-        self._write(f"C {cax},{cay} {cbx},{cby} {x},{y}")
 
-    def arc(self, dx, dy, rx, ry, axis=0, large=False, clockwise=True):
-        large = 1 if large else 0
-        clockwise = 1 if clockwise else 0
-
-        self._write(f"a {rx},{rx} {axis} {large},{clockwise} {dx},{dy}")
-
-    def arc_to(self, x, y, rx, ry, axis=0, large=False, clockwise=True):
-        large = 1 if large else 0
-        clockwise = 0 if clockwise else 1  # y axis is flipped in SVG
-
-        self._write(f"A {rx},{rx} {axis} {large},{clockwise} {x},{y}")
-
-    def close_path(self):
-        self._write("Z")
+_Matrix = Tuple[float, float, float, float, float, float]
 
 
 class Transformation(object):
-    """This would ideally just be an arbitrary 3x3 matrix but dealing with
-    arcs makes this impossible
+    """Maps positions relative to the grid cell at `offset` to output
+    coordinates, after rotating them about the centre of the cell.
+
+    This would ideally just be an arbitrary 3x3 matrix but dealing with arcs
+    makes this impossible.  Instead transformations can be composed with `@`
+    from translations, quarter turns, uniform scales and reflections, all of
+    which keep arcs circular.  The matrix form is only built when needed.
     """
     offset: Coordinate2
     scale: float
@@ -78,64 +59,209 @@ class Transformation(object):
         self.offset = offset
         self.scale = scale
         self.rotation = rotation
+        self._rotation = _ROTATIONS[rotation]
+        self._matrix: Optional[_Matrix] = None
+
+    @classmethod
+    def from_matrix(
+        cls, a: float, b: float, c: float, d: float, e: float, f: float,
+    ) -> 'Transformation':
+        """Builds a transformation from an SVG style matrix, which maps
+        `(x, y)` to `(a * x + c * y + e, b * x + d * y + f)`.
+        """
+        if not (
+            (a == d and b == -c) or (a == -d and b == c)
+        ) or not (a or b):
+            raise ValueError("transformation would distort arcs")
+        return _MatrixTransformation((a, b, c, d, e, f))
+
+    @classmethod
+    def translation(cls, x: float, y: float) -> 'Transformation':
+        return cls.from_matrix(1, 0, 0, 1, x, y)
+
+    @classmethod
+    def turn(cls, rotation: Angle) -> 'Transformation':
+        """Rotates about the origin in the same sense as `rotation` does
+        within a cell.
+        """
+        xx, xy, yx, yy = _ROTATIONS[rotation]
+        return cls.from_matrix(xx, yx, xy, yy, 0, 0)
+
+    @property
+    def matrix(self) -> _Matrix:
+        matrix = self._matrix
+        if matrix is None:
+            xx, xy, yx, yy = self._rotation
+            s = self.scale
+            matrix = self._matrix = (
+                xx * s, yx * s, xy * s, yy * s,
+                (self.offset.x + 0.5) * s, (self.offset.y + 0.5) * s,
+            )
+        return matrix
+
+    @property
+    def reflects(self) -> bool:
+        a, b, c, d, _, _ = self.matrix
+        return a * d - b * c < 0
+
+    def __matmul__(self, other):
+        # `(self @ other)` applies `other` first.
+        if not isinstance(other, Transformation):
+            return NotImplemented
+
+        a1, b1, c1, d1, e1, f1 = self.matrix
+        a2, b2, c2, d2, e2, f2 = other.matrix
+        return _MatrixTransformation((
+            a1 * a2 + c1 * b2,
+            b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2,
+            b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1,
+            b1 * e2 + d1 * f2 + f1,
+        ))
 
     def transform_point(
         self, position: Tuple[float, float],
     ) -> Tuple[float, float]:
+        xx, xy, yx, yy = self._rotation
         x, y = position
-        x, y = {
-            R0: (x, y),
-            R90: (y, -x),
-            R180: (-x, -y),
-            R270: (-y, x),
-        }[self.rotation]
-
-        x += self.offset.x
-        y += self.offset.y
-        x += 0.5
-        y += 0.5
-        x *= self.scale
-        y *= self.scale
-
-        return x, y
+        return (
+            (xx * x + xy * y + self.offset.x + 0.5) * self.scale,
+            (yx * x + yy * y + self.offset.y + 0.5) * self.scale,
+        )
+
+    def transform_points(self, points: array) -> array:
+        """Transforms a flat array of interleaved x and y coordinates."""
+        xx, xy, yx, yy = self._rotation
+        ox = self.offset.x + 0.5
+        oy = self.offset.y + 0.5
+        s = self.scale
+
+        xs = points[0::2]
+        ys = points[1::2]
+        result = array('d', points)
+        result[0::2] = array('d', [
+            (xx * x + xy * y + ox) * s for x, y in zip(xs, ys)
+        ])
+        result[1::2] = array('d', [
+            (yx * x + yy * y + oy) * s for x, y in zip(xs, ys)
+        ])
+        return result
 
     def transform_distance(self, distance: float) -> float:
         return self.scale * distance
 
+    def transform_sweep(self, clockwise: bool) -> bool:
+        return clockwise != self.reflects
+
+    def to_svg(self) -> str:
+        return "matrix(%r,%r,%r,%r,%r,%r)" % tuple(
+            float(value) for value in self.matrix
+        )
+
+
+class _MatrixTransformation(Transformation):
+    # The result of composing transformations, which in general no longer
+    # has an offset on the grid or a single rotation, so has neither
+    # `offset` nor `rotation` set.
+
+    def __init__(self, matrix: _Matrix) -> None:
+        a, b, c, d, _, _ = matrix
+        self.scale = math.sqrt(abs(a * d - b * c))
+        self._coefficients = matrix
+
+    @property
+    def matrix(self) -> _Matrix:
+        return self._coefficients
+
+    def transform_point(
+        self, position: Tuple[float, float],
+    ) -> Tuple[float, float]:
+        a, b, c, d, e, f = self._coefficients
+        x, y = position
+        return a * x + c * y + e, b * x + d * y + f
+
+    def transform_points(self, points: array) -> array:
+        a, b, c, d, e, f = self._coefficients
+
+        xs = points[0::2]
+        ys = points[1::2]
+        result = array('d', points)
+        result[0::2] = array('d', [
+            a * x + c * y + e for x, y in zip(xs, ys)
+        ])
+        result[1::2] = array('d', [
+            b * x + d * y + f for x, y in zip(xs, ys)
+        ])
+        return result
+
+
+def _isolated_holes(layer: Layer):
+    ordered_holes = getattr(layer, 'ordered_holes', None)
+    if ordered_holes is not None:
+        # Layers that are too large to sort in one go provide the same order
+        # themselves.
+        holes = [
+            hole for hole in ordered_holes()
+            if not layer.connected(hole.position)
+        ]
+        yield from _transform_holes(layer, holes)
+        return
 
-def _render_holes(svg: TreeBuilder, layer: Layer) -> None:
     # Sort the holes left to right then up and down to avoid any pathological
     # movement of the cutting head.
-    holes = sorted(layer.holes(), key=lambda hole: tuple(hole.position))
+    holes = sorted(
+        (
+            hole for hole in layer.holes()
+            if not layer.connected(hole.position)
+        ),
+        key=lambda hole: tuple(hole.position),
+    )
+    yield from _transform_holes(layer, holes)
+
 
+def _transform_holes(layer: Layer, holes):
+    positions = array('d')
     for hole in holes:
-        if layer.connected(hole.position):
-            continue
-        transformation = Transformation(
-            offset=hole.position, scale=layer.grid, rotation=R0
+        positions.extend(hole.position)
+    transformation = Transformation(
+        offset=Coordinate2(0, 0), scale=layer.grid, rotation=R0,
+    )
+    positions = transformation.transform_points(positions)
+
+    for index, hole in enumerate(holes):
+        yield (
+            positions[2 * index], positions[2 * index + 1],
+            transformation.transform_distance(hole.radius),
         )
-        x, y = transformation.transform_point((0, 0))
-        r = transformation.transform_distance(hole.radius)
 
+
+def _write_hole(path, x: float, y: float, r: float) -> None:
+    path.move_to(x, y + r)
+    path.arc_to(x + r, y, rx=r, ry=r)
+    path.arc_to(x, y - r, rx=r, ry=r)
+    path.arc_to(x - r, y, rx=r, ry=r)
+    path.arc_to(x, y + r, rx=r, ry=r)
+    path.close_path()  # TODO
+
+
+def _render_holes(svg: TreeBuilder, layer: Layer) -> None:
+    for x, y, r in _isolated_holes(layer):
         path = PathBuilder()
-        path.move_to(x, y + r)
-        path.arc_to(x + r, y, rx=r, ry=r)
-        path.arc_to(x, y - r, rx=r, ry=r)
-        path.arc_to(x - r, y, rx=r, ry=r)
-        path.arc_to(x, y + r, rx=r, ry=r)
-        path.close_path()  # TODO
-
-        path = path.close()
-
-        svg.start("path", {
-            "d": str(path),
-            "stroke": "red",
-            "stroke-width": "0.25",
-            "fill": "none",
-        })
+        _write_hole(path, x, y, r)
+
+        svg.start("path", {"d": path.close(), **_CUT_STYLE})
         svg.end("path")
 
 
+def _render_holes_compact(svg: TreeBuilder, layer: Layer) -> None:
+    svg.start("g", {"class": "holes"})
+    for x, y, r in _isolated_holes(layer):
+        svg.start("circle", {"cx": str(x), "cy": str(y), "r": str(r)})
+        svg.end("circle")
+    svg.end("g")
+
+
 class _HalfEdge(object):
     __slots__ = ['src', 'tgt', 'direction']
 
@@ -237,12 +363,16 @@ def _render_180(path: PathBuilder, transformation: Transformation) -> None:
     path.arc_to(*transformation.transform_point((RADIUS, 0.0)), rx=r, ry=r)
 
 
-def _render_routes(svg: TreeBuilder, layer: Layer) -> None:
-    # Turn list of routes in the layer into a set of unvisited half edges.
+def _half_edges(layer: Layer):
+    # Turn list of routes in the layer into a set of half edges.
+    return _link_half_edges((link.a, link.b) for link in layer.links())
+
+
+def _link_half_edges(links):
     hedges = set()
-    for link in layer.links():
-        hedges.add(_HalfEdge(link.a, link.b))
-        hedges.add(_HalfEdge(link.b, link.a))
+    for a, b in links:
+        hedges.add(_HalfEdge(a, b))
+        hedges.add(_HalfEdge(b, a))
 
     # Eliminate pairs of half edges that back onto each other.
     for hedge in list(hedges):
@@ -252,78 +382,218 @@ def _render_routes(svg: TreeBuilder, layer: Layer) -> None:
                 hedges.remove(hedge)
                 hedges.remove(redge)
 
-    # Draw routes clockwise.
-    while hedges:
-        # Pick a random half edge off the list as the starting point.
-        nedge = next(iter(hedges))
+    return hedges
+
+
+def _next_edge(hedges, hedge: _HalfEdge) -> Optional[_HalfEdge]:
+    # Follow the contour clockwise by always taking the leftmost turn.
+    for turn in (_turn_left, _turn_ahead, _turn_right, _turn_back):
+        candidate = turn(hedge)
+        if candidate in hedges:
+            return candidate
+    return None
+
+
+def _hedge_key(hedge: _HalfEdge):
+    return (hedge.src.x, hedge.src.y, hedge.tgt.x, hedge.tgt.y)
+
+
+def _trace_contours(hedges):
+    """Splits a set of half edges into contours.
+
+    Each contour is yielded as the list of half edges visited, with the first
+    half edge repeated at the end if the contour closes.  Contours are
+    yielded in a canonical order: each starts from its lexicographically
+    smallest half edge and the contours are sorted by that edge.  This makes
+    the output independent of set iteration order.
+    """
+    visited = set()
+    for start in sorted(hedges, key=_hedge_key):
+        if start in visited:
+            continue
+
+        contour = [start]
+        visited.add(start)
+        hedge = _next_edge(hedges, start)
+        while hedge is not None and hedge not in visited:
+            contour.append(hedge)
+            visited.add(hedge)
+            hedge = _next_edge(hedges, hedge)
+
+        if hedge == start:
+            contour.append(start)
+
+        yield contour
+
+
+# Angle arithmetic is comparatively slow, so the rotation of every half edge
+# and every turn between two half edges is looked up instead.
+_EDGE_ROTATIONS = {direction: direction - UP for direction in Direction}
+_TURNS = {
+    (a, b): b - a for a in Direction for b in Direction
+}
+
+
+def _write_contour(path, contour, grid: float) -> None:
+    start = contour[0]
+    transformation = Transformation(
+        offset=start.tgt, scale=grid,
+        rotation=_EDGE_ROTATIONS[start.direction],
+    )
+    path.move_to(*transformation.transform_point((-RADIUS, -0.5)))
 
+    # Each step is drawn relative to the half edge it leaves from.
+    for hedge, nedge in zip(contour, contour[1:]):
         transformation = Transformation(
-            offset=nedge.tgt, scale=layer.grid, rotation=nedge.direction - UP,
+            offset=hedge.tgt, scale=grid,
+            rotation=_EDGE_ROTATIONS[hedge.direction],
         )
-        path = PathBuilder()
-        path.move_to(*transformation.transform_point((-RADIUS, -0.5)))
-        while True:
-            transformation = Transformation(
-                offset=nedge.tgt, scale=layer.grid, rotation=nedge.direction - UP,
-            )
-            if _turn_left(nedge) in hedges:
-                nedge = _turn_left(nedge)
-                _render_270(path, transformation)
-            elif _turn_ahead(nedge) in hedges:
-                nedge = _turn_ahead(nedge)
-                _render_0(path, transformation)
-            elif _turn_right(nedge) in hedges:
-                nedge = _turn_right(nedge)
-                _render_90(path, transformation)
-            elif _turn_back(nedge) in hedges:
-                nedge = _turn_back(nedge)
-                _render_180(path, transformation)
-            else:
-                # We should be back at the beginning
-                break
-
-            hedges.remove(nedge)
-
-        path.close_path()
-        path = path.close()
-
-        svg.start("path", {
-            "d": str(path),
-            "stroke": "red",
-            "stroke-width": "0.25",
-            "fill": "none",
-        })
+        turn = _TURNS[hedge.direction, nedge.direction]
+        if turn == R270:
+            _render_270(path, transformation)
+        elif turn == R0:
+            _render_0(path, transformation)
+        elif turn == R90:
+            _render_90(path, transformation)
+        else:
+            _render_180(path, transformation)
+
+    path.close_path()
+
+
+def _layer_contours(layer: Layer):
+    # Layers that keep their features out of memory trace themselves.
+    trace_contours = getattr(layer, 'trace_contours', None)
+    if trace_contours is not None:
+        return trace_contours()
+    return _trace_contours(_half_edges(layer))
+
+
+def _route_builders(layer: Layer, *, processes: Optional[int] = None):
+    if processes is not None:
+        # Imported here as pcdl.bands itself builds on this module.
+        from pcdl.bands import trace_routes
+        return trace_routes(layer, processes=processes)
+
+    def builders():
+        for contour in _layer_contours(layer):
+            path = PathBuilder()
+            _write_contour(path, contour, layer.grid)
+            yield path
+    return builders()
+
+
+def _route_paths(layer: Layer, *, processes: Optional[int] = None):
+    """Traces the outline of every route in the layer, yielding one path
+    string per closed contour, drawn clockwise.  If `processes` is given the
+    layer is traced in bands by that many worker processes.
+    """
+    for path in _route_builders(layer, processes=processes):
+        yield path.to_svg()
+
+
+def _render_routes(
+    svg: TreeBuilder, layer: Layer, *, processes: Optional[int] = None,
+    routes=None,
+) -> None:
+    if routes is None:
+        routes = _route_builders(layer, processes=processes)
+    for path in routes:
+        svg.start("path", {"d": path.to_svg(), **_CUT_STYLE})
         svg.end("path")
 
 
-def _render_outline(svg: TreeBuilder, layer: Layer) -> None:
+def _render_routes_compact(
+    svg: TreeBuilder, layer: Layer, *, processes: Optional[int] = None,
+    routes=None,
+) -> None:
+    # Every contour becomes a subpath of a single compound path.  All of the
+    # contours are closed and disjoint so the cut is unchanged.
+    if routes is None:
+        routes = _route_builders(layer, processes=processes)
+    path = PathBuilder()
+    for contour in routes:
+        path.extend(contour)
+    if not len(path):
+        return
+
+    svg.start("path", {"class": "routes", "d": path.to_svg()})
+    svg.end("path")
+
+
+def _write_outline(path, layer: Layer) -> None:
     w = layer.width * layer.grid
     h = layer.height * layer.grid
 
-    path = PathBuilder()
     path.move_to(0, 0)
     path.line_to(w, 0)
     path.line_to(w, h)
     path.line_to(0, h)
     path.close_path()
-    path = path.close()
 
-    svg.start("path", {
-        "d": str(path),
-        "stroke": "red",
-        "stroke-width": "0.25",
-        "fill": "none",
-    })
+
+def _outline_path(layer: Layer) -> str:
+    path = PathBuilder()
+    _write_outline(path, layer)
+    return path.close()
+
+
+def _render_outline(svg: TreeBuilder, layer: Layer) -> None:
+    svg.start("path", {"d": _outline_path(layer), **_CUT_STYLE})
     svg.end("path")
 
 
-def render_layer(layer, output):
-    svg = xml.etree.ElementTree.TreeBuilder()
+def _render_outline_compact(svg: TreeBuilder, layer: Layer) -> None:
+    svg.start("path", {"class": "outline", "d": _outline_path(layer)})
+    svg.end("path")
+
+
+def _render_layer_group(
+    svg: TreeBuilder, layer: Layer, attributes, *, compact: bool,
+    processes: Optional[int] = None, routes=None,
+    progress: Optional[Progress] = None,
+) -> None:
+    # Routes that have already been traced can be passed in as paths.
+    if progress is not None:
+        if routes is None:
+            routes = _route_builders(layer, processes=processes)
+        routes = progress.iterate(CONTOURS, routes)
+
+    if compact:
+        svg.start("g", {**attributes, **_CUT_STYLE})
+        _render_routes_compact(
+            svg, layer, processes=processes, routes=routes,
+        )
+        _render_holes_compact(svg, layer)
+        _render_outline_compact(svg, layer)
+        svg.end("g")
+    else:
+        svg.start("g", attributes)
+        _render_routes(svg, layer, processes=processes, routes=routes)
+        _render_holes(svg, layer)
+        _render_outline(svg, layer)
+        svg.end("g")
+
+
+def _layer_group(
+    layer: Layer, attributes, *, compact: bool,
+    processes: Optional[int] = None, routes=None,
+    progress: Optional[Progress] = None,
+) -> Element:
+    svg = TreeBuilder()
+    _render_layer_group(
+        svg, layer, attributes, compact=compact, processes=processes,
+        routes=routes, progress=progress,
+    )
+    return svg.close()
+
+
+def _layer_document(layer: Layer, group: Element) -> Element:
     width = layer.width
     height = layer.height
     grid = layer.grid
 
-    svg.start("svg", {
+    root = Element("svg", {
         "version": "1.1",
         "baseProfile": "full",
         "width": f"{grid * width}mm",
@@ -331,25 +601,90 @@ def render_layer(layer, output):
         "viewBox": f"0 0 {grid * width} {grid * height}",
         "xmlns": "http://www.w3.org/2000/svg",
     })
+    root.append(group)
+    return root
+
+
+def _measured_routes(layer: Layer, *, processes, memory: MemoryProfile):
+    # Traces routes in separate stages, so their memory can be told apart.
+    if processes is not None or hasattr(layer, 'trace_contours'):
+        with memory.stage(TRACE):
+            return list(_route_builders(layer, processes=processes))
+
+    with memory.stage(HALF_EDGES):
+        hedges = _half_edges(layer)
+    with memory.stage(TRACE):
+        routes = []
+        for contour in _trace_contours(hedges):
+            path = PathBuilder()
+            _write_contour(path, contour, layer.grid)
+            routes.append(path)
+        return routes
+
+
+def layer_routes(
+    layer: Layer, *, processes: Optional[int] = None,
+    memory: Optional[MemoryProfile] = None,
+) -> List[PathBuilder]:
+    """Traces the outline of every route in the layer, returning one path per
+    contour.  The paths can be given to `render_layer` and
+    `pcdl.geometry.layer_geometry` so that a layer written out both ways is
+    only traced once.
+    """
+    if memory is not None:
+        return _measured_routes(layer, processes=processes, memory=memory)
+    return list(_route_builders(layer, processes=processes))
 
-    svg.start("g", {"id": "root"})
-    _render_routes(svg, layer)
-    _render_holes(svg, layer)
-    _render_outline(svg, layer)
-    svg.end("g")
 
-    svg.end("svg")
-    element = svg.close()
-    element_tree = xml.etree.ElementTree.ElementTree(element)
+def render_layer(
+    layer, output, *, compact: bool = False, processes: Optional[int] = None,
+    routes: Optional[List[PathBuilder]] = None,
+    progress: Optional[Progress] = None,
+    memory: Optional[MemoryProfile] = None,
+):
+    """Renders a single layer as an SVG cut file.
+
+    By default every contour and hole is written as a separate, fully styled
+    path.  If `compact` is set, the contours are instead merged into a single
+    compound path per cut class, holes are written as bare circles, and the
+    cut style is set once on the enclosing group.  The geometry is identical
+    but the document has a tiny fraction of the nodes.
+
+    Setting `processes` splits the tracing of routes between that many
+    worker processes.  The output is the same either way.  Routes already
+    traced by `layer_routes` can be given as `routes` instead.
+
+    A `pcdl.progress.Progress` given as `progress` hears about each contour
+    traced and the bytes written, and can cancel the render.  A
+    `pcdl.memory.MemoryProfile` given as `memory` records the memory used by
+    each stage.
+    """
+    if routes is None and memory is not None:
+        routes = _measured_routes(layer, processes=processes, memory=memory)
 
-    element_tree.write(output)
+    with measure(memory, TREE):
+        group = _layer_group(
+            layer, {"id": "root"}, compact=compact, processes=processes,
+            routes=routes, progress=progress,
+        )
+        element_tree = xml.etree.ElementTree.ElementTree(
+            _layer_document(layer, group),
+        )
+    del routes
 
+    with measure(memory, WRITE):
+        if progress is None:
+            element_tree.write(output)
+        else:
+            output = ProgressWriter(output, progress)
+            element_tree.write(output)
+            output.flush()
 
-def render_composite(
-    filenames, output, *,
-    width: int, height: int, grid: float,
-):
-    svg = xml.etree.ElementTree.TreeBuilder()
+
+def _composite_document(
+    children, *, width: int, height: int, grid: float,
+) -> Element:
+    svg = TreeBuilder()
 
     svg.start("svg", {
         "version": "1.1",
@@ -386,14 +721,65 @@ def render_composite(
     })
     svg.end("rect")
 
-    for filename in filenames:
-        svg.start("use", {
-            "href": f"{filename}#root",
-        })
-        svg.end("use")
-
     svg.end("svg")
     element = svg.close()
+    element.extend(children)
+    return element
+
+
+def render_composite(
+    filenames, output, *,
+    width: int, height: int, grid: float,
+):
+    # A file given more than once is only referred to once, and later uses
+    # refer back to that.
+    filenames = list(filenames)
+    repeated = {
+        filename for filename in filenames if filenames.count(filename) > 1
+    }
+    uses: Dict[str, str] = {}
+    children = []
+    for index, filename in enumerate(filenames):
+        if filename in uses:
+            children.append(Element("use", {"href": f"#{uses[filename]}"}))
+        elif filename in repeated:
+            uses[filename] = f"use{index}"
+            children.append(Element("use", {
+                "id": uses[filename], "href": f"{filename}#root",
+            }))
+        else:
+            children.append(Element("use", {"href": f"{filename}#root"}))
+
+    element = _composite_document(
+        children, width=width, height=height, grid=grid,
+    )
+    element_tree = xml.etree.ElementTree.ElementTree(element)
+
+    element_tree.write(output)
+
+
+def _inline_group(group: Element, id: str) -> Element:
+    # Shares the children of a rendered layer group, so that a layer that has
+    # already been rendered on its own does not have to be traced again.
+    inline = Element(group.tag, {**group.attrib, "id": id})
+    inline.extend(group)
+    return inline
+
+
+def render_composite_inline(
+    layers, output, *, compact: bool = False,
+    processes: Optional[int] = None,
+):
+    """Renders a composite of all layers in a single, self contained
+    document, rather than one that refers to the individual layer files.
+    """
+    element = _composite_document([
+        _layer_group(
+            layer, {"id": f"layer{index}_{layer.name}"},
+            compact=compact, processes=processes,
+        )
+        for index, layer in enumerate(layers)
+    ], width=layers[0].width, height=layers[0].height, grid=layers[0].grid)
     element_tree = xml.etree.ElementTree.ElementTree(element)
 
     element_tree.write(output)
@@ -1,11 +1,57 @@
 import unittest
 
+from pcdl.tests import test_bands
+from pcdl.tests import test_check
+from pcdl.tests import test_chunked
+from pcdl.tests import test_commonline
+from pcdl.tests import test_config
+from pcdl.tests import test_diff
+from pcdl.tests import test_flow
+from pcdl.tests import test_geometry
 from pcdl.tests import test_grid
+from pcdl.tests import test_index
+from pcdl.tests import test_layers
+from pcdl.tests import test_load
+from pcdl.tests import test_memory
+from pcdl.tests import test_nest
+from pcdl.tests import test_output
+from pcdl.tests import test_path
+from pcdl.tests import test_progress
+from pcdl.tests import test_rendering
+from pcdl.tests import test_retrace
+from pcdl.tests import test_server
+from pcdl.tests import test_simulate
+from pcdl.tests import test_stats
+from pcdl.tests import test_stl
 from pcdl.tests import test_svg
+from pcdl.tests import test_tiles
 
 
 loader = unittest.TestLoader()
 suite = unittest.TestSuite((
+    loader.loadTestsFromModule(test_bands),
+    loader.loadTestsFromModule(test_check),
+    loader.loadTestsFromModule(test_chunked),
+    loader.loadTestsFromModule(test_commonline),
+    loader.loadTestsFromModule(test_config),
+    loader.loadTestsFromModule(test_diff),
+    loader.loadTestsFromModule(test_flow),
+    loader.loadTestsFromModule(test_geometry),
     loader.loadTestsFromModule(test_grid),
+    loader.loadTestsFromModule(test_index),
+    loader.loadTestsFromModule(test_layers),
+    loader.loadTestsFromModule(test_load),
+    loader.loadTestsFromModule(test_memory),
+    loader.loadTestsFromModule(test_nest),
+    loader.loadTestsFromModule(test_output),
+    loader.loadTestsFromModule(test_path),
+    loader.loadTestsFromModule(test_progress),
+    loader.loadTestsFromModule(test_rendering),
+    loader.loadTestsFromModule(test_retrace),
+    loader.loadTestsFromModule(test_server),
+    loader.loadTestsFromModule(test_simulate),
+    loader.loadTestsFromModule(test_stats),
+    loader.loadTestsFromModule(test_stl),
     loader.loadTestsFromModule(test_svg),
+    loader.loadTestsFromModule(test_tiles),
 ))
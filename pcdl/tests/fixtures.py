@@ -0,0 +1,98 @@
+"""
+Designs and layers shared between the tests.
+"""
+import io
+import random
+
+import PIL.Image
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+
+
+ROUTE = (200, 0, 0, 255)
+PORT = (0, 0, 200, 255)
+
+
+def frame(cells=(), *, size=(12, 12), channels=(ROUTE,), colour=ROUTE):
+    """Returns an RGBA frame with the colour of each channel down its left
+    edge, as the loader expects, and `cells` filled in with `colour`.
+    """
+    image = PIL.Image.new('RGBA', size, (0, 0, 0, 0))
+    for y, channel in enumerate(channels):
+        image.putpixel((0, y), channel)
+    for cell in cells:
+        image.putpixel(cell, colour)
+    return image
+
+
+def tiff(frames) -> bytes:
+    output = io.BytesIO()
+    frames[0].save(
+        output, format='TIFF', save_all=True, append_images=frames[1:],
+        compression='tiff_deflate',
+    )
+    return output.getvalue()
+
+
+def rows_tiff(rows=(4, 7)) -> bytes:
+    """A TIFF with a frame per row, each routing across that row."""
+    return tiff([frame([(x, y) for x in range(2, 9)]) for y in rows])
+
+
+def gif(cells, *, size=(12, 12)) -> bytes:
+    # Palette index 0 is transparent and index 1 is the first channel, whose
+    # colour is given by the pixel in the top left corner.
+    image = PIL.Image.new('P', size, 0)
+    image.putpalette([255, 255, 255, 255, 0, 0] + [0] * 762)
+    image.putpixel((0, 0), 1)
+    for cell in cells:
+        image.putpixel(cell, 1)
+
+    output = io.BytesIO()
+    image.save(output, format='GIF', transparency=0, optimize=False)
+    return output.getvalue()
+
+
+def populate(layers, *, seed, width, height, density=0.4):
+    """Builds the same random board in each layer, linking every pair of
+    neighbouring cells and drilling cells with no neighbours, just as the
+    loader does.
+    """
+    rng = random.Random(seed)
+    cells = {
+        Coordinate2(x, y)
+        for x in range(1, width - 1) for y in range(1, height - 1)
+        if rng.random() < density
+    }
+    for layer in layers:
+        for cell in sorted(cells, key=tuple):
+            right = Coordinate2(cell.x + 1, cell.y)
+            below = Coordinate2(cell.x, cell.y + 1)
+            if right in cells:
+                layer.add_link(cell, right, radius=0.4)
+            if below in cells:
+                layer.add_link(cell, below, radius=0.4)
+            if not any(
+                neighbour in cells for neighbour in layer.neighbours(cell)
+            ):
+                layer.add_hole(cell, radius=0.4)
+
+
+def random_layer(seed, *, width=48, height=40, density=0.4) -> Layer:
+    layer = Layer(name="test", grid=2.0, width=width, height=height)
+    populate([layer], seed=seed, width=width, height=height, density=density)
+    return layer
+
+
+def sample_layer() -> Layer:
+    """A small layer with a few routes and two sizes of isolated hole."""
+    layer = Layer(name="test", grid=2.0, width=20, height=20)
+    for x in range(2, 8):
+        layer.add_link(Coordinate2(x, 3), Coordinate2(x + 1, 3))
+    for y in range(3, 9):
+        layer.add_link(Coordinate2(5, y), Coordinate2(5, y + 1))
+    layer.add_link(Coordinate2(12, 12), Coordinate2(12, 13))
+    layer.add_hole(Coordinate2(15, 4), radius=0.5)
+    layer.add_hole(Coordinate2(4, 15), radius=0.2)
+    return layer
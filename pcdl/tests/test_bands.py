@@ -0,0 +1,56 @@
+import io
+import unittest
+
+from pcdl.bands import trace_routes
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.svg import _route_paths, render_layer
+from pcdl.tests.fixtures import random_layer
+
+
+class TraceRoutesTestCase(unittest.TestCase):
+    def test_matches_serial(self):
+        for seed in range(4):
+            layer = random_layer(seed)
+            expected = list(_route_paths(layer))
+            for bands in (1, 3, 7, 40):
+                paths = trace_routes(layer, processes=2, bands=bands)
+                self.assertEqual(
+                    [path.to_svg() for path in paths], expected,
+                )
+
+    def test_contour_crossing_every_band(self):
+        layer = Layer(name="test", grid=1.0, width=10, height=30)
+        for y in range(2, 27):
+            layer.add_link(Coordinate2(4, y), Coordinate2(4, y + 1))
+            layer.add_link(Coordinate2(5, y), Coordinate2(5, y + 1))
+        layer.add_link(Coordinate2(4, 2), Coordinate2(5, 2))
+        layer.add_link(Coordinate2(4, 27), Coordinate2(5, 27))
+
+        paths = trace_routes(layer, processes=2, bands=10)
+
+        self.assertEqual(
+            [path.to_svg() for path in paths], list(_route_paths(layer)),
+        )
+
+    def test_dead_ends(self):
+        # Neighbouring cells without a link between them leave half edges
+        # with no successor, which can only be traced serially.
+        layer = Layer(name="test", grid=1.0, width=10, height=10)
+        layer.add_link(Coordinate2(2, 2), Coordinate2(3, 2))
+        layer.add_link(Coordinate2(2, 3), Coordinate2(3, 3))
+        layer.add_link(Coordinate2(2, 2), Coordinate2(2, 3))
+
+        paths = trace_routes(layer, processes=2, bands=5)
+
+        self.assertEqual(
+            [path.to_svg() for path in paths], list(_route_paths(layer)),
+        )
+
+    def test_render(self):
+        layer = random_layer(7)
+        serial = io.BytesIO()
+        render_layer(layer, serial)
+        parallel = io.BytesIO()
+        render_layer(layer, parallel, processes=2)
+        self.assertEqual(parallel.getvalue(), serial.getvalue())
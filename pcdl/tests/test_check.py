@@ -0,0 +1,106 @@
+import functools
+import unittest
+
+from pcdl.check import Problem, check_design
+from pcdl.config import Config
+from pcdl.load import load_design
+from pcdl.tests.fixtures import PORT, frame, tiff
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [{'name': "routes", 'radius': 0.4}],
+    'layers': [{'name': "base"}, {'name': "top"}],
+})
+
+_frame = functools.partial(frame, size=(16, 12))
+
+
+class CheckDesignTestCase(unittest.TestCase):
+    def test_clean(self):
+        frames = [_frame([(4, 4), (5, 4)]), _frame([(8, 9)])]
+        self.assertEqual(check_design(tiff(frames), config=_CONFIG), [])
+
+    def test_edges(self):
+        # The bottom row was only caught if x was also past the height.
+        image = _frame([(3, 11), (14, 5), (15, 5), (1, 7), (4, 1)])
+        config = Config({**_CONFIG, 'layers': [{}]})
+        problems = check_design(tiff([image]), config=config)
+
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(problems[0].layer, "unknown1")
+        self.assertEqual(
+            problems[0].positions, [(4, 1), (15, 5), (1, 7), (3, 11)],
+        )
+
+        edge = tiff([_frame([(4, 4), (3, 11)])])
+        self.assertEqual(len(check_design(edge, config=config)), 1)
+        with self.assertRaises(Exception):
+            load_design(edge, config=config)
+
+    def test_unknown_colours(self):
+        frames = [
+            _frame([(4, 4)]),
+            _frame([(4, 4), (6, 7), (3, 8)], colour=PORT),
+        ]
+        problems = check_design(tiff(frames), config=_CONFIG)
+
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(problems[0].layer, "top")
+        self.assertEqual(
+            problems[0].positions, [(4, 4), (6, 7), (3, 8)],
+        )
+        self.assertEqual(
+            str(problems[0]),
+            "top: 1 colours not in the channel legend at "
+            "(4, 4), (6, 7), (3, 8)",
+        )
+
+    def test_frame_count(self):
+        frames = [_frame(), _frame(), _frame()]
+        problems = check_design(tiff(frames), config=_CONFIG)
+        self.assertEqual(
+            [str(problem) for problem in problems],
+            ["design has 3 frames but only 2 layers are configured"],
+        )
+
+        problems = check_design(tiff(frames[:1]), config=_CONFIG)
+        self.assertEqual(
+            [str(problem) for problem in problems],
+            ["top: layer has no frame"],
+        )
+
+    def test_frame_size(self):
+        frames = [_frame(), frame(size=(16, 14))]
+        problems = check_design(tiff(frames), config=_CONFIG)
+        self.assertEqual(
+            [str(problem) for problem in problems],
+            ["top: frame is 16x14 pixels but the first frame is 16x12"],
+        )
+
+    def test_reports_everything(self):
+        frames = [
+            _frame([(0, 5), (3, 3), (15, 3)], colour=PORT),
+            _frame([(2, 0)]),
+        ]
+        problems = check_design(tiff(frames), config=_CONFIG)
+        self.assertEqual(
+            [(problem.layer, problem.positions) for problem in problems],
+            [
+                ("base", [(15, 3)]),
+                ("base", [(3, 3), (15, 3)]),
+                ("top", [(2, 0)]),
+            ],
+        )
+
+    def test_format(self):
+        problem = Problem(
+            "base", "pixels too close to the edge of the board",
+            [(x, 0) for x in range(10)],
+        )
+        self.assertEqual(
+            str(problem),
+            "base: pixels too close to the edge of the board at (0, 0), "
+            "(1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0) "
+            "and 2 more",
+        )
@@ -0,0 +1,132 @@
+import io
+import random
+import unittest
+
+from pcdl.chunked import ChunkedLayer
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.svg import (
+    _half_edges, _isolated_holes, _route_paths, _trace_contours, render_layer,
+)
+from pcdl.tests.fixtures import populate
+
+
+class ChunkedLayerTestCase(unittest.TestCase):
+    def _layers(self, seed, width=40, height=30):
+        layer = Layer(name="test", grid=2.0, width=width, height=height)
+        chunked = ChunkedLayer(
+            name="test", grid=2.0, width=width, height=height,
+            chunk_size=8, max_chunks=2,
+        )
+        self.addCleanup(chunked.close)
+        populate(
+            [layer, chunked], seed=seed, width=width, height=height,
+            density=0.35,
+        )
+        return layer, chunked
+
+    def test_features(self):
+        layer, chunked = self._layers(1)
+
+        self.assertEqual(
+            {(hole.position, hole.radius) for hole in chunked.holes()},
+            {(hole.position, hole.radius) for hole in layer.holes()},
+        )
+        self.assertEqual(
+            {(link.a, link.b, link.radius) for link in chunked.links()},
+            {(link.a, link.b, link.radius) for link in layer.links()},
+        )
+        self.assertEqual(chunked.cells(), layer.cells())
+        for x in range(layer.width):
+            for y in range(layer.height):
+                position = Coordinate2(x, y)
+                self.assertEqual(
+                    chunked.connected(position), layer.connected(position),
+                )
+
+    def test_contours_match(self):
+        # Contours and holes come out in the same order, so documents are
+        # byte for byte the same.
+        for seed in range(5):
+            layer, chunked = self._layers(seed)
+            self.assertEqual(
+                list(_route_paths(chunked)), list(_route_paths(layer)),
+            )
+            self.assertEqual(
+                list(_isolated_holes(chunked)), list(_isolated_holes(layer)),
+            )
+
+            output, expected = io.BytesIO(), io.BytesIO()
+            render_layer(chunked, output)
+            render_layer(layer, expected)
+            self.assertEqual(output.getvalue(), expected.getvalue())
+
+    def test_contour_spanning_chunks(self):
+        layer = Layer(name="test", grid=1.0, width=40, height=40)
+        chunked = ChunkedLayer(
+            name="test", grid=1.0, width=40, height=40,
+            chunk_size=8, max_chunks=2,
+        )
+        self.addCleanup(chunked.close)
+        # A ring that passes through nine chunks.
+        ring = (
+            [Coordinate2(x, 3) for x in range(3, 30)] +
+            [Coordinate2(29, y) for y in range(3, 30)] +
+            [Coordinate2(x, 29) for x in range(29, 2, -1)] +
+            [Coordinate2(3, y) for y in range(29, 2, -1)]
+        )
+        for target in (layer, chunked):
+            for a, b in zip(ring, ring[1:]):
+                if a != b:
+                    target.add_link(a, b)
+
+        paths = list(_route_paths(chunked))
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(paths, list(_route_paths(layer)))
+
+    def test_arbitrary_links(self):
+        # Links that the loader would never produce can leave contours that
+        # do not close, which are traced in the same order all the same.
+        rng = random.Random(4)
+        layer = Layer(name="test", grid=1.0, width=40, height=30)
+        chunked = ChunkedLayer(
+            name="test", grid=1.0, width=40, height=30,
+            chunk_size=8, max_chunks=2,
+        )
+        self.addCleanup(chunked.close)
+        for _ in range(500):
+            a = Coordinate2(rng.randrange(1, 38), rng.randrange(1, 28))
+            b = rng.choice([
+                Coordinate2(a.x + 1, a.y), Coordinate2(a.x, a.y + 1),
+            ])
+            layer.add_link(a, b)
+            chunked.add_link(a, b)
+
+        expected = list(_trace_contours(_half_edges(layer)))
+        self.assertTrue(any(
+            contour[0] != contour[-1] for contour in expected
+        ))
+        self.assertEqual(list(chunked.trace_contours()), expected)
+
+    def test_retrace(self):
+        # Tracing marks half edges as visited, and a later trace starts
+        # afresh even if an earlier one was abandoned.
+        layer, chunked = self._layers(3)
+        expected = list(_route_paths(layer))
+        next(chunked.trace_contours())
+        self.assertEqual(list(_route_paths(chunked)), expected)
+        self.assertEqual(list(_route_paths(chunked)), expected)
+
+    def test_bounded_residency(self):
+        _, chunked = self._layers(2, width=64, height=64)
+        list(chunked.trace_contours())
+        self.assertLessEqual(chunked._store.resident(), 2)
+
+    def test_outside(self):
+        chunked = ChunkedLayer(name="test", width=10, height=10)
+        self.addCleanup(chunked.close)
+        with self.assertRaises(ValueError):
+            chunked.add_hole(Coordinate2(10, 2), radius=0.5)
+        with self.assertRaises(ValueError):
+            chunked.add_link(Coordinate2(9, 2), Coordinate2(10, 2))
+        self.assertEqual(chunked.connected(Coordinate2(-1, 20)), set())
@@ -0,0 +1,79 @@
+import unittest
+
+from pcdl.commonline import merge_common_lines
+from pcdl.path import PathBuilder
+
+
+def _rectangle(x0, y0, x1, y1):
+    path = PathBuilder()
+    path.move_to(x0, y0)
+    path.line_to(x1, y0)
+    path.line_to(x1, y1)
+    path.line_to(x0, y1)
+    path.close_path()
+    return path
+
+
+class MergeCommonLinesTestCase(unittest.TestCase):
+    def test_disjoint(self):
+        paths = [_rectangle(0, 0, 10, 10), _rectangle(20, 0, 30, 10)]
+        merged = merge_common_lines(paths)
+        self.assertEqual(
+            [path.to_svg() for path in merged.paths],
+            [path.to_svg() for path in paths],
+        )
+        self.assertEqual(merged.saving, 0.0)
+
+    def test_shared_edge(self):
+        merged = merge_common_lines([
+            _rectangle(0, 0, 10, 10), _rectangle(10, 0, 20, 10),
+        ])
+        self.assertEqual(merged.length_before, 80.0)
+        self.assertEqual(merged.length_after, 70.0)
+        self.assertEqual(merged.saving, 10.0)
+        self.assertEqual(
+            merged.paths[1].to_svg(),
+            "M 10.0,0.0 L 20.0,0.0 L 20.0,10.0 L 10.0,10.0",
+        )
+
+    def test_partial_overlap(self):
+        merged = merge_common_lines([
+            _rectangle(0, 0, 10, 10), _rectangle(10, 4, 14, 14),
+        ])
+        self.assertEqual(merged.saving, 6.0)
+        self.assertEqual(
+            merged.paths[1].to_svg(),
+            "M 10.0,4.0 L 14.0,4.0 L 14.0,14.0 L 10.0,14.0 L 10.0,10.0",
+        )
+
+    def test_close_trimmed(self):
+        # The closing segment of the second rectangle runs back down the
+        # shared edge, and only its lower half is left to cut.
+        path = PathBuilder()
+        path.move_to(0, 0)
+        path.line_to(0, 10)
+        merged = merge_common_lines([path, _rectangle(0, 0, -5, 20)])
+        self.assertEqual(merged.saving, 10.0)
+        self.assertEqual(
+            merged.paths[1].to_svg(),
+            "M 0.0,0.0 L -5.0,0.0 L -5.0,20.0 L 0.0,20.0 L 0.0,10.0",
+        )
+
+    def test_arcs_kept(self):
+        path = PathBuilder()
+        path.move_to(0, 0)
+        path.line_to(10, 0)
+        path.arc_to(10, 10, rx=5, ry=5)
+        path.close_path()
+        merged = merge_common_lines([_rectangle(0, -10, 10, 0), path])
+        self.assertEqual(
+            merged.paths[1].to_svg(),
+            "M 10.0,0.0 A 5.0,5.0 0 0,0 10.0,10.0 L 0.0,0.0",
+        )
+        self.assertAlmostEqual(merged.saving, 10.0)
+
+    def test_tolerance(self):
+        merged = merge_common_lines([
+            _rectangle(0, 0, 10, 10), _rectangle(10 + 1e-9, 0, 20, 10),
+        ])
+        self.assertAlmostEqual(merged.saving, 10.0)
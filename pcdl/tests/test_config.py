@@ -0,0 +1,46 @@
+import pickle
+import unittest
+
+from pcdl.config import Config
+
+
+_TEXT = """
+grid = 2.0
+
+[[channels]]
+name = "routes"
+radius = 0.4
+
+[storage]
+chunk_size = 64
+"""
+
+
+class ConfigTestCase(unittest.TestCase):
+    def test_parse(self):
+        config = Config.parse(_TEXT)
+        self.assertEqual(config['grid'], 2.0)
+        self.assertEqual(config['channels'][0]['radius'], 0.4)
+        self.assertEqual(config['storage'].get('chunk_size'), 64)
+        self.assertIsNone(config.get('simulation'))
+
+    def test_immutable(self):
+        config = Config.parse(_TEXT)
+        self.assertIsInstance(config['channels'], tuple)
+        # pylint: disable=unsupported-assignment-operation
+        with self.assertRaises(TypeError):
+            config['grid'] = 3.0
+        with self.assertRaises(TypeError):
+            config['storage']['chunk_size'] = 32
+        with self.assertRaises(AttributeError):
+            config.grid = 3.0
+
+    def test_copies_source(self):
+        values = {'grid': 2.0, 'layers': [{'name': "base"}]}
+        config = Config(values)
+        values['layers'][0]['name'] = "top"
+        self.assertEqual(config['layers'][0]['name'], "base")
+
+    def test_pickle(self):
+        config = Config.parse(_TEXT)
+        self.assertEqual(pickle.loads(pickle.dumps(config)), config)
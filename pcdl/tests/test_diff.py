@@ -0,0 +1,98 @@
+import io
+import unittest
+import xml.etree.ElementTree
+
+from pcdl.diff import LayerDiff, diff_stacks, format_report, render_diff
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def _layer():
+    layer = Layer(name="test", width=40, height=40)
+    for x in range(2, 10):
+        layer.add_link(Coordinate2(x, 5), Coordinate2(x + 1, 5))
+    layer.add_hole(Coordinate2(20, 20), radius=0.5)
+    return layer
+
+
+class LayerDiffTestCase(unittest.TestCase):
+    def test_unchanged(self):
+        diff = LayerDiff(_layer(), _layer())
+        self.assertFalse(diff)
+        self.assertEqual(diff.regions(), [])
+
+    def test_changes(self):
+        old = _layer()
+        new = _layer()
+        new.add_link(Coordinate2(10, 5), Coordinate2(11, 5))
+        new.add_hole(Coordinate2(30, 30), radius=0.5)
+        old.add_hole(Coordinate2(31, 31), radius=0.5)
+
+        diff = LayerDiff(old, new)
+
+        self.assertEqual(
+            diff.added_links,
+            {(Coordinate2(10, 5), Coordinate2(11, 5), None)},
+        )
+        self.assertEqual(diff.removed_links, set())
+        self.assertEqual(diff.added_holes, {(Coordinate2(30, 30), 0.5)})
+        self.assertEqual(diff.removed_holes, {(Coordinate2(31, 31), 0.5)})
+        self.assertEqual(diff.regions(), [
+            (10, 5, 11, 5),
+            (30, 30, 31, 31),
+        ])
+
+    def test_changed_radius(self):
+        old = _layer()
+        new = _layer()
+        new.add_hole(Coordinate2(20, 20), radius=0.8)
+
+        diff = LayerDiff(old, new)
+
+        self.assertEqual(diff.regions(), [(20, 20, 20, 20)])
+
+    def test_changed_link_radius(self):
+        old = _layer()
+        new = _layer()
+        new.add_link(Coordinate2(2, 5), Coordinate2(3, 5), radius=0.6)
+
+        diff = LayerDiff(old, new)
+
+        self.assertTrue(diff)
+        self.assertEqual(
+            diff.added_links, {(Coordinate2(2, 5), Coordinate2(3, 5), 0.6)},
+        )
+        self.assertEqual(
+            diff.removed_links,
+            {(Coordinate2(2, 5), Coordinate2(3, 5), None)},
+        )
+        self.assertEqual(diff.regions(), [(2, 5, 3, 5)])
+
+
+class ReportTestCase(unittest.TestCase):
+    def test_mismatched_stacks(self):
+        with self.assertRaises(ValueError):
+            diff_stacks([_layer()], [_layer(), _layer()])
+
+    def test_report(self):
+        new = _layer()
+        new.add_hole(Coordinate2(30, 30), radius=0.5)
+        report = format_report(diff_stacks([_layer()], [new]))
+        self.assertEqual(
+            report, "test: +1 -0 holes, +0 -0 links\n  (30, 30) to (30, 30)",
+        )
+
+    def test_overlay_only_contains_changes(self):
+        new = _layer()
+        new.add_link(Coordinate2(12, 12), Coordinate2(12, 13))
+
+        output = io.BytesIO()
+        render_diff(diff_stacks([_layer()], [new]), output)
+        root = xml.etree.ElementTree.fromstring(output.getvalue())
+
+        paths = root.findall(f".//{SVG}path")
+        self.assertEqual(len(paths), 1)
+        self.assertEqual(paths[0].get("d").count("M"), 1)
+        self.assertEqual(root.findall(f".//{SVG}circle"), [])
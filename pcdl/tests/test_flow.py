@@ -0,0 +1,101 @@
+import math
+import unittest
+
+from pcdl.flow import (
+    FlowError, Network, Transient, actuation_time, solve_steady,
+)
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+
+
+def _tee():
+    # A horizontal channel from (2, 2) to (10, 2) with a branch running down
+    # from (6, 2) to (6, 6), plus an isolated hole.
+    layer = Layer(width=16, height=16, grid=2.0, thickness=2.0)
+    for x in range(2, 10):
+        layer.add_link(Coordinate2(x, 2), Coordinate2(x + 1, 2), radius=0.4)
+    for y in range(2, 6):
+        layer.add_link(Coordinate2(6, y), Coordinate2(6, y + 1), radius=0.4)
+    layer.add_hole(Coordinate2(12, 12), radius=0.5)
+    return layer
+
+
+class SteadyTestCase(unittest.TestCase):
+    def test_linear_pressure_drop(self):
+        network = Network(_tee())
+        solution = solve_steady(network, {
+            Coordinate2(2, 2): 100.0,
+            Coordinate2(10, 2): 0.0,
+        })
+
+        # No flow goes down the dead end branch.
+        for x in range(2, 11):
+            self.assertAlmostEqual(
+                solution.pressure(Coordinate2(x, 2)), 100 - 12.5 * (x - 2),
+            )
+        for y in range(2, 7):
+            self.assertAlmostEqual(
+                solution.pressure(Coordinate2(6, y)), 50.0,
+            )
+
+        self.assertTrue(math.isnan(solution.pressure(Coordinate2(12, 12))))
+
+    def test_flow_is_conserved(self):
+        network = Network(_tee())
+        solution = solve_steady(network, {
+            Coordinate2(2, 2): 100.0,
+            Coordinate2(10, 2): 0.0,
+            Coordinate2(6, 6): 0.0,
+        })
+
+        inflow = solution.flow(Coordinate2(5, 2), Coordinate2(6, 2))
+        outflow = (
+            solution.flow(Coordinate2(6, 2), Coordinate2(7, 2)) +
+            solution.flow(Coordinate2(6, 2), Coordinate2(6, 3))
+        )
+        self.assertGreater(inflow, 0)
+        self.assertAlmostEqual(inflow / outflow, 1.0)
+
+        # Both outlets are the same distance away.
+        self.assertAlmostEqual(
+            solution.flow(Coordinate2(9, 2), Coordinate2(10, 2)),
+            solution.flow(Coordinate2(6, 5), Coordinate2(6, 6)),
+        )
+
+    def test_unknown_position(self):
+        network = Network(_tee())
+        with self.assertRaises(FlowError):
+            solve_steady(network, {Coordinate2(0, 0): 1.0})
+
+
+class TransientTestCase(unittest.TestCase):
+    def test_converges_to_steady_state(self):
+        network = Network(_tee())
+        pressures = {
+            Coordinate2(2, 2): 100.0,
+            Coordinate2(10, 2): 0.0,
+        }
+        steady = solve_steady(network, pressures)
+
+        transient = Transient(network, pressures)
+        for _ in range(50):
+            solution = transient.step(1.0)
+
+        for node in network.nodes:
+            if node == Coordinate2(12, 12):
+                continue
+            self.assertAlmostEqual(
+                solution.pressure(node), steady.pressure(node), places=6,
+            )
+
+    def test_actuation_time(self):
+        network = Network(_tee())
+        near = actuation_time(
+            network, {Coordinate2(2, 2): 100.0}, Coordinate2(3, 2), 50.0,
+            dt=1e-10, max_time=1e-6,
+        )
+        far = actuation_time(
+            network, {Coordinate2(2, 2): 100.0}, Coordinate2(6, 6), 50.0,
+            dt=1e-10, max_time=1e-6,
+        )
+        self.assertLess(near, far)
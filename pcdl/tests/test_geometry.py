@@ -0,0 +1,114 @@
+import ast
+import io
+import struct
+import unittest
+import zipfile
+from array import array
+
+from pcdl.geometry import (
+    ARRAYS, layer_geometry, read_binary, write_binary, write_npz,
+)
+from pcdl.svg import (
+    _isolated_holes, _route_paths, layer_routes, render_layer,
+)
+from pcdl.tests.fixtures import sample_layer
+
+
+def _read_npy(data):
+    length, = struct.unpack_from('<H', data, 8)
+    header = ast.literal_eval(data[10:10 + length].decode('latin1'))
+    return header, 10 + length, data[10 + length:]
+
+
+class GeometryTestCase(unittest.TestCase):
+    def test_contours(self):
+        layer = sample_layer()
+        geometry = layer_geometry(layer)
+
+        paths = list(_route_paths(layer))
+        self.assertEqual(len(geometry), len(paths))
+        self.assertEqual(
+            [geometry.contour(i).to_svg() for i in range(len(geometry))],
+            paths,
+        )
+        self.assertEqual(geometry.contours[-1], len(geometry.codes))
+        self.assertEqual(
+            2 * geometry.contour_points[-1], len(geometry.points),
+        )
+
+    def test_holes(self):
+        layer = sample_layer()
+        geometry = layer_geometry(layer)
+
+        holes = list(_isolated_holes(layer))
+        self.assertEqual(
+            list(geometry.hole_centres),
+            [value for x, y, r in holes for value in (x, y)],
+        )
+        self.assertEqual(list(geometry.hole_radii), [r for x, y, r in holes])
+
+    def test_shared_routes(self):
+        # Routes traced once give the same geometry and document as tracing
+        # for each.
+        layer = sample_layer()
+        routes = layer_routes(layer)
+
+        geometry = layer_geometry(layer, routes=routes)
+        expected = layer_geometry(layer)
+        for name in ARRAYS:
+            self.assertEqual(
+                getattr(geometry, name), getattr(expected, name), name,
+            )
+
+        output, expected_output = io.BytesIO(), io.BytesIO()
+        render_layer(layer, output, routes=routes)
+        render_layer(layer, expected_output)
+        self.assertEqual(output.getvalue(), expected_output.getvalue())
+
+    def test_buffers(self):
+        geometry = layer_geometry(sample_layer())
+        view = memoryview(geometry.points)
+        self.assertEqual(view.format, 'd')
+        self.assertEqual(view.nbytes, 8 * len(geometry.points))
+        self.assertEqual(memoryview(geometry.contours).itemsize, 8)
+
+    def test_binary(self):
+        geometry = layer_geometry(sample_layer())
+        output = io.BytesIO()
+        write_binary(geometry, output)
+
+        data = output.getvalue()
+        self.assertEqual(data[:8], b"PCDLGEOM")
+        self.assertEqual(len(data) % 8, 0)
+
+        result = read_binary(data)
+        self.assertEqual(result.width, 40.0)
+        self.assertEqual(result.height, 40.0)
+        for name in ARRAYS:
+            self.assertEqual(getattr(result, name), getattr(geometry, name))
+
+    def test_binary_invalid(self):
+        with self.assertRaises(ValueError):
+            read_binary(bytes(128))
+
+    def test_npz(self):
+        geometry = layer_geometry(sample_layer())
+        output = io.BytesIO()
+        write_npz(geometry, output)
+
+        with zipfile.ZipFile(io.BytesIO(output.getvalue())) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted([f"{name}.npy" for name in ARRAYS] + ["size.npy"]),
+            )
+
+            header, offset, data = _read_npy(archive.read("points.npy"))
+            self.assertEqual(header['descr'], '<f8')
+            self.assertEqual(header['shape'], (len(geometry.points) // 2, 2))
+            self.assertEqual(offset % 64, 0)
+            self.assertEqual(array('d', data), geometry.points)
+
+            header, offset, data = _read_npy(archive.read("codes.npy"))
+            self.assertEqual(header['descr'], '|u1')
+            self.assertEqual(header['shape'], (len(geometry.codes),))
+            self.assertEqual(data, geometry.codes.tobytes())
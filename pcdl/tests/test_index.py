@@ -0,0 +1,74 @@
+import math
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.tests.fixtures import random_layer
+
+
+def _pairs(values, size):
+    return [tuple(values[i:i + size]) for i in range(0, len(values), size)]
+
+
+class SpatialIndexTestCase(unittest.TestCase):
+    def test_holes_in(self):
+        layer = random_layer(1, width=100, height=80, density=0.1)
+
+        expected = sorted(
+            tuple(hole.position) for hole in layer.holes()
+            if 10 <= hole.position.x <= 40 and 20 <= hole.position.y <= 33
+        )
+        self.assertEqual(
+            _pairs(layer.index().holes_in(10, 20, 40, 33), 2), expected,
+        )
+
+    def test_links_in(self):
+        layer = random_layer(2, width=100, height=80, density=0.1)
+
+        def inside(point):
+            return 17 <= point.x <= 50 and 16 <= point.y <= 64
+
+        expected = sorted(
+            (*link.a, *link.b) for link in layer.links()
+            if inside(link.a) or inside(link.b)
+        )
+        self.assertEqual(
+            _pairs(layer.index().links_in(17, 16, 50, 64), 4), expected,
+        )
+
+    def test_nearest_holes(self):
+        layer = random_layer(3, width=100, height=80, density=0.1)
+        index = layer.index()
+
+        for x, y in [(0, 0), (50, 40), (99.5, 79), (33.3, 12.1)]:
+            expected = sorted(
+                (math.hypot(x - hole.position.x, y - hole.position.y),
+                 tuple(hole.position))
+                for hole in layer.holes()
+            )[:5]
+            self.assertEqual(
+                _pairs(index.nearest_holes(x, y, k=5), 2),
+                [position for _, position in expected],
+            )
+
+    def test_nearest_link(self):
+        layer = Layer(width=100, height=100)
+        layer.add_link(Coordinate2(5, 5), Coordinate2(5, 6))
+        layer.add_link(Coordinate2(60, 60), Coordinate2(61, 60))
+
+        self.assertEqual(
+            list(layer.index().nearest_links(70, 58)), [60, 60, 61, 60],
+        )
+
+    def test_updated_on_add(self):
+        layer = Layer(width=100, height=100)
+        index = layer.index()
+        self.assertEqual(list(index.nearest_holes(50, 50)), [])
+
+        layer.add_hole(Coordinate2(80, 20), radius=0.5)
+        layer.add_link(Coordinate2(49, 50), Coordinate2(50, 50))
+
+        self.assertEqual(list(index.nearest_holes(50, 50)), [80, 20])
+        self.assertEqual(
+            list(index.links_in(50, 50, 50, 50)), [49, 50, 50, 50],
+        )
@@ -0,0 +1,82 @@
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+
+
+class LayerTestCase(unittest.TestCase):
+    def test_remove_hole(self):
+        layer = Layer(width=10, height=10)
+        layer.index()
+        layer.add_hole(Coordinate2(3, 4), radius=0.5)
+        layer.remove_hole(Coordinate2(3, 4))
+
+        self.assertEqual(list(layer.holes()), [])
+        self.assertEqual(len(layer.index().holes_in(0, 0, 9, 9)), 0)
+        with self.assertRaises(KeyError):
+            layer.remove_hole(Coordinate2(3, 4))
+
+    def test_remove_link(self):
+        layer = Layer(width=10, height=10)
+        layer.index()
+        layer.add_link(Coordinate2(3, 4), Coordinate2(4, 4), radius=0.4)
+        layer.add_link(Coordinate2(3, 4), Coordinate2(3, 5))
+        layer.remove_link(Coordinate2(4, 4), Coordinate2(3, 4))
+
+        self.assertEqual(
+            [(link.a, link.b) for link in layer.links()],
+            [(Coordinate2(3, 4), Coordinate2(3, 5))],
+        )
+        self.assertEqual(layer.connected(Coordinate2(3, 4)), {
+            Coordinate2(3, 5),
+        })
+        self.assertEqual(len(layer.index().links_in(0, 0, 9, 9)), 4)
+        self.assertIsNone(
+            layer.link_radius(Coordinate2(3, 4), Coordinate2(4, 4)),
+        )
+        with self.assertRaises(KeyError):
+            layer.remove_link(Coordinate2(3, 4), Coordinate2(4, 4))
+
+    def test_journal(self):
+        layer = Layer(width=10, height=10)
+        layer.add_hole(Coordinate2(1, 1), radius=0.5)
+
+        journal = layer.journal()
+        self.assertFalse(journal)
+
+        layer.add_link(Coordinate2(3, 4), Coordinate2(4, 4))
+        layer.remove_hole(Coordinate2(1, 1))
+        self.assertEqual(journal.take(), {
+            Coordinate2(3, 4), Coordinate2(4, 4), Coordinate2(1, 1),
+        })
+        self.assertEqual(journal.take(), set())
+
+    def test_patch(self):
+        layer = Layer(width=10, height=10)
+        layer.add_link(Coordinate2(2, 2), Coordinate2(3, 2), radius=0.4)
+        layer.add_link(Coordinate2(3, 2), Coordinate2(4, 2), radius=0.4)
+        layer.add_link(Coordinate2(7, 7), Coordinate2(8, 7), radius=0.4)
+
+        other = Layer(width=10, height=10)
+        other.add_link(Coordinate2(3, 2), Coordinate2(3, 3), radius=0.2)
+        other.add_hole(Coordinate2(5, 5), radius=0.5)
+        other.add_hole(Coordinate2(1, 8), radius=0.5)
+
+        journal = layer.journal()
+        layer.patch(other, 3, 2, 5, 5)
+
+        self.assertEqual(
+            sorted(
+                (tuple(link.a), tuple(link.b), link.radius)
+                for link in layer.links()
+            ),
+            [((3, 2), (3, 3), 0.2), ((7, 7), (8, 7), 0.4)],
+        )
+        self.assertEqual(
+            [(tuple(hole.position), hole.radius) for hole in layer.holes()],
+            [((5, 5), 0.5)],
+        )
+        self.assertEqual(journal.take(), {
+            Coordinate2(2, 2), Coordinate2(3, 2), Coordinate2(4, 2),
+            Coordinate2(3, 3), Coordinate2(5, 5),
+        })
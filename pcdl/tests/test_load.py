@@ -0,0 +1,121 @@
+import io
+import pathlib
+import tempfile
+import unittest
+
+from pcdl.config import Config
+from pcdl.load import load_design, load_directory, load_gif, load_tiff
+from pcdl.tests.fixtures import PORT, ROUTE, frame, tiff
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [
+        {'name': "routes", 'radius': 0.4},
+        {'name': "ports", 'radius': 0.5},
+    ],
+    'layers': [{'name': "base"}, {'name': "top"}, {'name': "cover"}],
+})
+
+
+def _frame(cells, ports=()):
+    image = frame(cells, size=(16, 12), channels=(ROUTE, PORT))
+    for cell in ports:
+        image.putpixel(cell, PORT)
+    return image
+
+
+def _frames():
+    return [
+        _frame([(x, 4) for x in range(2, 10)], ports=[(6, 8)]),
+        _frame([(5, y) for y in range(2, 10)] + [(6, 5)]),
+        _frame([(3, 3)], ports=[(9, 9), (10, 9)]),
+    ]
+
+
+def _summary(layers):
+    return [
+        (
+            layer.name,
+            sorted(
+                (tuple(link.a), tuple(link.b), link.radius)
+                for link in layer.links()
+            ),
+            sorted(
+                (tuple(hole.position), hole.radius)
+                for hole in layer.holes()
+            ),
+        )
+        for layer in layers
+    ]
+
+
+class LoadTestCase(unittest.TestCase):
+    def test_tiff_matches_gif(self):
+        frames = _frames()
+        expected = []
+        for index, image in enumerate(frames):
+            output = io.BytesIO()
+            image.save(output, format='GIF')
+            config = Config({
+                **_CONFIG, 'layers': [_CONFIG['layers'][index]],
+            })
+            expected.extend(load_gif(output.getvalue(), config=config))
+
+        layers = load_tiff(tiff(frames), config=_CONFIG, workers=3)
+
+        self.assertEqual(_summary(layers), _summary(expected))
+        self.assertEqual(
+            [len(list(layer.links())) for layer in layers], [7, 8, 1],
+        )
+        self.assertEqual(
+            [len(list(layer.holes())) for layer in layers], [1, 0, 1],
+        )
+
+    def test_directory(self):
+        frames = _frames()
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            frames[0].save(directory.joinpath("b.png"))
+            frames[1].save(directory.joinpath("a.png"))
+            frames[2].save(directory.joinpath("cover.png"))
+
+            # Layers without a file take the rest in order of filename.
+            config = Config({**_CONFIG, 'layers': [
+                {'name': "base"},
+                {'name': "top", 'file': "cover.png"},
+                {'name': "cover"},
+            ]})
+            layers = load_directory(directory, config=config, workers=2)
+
+        frames = _frames()
+        paged = load_tiff(tiff(
+            [frames[1], frames[2], frames[0]],
+        ), config=config)
+
+        self.assertEqual(_summary(layers), _summary(paged))
+
+    def test_load_design(self):
+        data = tiff(_frames())
+        expected = _summary(load_tiff(data, config=_CONFIG))
+
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            directory.joinpath("design.tiff").write_bytes(data)
+            self.assertEqual(_summary(load_design(
+                directory.joinpath("design.tiff"), config=_CONFIG,
+            )), expected)
+
+            for index, image in enumerate(_frames()):
+                image.save(directory.joinpath(f"layer{index}.png"))
+            self.assertEqual(_summary(load_design(
+                directory, config=_CONFIG,
+            )), expected)
+
+        self.assertEqual(
+            _summary(load_design(data, config=_CONFIG)), expected,
+        )
+        self.assertEqual(
+            _summary(load_design(io.BytesIO(data), config=_CONFIG)),
+            expected,
+        )
@@ -0,0 +1,136 @@
+import io
+import unittest
+from unittest import mock
+
+from pcdl import budget
+from pcdl.budget import MemoryBudgetError, plan_memory
+from pcdl.config import Config
+from pcdl.load import load_design
+from pcdl.memory import MemoryProfile, measure
+from pcdl.svg import render_layer
+from pcdl.tests.fixtures import gif, rows_tiff
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [{'name': "routes", 'radius': 0.4}],
+    'layers': [{'name': "base"}, {'name': "top"}],
+})
+
+
+class MemoryProfileTestCase(unittest.TestCase):
+    def test_stages(self):
+        with MemoryProfile() as memory:
+            layers = load_design(rows_tiff(), config=_CONFIG, memory=memory)
+            output = io.BytesIO()
+            render_layer(layers[0], output, memory=memory)
+
+        self.assertEqual(
+            list(memory.stages),
+            ['decode', 'build layer', 'half edges', 'trace', 'build tree',
+             'write'],
+        )
+        self.assertEqual(memory.stages['decode'].runs, 2)
+        self.assertEqual(memory.stages['build layer'].runs, 2)
+        self.assertEqual(memory.stages['trace'].runs, 1)
+        for stage in memory.stages.values():
+            self.assertGreater(stage.peak, 0)
+            self.assertGreater(stage.resident, 0)
+            self.assertGreaterEqual(stage.peak_resident, stage.resident)
+        self.assertIn(memory.peak(), memory.stages.values())
+
+        # Measuring changes nothing about the output.
+        unmeasured = io.BytesIO()
+        render_layer(layers[0], unmeasured)
+        self.assertEqual(output.getvalue(), unmeasured.getvalue())
+
+    def test_nested(self):
+        with MemoryProfile() as memory:
+            with memory.stage('outer'):
+                with memory.stage('inner'):
+                    data = bytearray(1 << 20)
+                del data
+
+        self.assertGreaterEqual(memory.stages['inner'].peak, 1 << 20)
+        self.assertGreaterEqual(memory.stages['outer'].peak, 1 << 20)
+        self.assertLess(memory.stages['outer'].retained, 1 << 20)
+        self.assertGreaterEqual(memory.stages['inner'].retained, 1 << 20)
+
+    def test_measure_without_profile(self):
+        with measure(None, 'decode'):
+            pass
+
+
+class PlanMemoryTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(budget, '_resident', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parallel(self):
+        plan = plan_memory(
+            rows_tiff(), config=_CONFIG, budget=1 << 30, workers=2,
+        )
+        self.assertEqual(plan.strategy, 'parallel')
+        self.assertEqual(plan.workers, 2)
+        self.assertIs(plan.config, _CONFIG)
+        self.assertLessEqual(plan.peak, 1 << 30)
+
+    def test_gif(self):
+        # The frames of a GIF are decoded in order whatever the number of
+        # workers, so decoding them in parallel is not offered.
+        config = Config({**_CONFIG, 'layers': [{'name': "base"}]})
+        plan = plan_memory(
+            gif([(x, 4) for x in range(2, 9)]), config=config,
+            budget=1 << 30, workers=2,
+        )
+        self.assertEqual(plan.strategy, 'serial')
+
+    def test_chunked(self):
+        # With a single thread there is nothing to decode in parallel, so
+        # too little to decode serially goes straight to chunks.
+        serial = plan_memory(
+            rows_tiff(), config=_CONFIG, budget=1 << 30, workers=1,
+        )
+        self.assertEqual(serial.strategy, 'serial')
+        plan = plan_memory(
+            rows_tiff(), config=_CONFIG, budget=serial.peak - 1, workers=1,
+        )
+        self.assertEqual(plan.strategy, 'chunked')
+        self.assertEqual(plan.workers, 1)
+        self.assertIn('storage', plan.config)
+        self.assertLess(plan.peak, serial.peak)
+
+        # The layers load and render the same either way.
+        layers = load_design(rows_tiff(), config=plan.config)
+        expected = load_design(rows_tiff(), config=_CONFIG)
+        for layer, other in zip(layers, expected):
+            output, other_output = io.BytesIO(), io.BytesIO()
+            render_layer(layer, output)
+            render_layer(other, other_output)
+            self.assertEqual(output.getvalue(), other_output.getvalue())
+
+    def test_repeated(self):
+        # The document of a repeated layer is held until it has been
+        # written for the last time.
+        single = plan_memory(
+            rows_tiff(), config=Config({**_CONFIG, 'layers': [{}]}),
+            budget=1 << 30, workers=1,
+        )
+        repeated = plan_memory(
+            rows_tiff((4, 4)),
+            config=Config({**_CONFIG, 'layers': [{}, {}]}),
+            budget=1 << 30, workers=1,
+        )
+        self.assertEqual(
+            repeated.peak - single.peak,
+            (budget._LAYER + budget._DOCUMENT) * 8,
+        )
+
+    def test_too_small(self):
+        with self.assertRaisesRegex(
+            MemoryBudgetError,
+            r"needs about \d+\.\dkB even with layers kept on disk, but only "
+            r"0\.1kB of the 0\.1kB budget",
+        ):
+            plan_memory(rows_tiff(), config=_CONFIG, budget=100)
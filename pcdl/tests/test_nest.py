@@ -0,0 +1,125 @@
+import io
+import itertools
+import unittest
+import xml.etree.ElementTree
+
+from pcdl.grid import R0, R90
+from pcdl.layers import Layer
+from pcdl.nest import nest_layers, render_sheet, sheet_size
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def _overlaps(a, b):
+    return (
+        a.x < b.x + b.width and b.x < a.x + a.width and
+        a.y < b.y + b.height and b.y < a.y + a.height
+    )
+
+
+class NestTestCase(unittest.TestCase):
+    CONFIG = {'sheets': [{'width': 100.0, 'height': 60.0}]}
+
+    def test_shares_sheet(self):
+        layers = [
+            Layer(name=f"l{i}", grid=2.0, width=20, height=10)
+            for i in range(4)
+        ]
+
+        sheets = nest_layers(layers, config=self.CONFIG, spacing=2.0)
+
+        self.assertEqual(len(sheets), 1)
+        placements = sheets[0].placements
+        self.assertEqual(len(placements), 4)
+        for a, b in itertools.combinations(placements, 2):
+            self.assertFalse(_overlaps(a, b))
+        for placement in placements:
+            self.assertGreaterEqual(placement.x, 2.0)
+            self.assertGreaterEqual(placement.y, 2.0)
+            self.assertLessEqual(placement.x + placement.width, 98.0)
+            self.assertLessEqual(placement.y + placement.height, 58.0)
+
+    def test_rotates_to_fit(self):
+        layer = Layer(grid=1.0, width=50, height=90)
+
+        sheets = nest_layers([layer], config=self.CONFIG, spacing=2.0)
+
+        self.assertEqual(sheets[0].placements[0].rotation, R90)
+        self.assertEqual(sheets[0].placements[0].width, 90)
+
+    def test_separates_materials(self):
+        layers = [
+            Layer(grid=1.0, width=10, height=10, material='acrylic'),
+            Layer(grid=1.0, width=10, height=10, material='silicone'),
+            Layer(grid=1.0, width=10, height=10, thickness=3.0),
+        ]
+
+        sheets = nest_layers(layers, config=self.CONFIG)
+
+        self.assertEqual(
+            [(sheet.material, sheet.thickness) for sheet in sheets],
+            [('acrylic', 2.0), ('acrylic', 3.0), ('silicone', 2.0)],
+        )
+
+    def test_overflows_onto_new_sheet(self):
+        layers = [Layer(grid=1.0, width=60, height=50) for _ in range(3)]
+
+        sheets = nest_layers(layers, config=self.CONFIG, spacing=1.0)
+
+        self.assertEqual(len(sheets), 3)
+        for sheet in sheets:
+            self.assertEqual(sheet.placements[0].rotation, R0)
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            nest_layers(
+                [Layer(grid=1.0, width=200, height=10)], config=self.CONFIG,
+            )
+
+    def test_sheet_size(self):
+        config = {'sheets': [
+            {'material': 'silicone', 'width': 300.0, 'height': 300.0},
+            {'width': 100.0, 'height': 60.0},
+        ]}
+        self.assertEqual(sheet_size(config, 'silicone', 1.0), (300.0, 300.0))
+        self.assertEqual(sheet_size(config, 'acrylic', 2.0), (100.0, 60.0))
+
+    def test_render(self):
+        layers = [Layer(grid=1.0, width=50, height=80), Layer(
+            grid=1.0, width=10, height=10,
+        )]
+        sheets = nest_layers(layers, config=self.CONFIG)
+
+        output = io.BytesIO()
+        render_sheet(sheets[0], output)
+        root = xml.etree.ElementTree.fromstring(output.getvalue())
+
+        groups = root.findall(f"{SVG}g")
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(
+            groups[0].get("transform"), "matrix(0.0,1.0,-1.0,0.0,82.0,2.0)",
+        )
+
+    def test_render_common_lines(self):
+        layers = [
+            Layer(name="a", grid=1.0, width=50, height=80),
+            Layer(name="b", grid=1.0, width=50, height=80),
+        ]
+        sheets = nest_layers(layers, spacing=0.0)
+
+        output = io.BytesIO()
+        merged = render_sheet(sheets[0], output, common_lines=True)
+        self.assertEqual(merged.saving, 50.0)
+
+        root = xml.etree.ElementTree.fromstring(output.getvalue())
+        groups = root.findall(f"{SVG}g")
+        self.assertEqual(
+            [group.get("id") for group in groups], ["layer0_a", "layer1_b"],
+        )
+        self.assertIsNone(groups[0].get("transform"))
+        self.assertEqual(
+            groups[1].find(f"{SVG}path").get("d"),
+            "M 160.0,0.0 L 160.0,50.0 L 80.0,50.0 M 80.0,0.0 L 160.0,0.0",
+        )
+
+        self.assertIsNone(render_sheet(sheets[0], io.BytesIO()))
@@ -0,0 +1,146 @@
+import gzip
+import pathlib
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from pcdl.output import OutputWriter
+
+
+_FILES = [
+    ('layer0_base_acrylic_2.0mm.svg', b'<svg>base</svg>' * 100),
+    ('layer0_base_acrylic_2.0mm.npz', b'arrays'),
+    ('layer1_top_acrylic_2.0mm.svg', b'<svg>top</svg>' * 100),
+]
+
+
+class OutputWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = pathlib.Path(self._directory.name, 'output')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _write(self, **kwargs):
+        with OutputWriter(self.directory, **kwargs) as writer:
+            return [writer.write(name, data) for name, data in _FILES]
+
+    def test_directory(self):
+        names = self._write()
+        self.assertEqual(names, [name for name, _ in _FILES])
+        for name, data in _FILES:
+            self.assertEqual(self.directory.joinpath(name).read_bytes(), data)
+
+    def test_svgz(self):
+        names = self._write(compress=True, level=1, workers=2)
+        self.assertEqual(names, [
+            'layer0_base_acrylic_2.0mm.svgz',
+            'layer0_base_acrylic_2.0mm.npz',
+            'layer1_top_acrylic_2.0mm.svgz',
+        ])
+        for name, (_, data) in zip(names, _FILES):
+            written = self.directory.joinpath(name).read_bytes()
+            if name.endswith('.svgz'):
+                self.assertLess(len(written), len(data))
+                written = gzip.decompress(written)
+            self.assertEqual(written, data)
+
+    def test_tar(self):
+        names = self._write(bundle='tar', compress=True)
+        self.assertEqual(
+            [path.name for path in self.directory.iterdir()], ['layers.tar'],
+        )
+        with tarfile.open(self.directory.joinpath('layers.tar')) as archive:
+            self.assertEqual(archive.getnames(), names)
+            data = archive.extractfile(names[2]).read()
+        self.assertEqual(gzip.decompress(data), _FILES[2][1])
+
+    def test_zip(self):
+        names = self._write(bundle='zip')
+        path = self.directory.joinpath('layers.zip')
+        with zipfile.ZipFile(path) as archive:
+            self.assertEqual(archive.namelist(), names)
+            for name, data in _FILES:
+                self.assertEqual(archive.read(name), data)
+            self.assertEqual(
+                archive.getinfo(names[0]).compress_type, zipfile.ZIP_DEFLATED,
+            )
+
+        # Bundles do not depend on when they were written.
+        first = path.read_bytes()
+        self._write(bundle='zip')
+        self.assertEqual(path.read_bytes(), first)
+
+    def test_zip_svgz(self):
+        names = self._write(bundle='zip', compress=True)
+        path = self.directory.joinpath('layers.zip')
+        with zipfile.ZipFile(path) as archive:
+            info = archive.getinfo(names[0])
+            self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(
+                gzip.decompress(archive.read(names[0])), _FILES[0][1],
+            )
+
+    def test_unknown_bundle(self):
+        with self.assertRaises(ValueError):
+            OutputWriter(self.directory, bundle='rar')
+
+    def test_abort(self):
+        with self.assertRaises(RuntimeError):
+            with OutputWriter(self.directory, compress=True) as writer:
+                for name, data in _FILES:
+                    writer.write(name, data)
+                raise RuntimeError()
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_abort_keeps_previous(self):
+        # Files from an earlier run are only replaced once the new ones are
+        # all written.
+        self._write()
+        with self.assertRaises(RuntimeError):
+            with OutputWriter(self.directory) as writer:
+                writer.write(_FILES[0][0], b'<svg>new</svg>')
+                writer.write('extra.svg', b'<svg>extra</svg>')
+                raise RuntimeError()
+        self.assertEqual(
+            sorted(path.name for path in self.directory.iterdir()),
+            sorted(name for name, _ in _FILES),
+        )
+        for name, data in _FILES:
+            self.assertEqual(self.directory.joinpath(name).read_bytes(), data)
+
+        writer = OutputWriter(self.directory, bundle='tar')
+        writer.close()
+        previous = self.directory.joinpath('layers.tar').read_bytes()
+        writer = OutputWriter(self.directory, bundle='tar')
+        writer.write(*_FILES[0])
+        writer.abort()
+        self.assertEqual(
+            self.directory.joinpath('layers.tar').read_bytes(), previous,
+        )
+
+    def test_abort_bundle(self):
+        writer = OutputWriter(self.directory, bundle='zip')
+        writer.write(*_FILES[0])
+        writer.abort()
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_stream(self):
+        with OutputWriter(self.directory) as writer:
+            with writer.stream('stack.stl') as output:
+                output.write(b'solid')
+                self.assertEqual(
+                    [path.name for path in self.directory.iterdir()],
+                    ['.stack.stl.part'],
+                )
+        self.assertEqual(
+            self.directory.joinpath('stack.stl').read_bytes(), b'solid',
+        )
+
+        with OutputWriter(self.directory, bundle='tar') as writer:
+            with writer.stream('stack.stl') as output:
+                output.write(b'solid')
+        with tarfile.open(self.directory.joinpath('layers.tar')) as archive:
+            self.assertEqual(archive.extractfile('stack.stl').read(), b'solid')
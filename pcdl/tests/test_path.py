@@ -0,0 +1,123 @@
+import math
+import unittest
+
+from pcdl.grid import R90
+from pcdl.path import ARC, CLOSE, LINE, MOVE, PathBuilder
+
+
+def _circle(x, y, r):
+    path = PathBuilder()
+    path.move_to(x, y + r)
+    path.arc_to(x + r, y, rx=r, ry=r)
+    path.arc_to(x, y - r, rx=r, ry=r)
+    path.arc_to(x - r, y, rx=r, ry=r)
+    path.arc_to(x, y + r, rx=r, ry=r)
+    path.close_path()
+    return path
+
+
+def _square():
+    path = PathBuilder()
+    path.move_to(1.0, 1.0)
+    path.line_to(3.0, 1.0)
+    path.line_to(3.0, 3.0)
+    path.line_to(1.0, 3.0)
+    path.close_path()
+    return path
+
+
+class PathBuilderTestCase(unittest.TestCase):
+    def test_svg(self):
+        path = PathBuilder()
+        path.move_to(1.5, 2.0)
+        path.line_to(3.25, 2.0)
+        path.arc_to(3.25, 4.0, rx=1.0, ry=1.0)
+        path.close_path()
+
+        self.assertEqual(
+            path.close(), "M 1.5,2.0 L 3.25,2.0 A 1.0,1.0 0 0,0 3.25,4.0 Z",
+        )
+        self.assertEqual(list(path.codes), [MOVE, LINE, ARC, CLOSE])
+        self.assertEqual(PathBuilder().close(), "")
+
+    def test_relative(self):
+        path = PathBuilder()
+        path.move_to(1.0, 1.0)
+        path.line(2.0, 0.0)
+        path.close_path()
+        path.move(0.0, 5.0)
+        path.line(1.0, 1.0)
+
+        self.assertEqual(
+            path.to_svg(), "M 1.0,1.0 L 3.0,1.0 Z M 1.0,6.0 L 2.0,7.0",
+        )
+
+    def test_length(self):
+        self.assertAlmostEqual(_circle(5.0, 5.0, 2.0).length(), 4 * math.pi)
+        self.assertAlmostEqual(_square().length(), 8.0)
+
+    def test_bounds(self):
+        path = PathBuilder()
+        path.move_to(0.0, 0.0)
+        path.arc_to(2.0, 0.0, rx=1.0, ry=1.0)
+
+        x0, y0, x1, y1 = path.bounds()
+        self.assertAlmostEqual(x0, 0.0)
+        self.assertAlmostEqual(x1, 2.0)
+        # Arcs turn clockwise with y pointing up, so a half turn from left
+        # to right bulges towards positive y.
+        self.assertAlmostEqual(y0, 0.0)
+        self.assertAlmostEqual(y1, 1.0)
+
+        self.assertIsNone(PathBuilder().bounds())
+
+    def test_transform(self):
+        path = _circle(1.0, 0.0, 1.0)
+        path.transform(scale=2.0, rotation=R90, offset=(10.0, 10.0))
+
+        x0, y0, x1, y1 = path.bounds()
+        self.assertAlmostEqual(x0, 8.0)
+        self.assertAlmostEqual(x1, 12.0)
+        self.assertAlmostEqual(y0, 6.0)
+        self.assertAlmostEqual(y1, 10.0)
+        self.assertAlmostEqual(path.length(), 4 * math.pi)
+
+    def test_contours(self):
+        path = _square()
+        path.extend(_circle(5.0, 5.0, 1.0))
+
+        contours = list(path.contours())
+
+        self.assertEqual(
+            [contour.to_svg() for contour in contours],
+            [_square().to_svg(), _circle(5.0, 5.0, 1.0).to_svg()],
+        )
+
+    def test_dxf(self):
+        path = _square()
+        path.extend(_circle(5.0, 5.0, 1.0))
+
+        dxf = path.to_dxf()
+
+        self.assertTrue(dxf.startswith("0\nSECTION\n2\nENTITIES\n"))
+        self.assertTrue(dxf.endswith("0\nENDSEC\n0\nEOF\n"))
+        self.assertEqual(dxf.count("\nLINE\n"), 4)
+        self.assertEqual(dxf.count("\nARC\n"), 4)
+        # Centres are mirrored to keep y pointing up.
+        self.assertEqual(dxf.count("\n20\n-5.0\n"), 4)
+
+    def test_gcode(self):
+        path = _square()
+        path.extend(_circle(5.0, 5.0, 1.0))
+
+        lines = path.to_gcode(feed=600.0).splitlines()
+
+        self.assertEqual(lines[:3], ["G21", "G90", "G0 X1.0000 Y-1.0000"])
+        self.assertEqual(lines.count("M3"), 2)
+        self.assertEqual(lines.count("M5"), 2)
+        self.assertIn("G1 X3.0000 Y-1.0000 F600", lines)
+        self.assertIn("G3 X6.0000 Y-5.0000 I0.0000 J1.0000 F600", lines)
+        # Closing the circle does not need a move.
+        self.assertEqual(lines[-2:], [
+            "G3 X5.0000 Y-6.0000 I1.0000 J0.0000 F600", "M5",
+        ])
@@ -0,0 +1,101 @@
+import io
+import unittest
+
+from pcdl.config import Config
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.load import load_design
+from pcdl.progress import Cancelled, Progress, ProgressWriter
+from pcdl.rendering import render_design
+from pcdl.svg import render_layer
+from pcdl.tests.fixtures import rows_tiff
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [{'name': "routes", 'radius': 0.4}],
+    'layers': [{'name': "base"}, {'name': "top"}],
+})
+
+
+def _layer():
+    layer = Layer(grid=2.0, width=20, height=20)
+    for x in range(2, 17, 2):
+        layer.add_link(Coordinate2(x, 5), Coordinate2(x, 6))
+    return layer
+
+
+class ProgressTestCase(unittest.TestCase):
+    def test_load(self):
+        reports = []
+        load_design(
+            rows_tiff(), config=_CONFIG,
+            progress=Progress(lambda *report: reports.append(report)),
+        )
+
+        self.assertEqual(
+            [report for report in reports if report[0] == 'frames'],
+            [('frames', 1, 2), ('frames', 2, 2)],
+        )
+        self.assertEqual(
+            [report for report in reports if report[0] == 'columns'],
+            [('columns', x, 12) for x in range(1, 12)] * 2,
+        )
+
+    def test_render_layer(self):
+        reports = []
+        output = io.BytesIO()
+        render_layer(
+            _layer(), output,
+            progress=Progress(lambda *report: reports.append(report)),
+        )
+
+        expected = io.BytesIO()
+        render_layer(_layer(), expected)
+        self.assertEqual(output.getvalue(), expected.getvalue())
+
+        self.assertEqual(
+            [report for report in reports if report[0] == 'contours'],
+            [('contours', n, None) for n in range(1, 9)],
+        )
+        self.assertEqual(
+            reports[-1], ('bytes', len(expected.getvalue()), None),
+        )
+
+    def test_cancel(self):
+        def callback(stage, done, total):
+            if stage == 'contours' and done == 3:
+                progress.cancel()
+
+        progress = Progress(callback)
+        with self.assertRaises(Cancelled):
+            render_layer(_layer(), io.BytesIO(), progress=progress)
+
+        # Anything else given the same progress stops straight away.
+        with self.assertRaises(Cancelled):
+            load_design(rows_tiff(), config=_CONFIG, progress=progress)
+
+    def test_cancel_load(self):
+        def callback(stage, done, total):
+            if stage == 'frames' and done == 2:
+                progress.cancel()
+
+        progress = Progress(callback)
+        with self.assertRaises(Cancelled):
+            render_design(rows_tiff(), config=_CONFIG, progress=progress)
+
+    def test_writer(self):
+        reports = []
+        output = io.BytesIO()
+        writer = ProgressWriter(
+            output, Progress(lambda *report: reports.append(report)),
+        )
+        for _ in range(5):
+            writer.write(bytes(30000))
+        writer.flush()
+
+        self.assertEqual(len(output.getvalue()), 150000)
+        self.assertEqual(reports, [
+            ('bytes', 90000, None),
+            ('bytes', 150000, None),
+        ])
@@ -0,0 +1,225 @@
+import concurrent.futures
+import io
+import pathlib
+import unittest
+
+from pcdl.config import Config
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.load import load_gif
+from pcdl.rendering import (
+    layer_digest, layer_filename, render_design, render_variants,
+    shared_layers, variant_directories,
+)
+from pcdl.svg import render_composite, render_layer
+from pcdl.tests.fixtures import frame, gif, tiff
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [{'name': "routes", 'radius': 0.4}],
+    'layers': [{'name': "base", 'material': "silicone"}],
+})
+
+
+def _tiff(*frames) -> bytes:
+    return tiff([frame(cells) for cells in frames])
+
+
+def _layer(**kwargs):
+    layer = Layer(grid=2.0, width=10, height=10, **kwargs)
+    layer.add_link(Coordinate2(2, 2), Coordinate2(3, 2))
+    layer.add_hole(Coordinate2(6, 6), radius=0.5)
+    return layer
+
+
+class SharedLayersTestCase(unittest.TestCase):
+    def test_digest(self):
+        self.assertEqual(
+            layer_digest(_layer(name="base")),
+            layer_digest(_layer(
+                name="cover", material="silicone", thickness=1.0,
+            )),
+        )
+
+        moved = _layer()
+        moved.remove_hole(Coordinate2(6, 6))
+        moved.add_hole(Coordinate2(6, 7), radius=0.5)
+        self.assertNotEqual(layer_digest(_layer()), layer_digest(moved))
+
+        wider = _layer()
+        wider.remove_hole(Coordinate2(6, 6))
+        wider.add_hole(Coordinate2(6, 6), radius=0.6)
+        self.assertNotEqual(layer_digest(_layer()), layer_digest(wider))
+
+    def test_shared_layers(self):
+        other = _layer()
+        other.add_link(Coordinate2(3, 2), Coordinate2(3, 3))
+        layers = [_layer(), other, _layer(), other, Layer(width=10, height=10)]
+        self.assertEqual(shared_layers(layers), [0, 1, 0, 1, 4])
+
+    def test_render_design(self):
+        row = [(x, 4) for x in range(2, 9)]
+        config = Config({
+            **_CONFIG,
+            'layers': [{'name': "base"}, {'name': "top"}, {'name': "cover"}],
+        })
+        rendering = render_design(
+            _tiff(row, [(5, 5)], row), config=config,
+        )
+
+        base, top, cover = rendering.layers.values()
+        self.assertIs(base, cover)
+        self.assertNotEqual(base, top)
+
+        # The repeated layer is drawn by referring back to the first.
+        pair = render_design(_tiff(row, [(5, 5)]), config=config)
+        self.assertEqual(
+            rendering.composite.count(b"<path"),
+            pair.composite.count(b"<path"),
+        )
+        self.assertIn(
+            b'<use id="layer2_cover" href="#layer0_base" />',
+            rendering.composite,
+        )
+
+    def test_render_composite(self):
+        output = io.BytesIO()
+        render_composite(
+            ["a.svg", "b.svg", "a.svg"], output, width=10, height=10, grid=2,
+        )
+        self.assertIn(
+            b'<use id="use0" href="a.svg#root" />'
+            b'<use href="b.svg#root" />'
+            b'<use href="#use0" />',
+            output.getvalue(),
+        )
+
+
+class RenderDesignTestCase(unittest.TestCase):
+    def setUp(self):
+        self.description = gif(
+            [(x, 4) for x in range(2, 9)] +
+            [(3, y) for y in range(5, 10)] +
+            [(7, 8)]
+        )
+
+    def test_layers(self):
+        rendering = render_design(self.description, config=_CONFIG)
+
+        layers = load_gif(self.description, config=_CONFIG)
+        self.assertEqual(
+            list(rendering.layers),
+            [
+                layer_filename(index, layer)
+                for index, layer in enumerate(layers)
+            ],
+        )
+        for layer, data in zip(layers, rendering.layers.values()):
+            output = io.BytesIO()
+            render_layer(layer, output)
+            self.assertEqual(data, output.getvalue())
+
+    def test_composite_is_inlined(self):
+        rendering = render_design(self.description, config=_CONFIG)
+        self.assertNotIn(b"<use", rendering.composite)
+        self.assertIn(b'id="layer0_base"', rendering.composite)
+        self.assertNotIn(b'id="root"', rendering.composite)
+
+    def test_unnamed_layers(self):
+        config = Config({**_CONFIG, 'layers': [{}]})
+        first = render_design(self.description, config=config)
+        second = render_design(self.description, config=config)
+        self.assertEqual(list(first.layers), list(second.layers))
+        self.assertEqual(first.composite, second.composite)
+
+    def test_threads(self):
+        descriptions = [
+            gif([(x, y) for x in range(2, 2 + n)] + [(9, 9)])
+            for n in range(1, 8) for y in (3, 6)
+        ]
+        expected = [
+            render_design(description, config=_CONFIG)
+            for description in descriptions
+        ]
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(
+                lambda description: render_design(
+                    description, config=_CONFIG,
+                ),
+                descriptions,
+            ))
+
+        for result, rendering in zip(results, expected):
+            self.assertEqual(result.layers, rendering.layers)
+            self.assertEqual(result.composite, rendering.composite)
+
+
+class RenderVariantsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.description = _tiff(
+            [(x, 4) for x in range(2, 9)] + [(3, y) for y in range(5, 10)],
+            [(5, 5), (8, 8), (8, 9)],
+            [(x, 4) for x in range(2, 9)] + [(3, y) for y in range(5, 10)],
+        )
+        self.configs = [
+            Config({
+                'grid': grid,
+                'channels': [{'name': "routes", 'radius': radius}],
+                'layers': [
+                    {'name': "base", 'thickness': thickness},
+                    {'name': "top"},
+                    {'name': "cover"},
+                ],
+            })
+            for grid, radius, thickness in (
+                (2.0, 0.4, 2.0), (1.5, 0.3, 3.0), (2.54, 0.45, 1.0),
+            )
+        ]
+
+    def test_same_as_separate_renders(self):
+        variants = list(render_variants(self.description, self.configs))
+        self.assertEqual(len(variants), 3)
+        for config, rendering in zip(self.configs, variants):
+            expected = render_design(self.description, config=config)
+            self.assertEqual(rendering.layers, expected.layers)
+            self.assertEqual(rendering.composite, expected.composite)
+
+        self.assertNotEqual(variants[0].composite, variants[1].composite)
+        self.assertIn("layer0_base_acrylic_3.0mm.svg", variants[1].layers)
+
+    def test_mismatched(self):
+        # Checked before anything is decoded.
+        fewer = Config({**self.configs[1], 'layers': [{'name': "base"}]})
+        with self.assertRaisesRegex(ValueError, "1 layers but .* 3"):
+            render_variants(self.description, [self.configs[0], fewer])
+
+        more = Config({**self.configs[1], 'channels': [
+            {'name': "routes", 'radius': 0.3},
+            {'name': "ports", 'radius': 0.5},
+        ]})
+        with self.assertRaisesRegex(ValueError, "2 channels but .* 1"):
+            render_variants(self.description, [self.configs[0], more])
+
+    def test_directories(self):
+        self.assertEqual(
+            variant_directories([
+                pathlib.Path("a/fast.toml"), pathlib.Path("a/fine.toml"),
+            ]),
+            ["fast", "fine"],
+        )
+        with self.assertRaisesRegex(ValueError, "both be written to fast"):
+            variant_directories([
+                pathlib.Path("a/fast.toml"), pathlib.Path("b/fast.toml"),
+            ])
+
+    def test_compact(self):
+        variants = render_variants(
+            self.description, self.configs[1:], compact=True,
+        )
+        for config, rendering in zip(self.configs[1:], variants):
+            expected = render_design(
+                self.description, config=config, compact=True,
+            )
+            self.assertEqual(rendering.layers, expected.layers)
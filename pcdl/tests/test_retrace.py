@@ -0,0 +1,83 @@
+import io
+import random
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.retrace import IncrementalTracer
+from pcdl.svg import _route_paths, render_layer
+
+
+def _layer(cells, width=24, height=24):
+    # Links every pair of neighbouring cells, as the loader does.
+    layer = Layer(name="test", grid=2.0, width=width, height=height)
+    for cell in sorted(cells, key=tuple):
+        right = Coordinate2(cell.x + 1, cell.y)
+        below = Coordinate2(cell.x, cell.y + 1)
+        if right in cells:
+            layer.add_link(cell, right)
+        if below in cells:
+            layer.add_link(cell, below)
+    return layer
+
+
+class IncrementalTracerTestCase(unittest.TestCase):
+    def assertTraced(self, tracer):
+        self.assertEqual(
+            [path.to_svg() for path in tracer.paths()],
+            list(_route_paths(tracer.layer)),
+        )
+
+    def test_pixel_edits(self):
+        rng = random.Random(4)
+        cells = {
+            Coordinate2(x, y) for x in range(2, 22) for y in range(2, 22)
+            if rng.random() < 0.45
+        }
+        layer = _layer(cells)
+        tracer = IncrementalTracer(layer)
+
+        for _ in range(40):
+            cell = Coordinate2(rng.randrange(2, 22), rng.randrange(2, 22))
+            cells ^= {cell}
+            layer.patch(
+                _layer(cells), cell.x - 1, cell.y - 1, cell.x + 1, cell.y + 1,
+            )
+            self.assertTraced(tracer)
+
+    def test_retraces_locally(self):
+        cells = {Coordinate2(x, 3) for x in range(2, 20)}
+        cells |= {Coordinate2(x, 15) for x in range(2, 20)}
+        layer = _layer(cells)
+        tracer = IncrementalTracer(layer)
+        self.assertEqual(len(tracer.paths()), 2)
+
+        layer.remove_link(Coordinate2(10, 3), Coordinate2(11, 3))
+        self.assertEqual(tracer.update(), 2)
+        self.assertEqual(tracer.update(), 0)
+        self.assertEqual(len(tracer.paths()), 3)
+        self.assertTraced(tracer)
+
+    def test_dead_ends(self):
+        layer = _layer({Coordinate2(x, 5) for x in range(2, 10)})
+        tracer = IncrementalTracer(layer)
+
+        # Two neighbouring cells with no link between them leave half edges
+        # with nowhere to go.
+        layer.add_link(Coordinate2(4, 6), Coordinate2(5, 6))
+        self.assertTraced(tracer)
+
+        layer.remove_link(Coordinate2(4, 6), Coordinate2(5, 6))
+        self.assertTraced(tracer)
+
+    def test_render(self):
+        layer = _layer({Coordinate2(x, 5) for x in range(2, 10)})
+        tracer = IncrementalTracer(layer)
+        layer.add_link(Coordinate2(5, 5), Coordinate2(5, 6))
+
+        for compact in (False, True):
+            expected = io.BytesIO()
+            render_layer(layer, expected, compact=compact)
+            output = io.BytesIO()
+            tracer.render_layer(output, compact=compact)
+            self.assertEqual(output.getvalue(), expected.getvalue())
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+from pcdl.config import Config
+from pcdl.server import PreviewServer
+from pcdl.tests.fixtures import frame, tiff
+from pcdl.tiles import TileCache
+
+
+_CONFIG = Config({
+    'grid': 2.0,
+    'channels': [{'name': "routes", 'radius': 0.4}],
+    'layers': [{'name': "base"}, {'name': "top"}],
+})
+
+
+class PreviewServerTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = pathlib.Path(directory.name).joinpath("cache")
+        self.design = pathlib.Path(directory.name).joinpath("design.tif")
+        self.modified = 0
+        self._write([(x, 4) for x in range(2, 9)])
+
+    def _write(self, cells):
+        self.design.write_bytes(tiff([
+            frame([(5, y) for y in range(2, 9)]), frame(cells),
+        ]))
+        # Make sure the change is noticed however coarse the file system's
+        # timestamps are.
+        self.modified += 10 ** 9
+        os.utime(self.design, ns=(self.modified, self.modified))
+
+    def _server(self, config=_CONFIG):
+        server = PreviewServer(
+            self.design, config=config, cache=TileCache(self.cache),
+        )
+        self.addCleanup(server._executor.shutdown)
+        return server
+
+    def _rendered(self, server):
+        # Requests the top tile of every layer, and returns the layers that
+        # had to be rendered rather than coming from the cache.
+        async def request():
+            for index in range(2):
+                status, _, _ = await server._respond(
+                    f"/tiles/{index}/0/0/0.png",
+                )
+                self.assertEqual(status, 200)
+
+        with mock.patch.object(
+            server, '_render', wraps=server._render,
+        ) as render:
+            asyncio.run(request())
+        return [args[2] for args, _ in render.call_args_list]
+
+    def test_reload(self):
+        server = self._server()
+        self.assertEqual(self._rendered(server), [0, 1])
+        self.assertEqual(self._rendered(server), [])
+
+        self._write([(x, 6) for x in range(2, 9)])
+        self.assertEqual(self._rendered(server), [1])
+
+    def test_config(self):
+        self.assertEqual(self._rendered(self._server()), [0, 1])
+        self.assertEqual(self._rendered(self._server()), [])
+
+        # Tiles cached on disk are only reused for the same config.
+        thicker = Config({
+            **_CONFIG,
+            'layers': [{'name': "base", 'thickness': 3.0}, {'name': "top"}],
+        })
+        self.assertEqual(self._rendered(self._server(thicker)), [0])
+        wider = Config({
+            **_CONFIG, 'channels': [{'name': "routes", 'radius': 0.45}],
+        })
+        self.assertEqual(self._rendered(self._server(wider)), [0, 1])
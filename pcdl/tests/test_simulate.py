@@ -0,0 +1,191 @@
+import types
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.simulate import (
+    Circuit, Simulator, SimulationError, Valve, simulate,
+)
+
+
+def _chain(layer, *cells):
+    for a, b in zip(cells, cells[1:]):
+        layer.add_link(Coordinate2(*a), Coordinate2(*b))
+
+
+def _stack():
+    bottom = Layer(name='bottom', width=16, height=16)
+    wells = Layer(name='wells', width=16, height=16)
+    membrane = Layer(name='membrane', width=16, height=16)
+    top = Layer(name='top', width=16, height=16)
+
+    # A valve connecting a source at (2, 5) to a drain at (7, 5), switched
+    # by a gate running down from (4, 2).
+    _chain(bottom, (2, 5), (3, 5))
+    _chain(bottom, (5, 5), (6, 5), (7, 5))
+    _chain(wells, (3, 5), (4, 5), (5, 5))
+    _chain(top, (4, 2), (4, 3), (4, 4), (4, 5))
+
+    return [bottom, wells, membrane, top]
+
+
+class CircuitTestCase(unittest.TestCase):
+    def test_recognise_valve(self):
+        circuit = Circuit(_stack())
+
+        self.assertEqual(circuit.nets, 3)
+        self.assertEqual(len(circuit.valves), 1)
+
+        valve = circuit.valves[0]
+        self.assertEqual(valve.position, Coordinate2(3, 5))
+        self.assertEqual(set(valve.channels), {
+            circuit.net_at('bottom', Coordinate2(2, 5)),
+            circuit.net_at('bottom', Coordinate2(7, 5)),
+        })
+        self.assertEqual(valve.gate, circuit.net_at('top', Coordinate2(4, 2)))
+
+    def test_via_joins_layers(self):
+        layers = _stack()
+        bottom, wells, membrane, top = layers
+        _chain(bottom, (7, 5), (8, 5))
+        _chain(top, (8, 5), (8, 6))
+        wells.add_hole(Coordinate2(8, 5), radius=0.4)
+        membrane.add_hole(Coordinate2(8, 5), radius=0.4)
+
+        circuit = Circuit(layers)
+
+        self.assertEqual(
+            circuit.net_at('bottom', Coordinate2(5, 5)),
+            circuit.net_at('top', Coordinate2(8, 6)),
+        )
+        self.assertEqual(len(circuit.valves), 1)
+
+    def test_layers_by_index(self):
+        # A second layer named `bottom` is a separate layer, not more of the
+        # first one.
+        layers = _stack()
+        extra = Layer(name='bottom', width=16, height=16)
+        _chain(extra, (2, 5), (2, 6))
+        layers.append(extra)
+
+        circuit = Circuit(layers)
+
+        self.assertEqual(circuit.nets, 4)
+        self.assertNotEqual(
+            circuit.net_at(0, Coordinate2(2, 5)),
+            circuit.net_at(4, Coordinate2(2, 5)),
+        )
+        self.assertEqual(
+            circuit.net_at('top', Coordinate2(4, 2)),
+            circuit.net_at(3, Coordinate2(4, 2)),
+        )
+        with self.assertRaisesRegex(SimulationError, "more than one layer"):
+            circuit.net_at('bottom', Coordinate2(2, 5))
+
+    def test_missing_net(self):
+        circuit = Circuit(_stack())
+        with self.assertRaises(SimulationError):
+            circuit.net_at('bottom', Coordinate2(10, 10))
+
+
+class SimulatorTestCase(unittest.TestCase):
+    def test_ripple(self):
+        # Each valve connects a driven source to an output, which opens the
+        # next valve, so a change ripples down the whole chain one step at a
+        # time.
+        stages = 50
+        circuit = types.SimpleNamespace(nets=2 * stages + 1, valves=[
+            Valve(
+                position=Coordinate2(stage, 0),
+                channels=(1 + stage, 1 + stages + stage),
+                gate=stages + stage if stage else 0,
+            )
+            for stage in range(stages)
+        ])
+
+        simulators = [Simulator(circuit), Simulator(circuit)]
+        for simulator in simulators:
+            for stage in range(stages):
+                simulator.drive(1 + stage, 1)
+            simulator.settle()
+            self.assertEqual(simulator.value(2 * stages), 0)
+            simulator.drive(0, 1)
+
+        simulator = simulators[0]
+        simulator.settle()
+        self.assertEqual(
+            [simulator.value(1 + stages + stage) for stage in range(stages)],
+            [1] * stages,
+        )
+
+        # Every stage takes a step of its own.
+        with self.assertRaises(SimulationError):
+            simulators[1].settle(max_events=stages)
+
+    def test_valve_truth_table(self):
+        circuit = Circuit(_stack())
+        source = circuit.net_at('bottom', Coordinate2(2, 5))
+        drain = circuit.net_at('bottom', Coordinate2(7, 5))
+        gate = circuit.net_at('top', Coordinate2(4, 2))
+
+        # Lanes enumerate all four combinations of source and gate.
+        simulator = Simulator(circuit, lanes=4)
+        simulator.drive(source, 0b1010)
+        simulator.drive(gate, 0b1100)
+        simulator.settle()
+
+        self.assertEqual(simulator.value(drain), 0b1000)
+
+    def test_pull_is_overridden(self):
+        circuit = Circuit(_stack())
+        source = circuit.net_at('bottom', Coordinate2(2, 5))
+        drain = circuit.net_at('bottom', Coordinate2(7, 5))
+        gate = circuit.net_at('top', Coordinate2(4, 2))
+
+        # An inverter: the drain is pulled high and discharged through the
+        # valve when the gate is asserted.
+        simulator = Simulator(circuit, lanes=2)
+        simulator.drive(source, 0b00)
+        simulator.pull(drain, 0b11)
+        simulator.drive(gate, 0b10)
+        simulator.settle()
+
+        self.assertEqual(simulator.value(drain), 0b01)
+        self.assertEqual(simulator.conflict(drain), 0)
+
+    def test_trapped_value(self):
+        circuit = Circuit(_stack())
+        source = circuit.net_at('bottom', Coordinate2(2, 5))
+        drain = circuit.net_at('bottom', Coordinate2(7, 5))
+        gate = circuit.net_at('top', Coordinate2(4, 2))
+
+        simulator = Simulator(circuit)
+        simulator.drive(source, 1)
+        simulator.drive(gate, 1)
+        simulator.settle()
+        simulator.drive(gate, 0)
+        simulator.settle()
+        simulator.drive(source, 0)
+        simulator.settle()
+
+        self.assertEqual(simulator.value(drain), 1)
+
+    def test_simulate_config(self):
+        config = {
+            'simulation': {
+                'inputs': [
+                    {'x': 2, 'y': 5, 'values': [1, 1, 0]},
+                    {'x': 4, 'y': 2, 'layer': 'top', 'values': [0, 1]},
+                ],
+                'pulls': [
+                    {'x': 7, 'y': 5, 'value': 0},
+                ],
+                'probes': [
+                    {'name': 'out', 'x': 7, 'y': 5},
+                ],
+            },
+        }
+
+        results = simulate(_stack(), config=config)
+
+        self.assertEqual(results, {'out': [0, 1, 0]})
@@ -0,0 +1,111 @@
+import math
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.stats import (
+    CuttingParameters, PathMeter, _move_time, cutting_parameters,
+    format_stats, layer_stats,
+)
+from pcdl.svg import _write_hole
+
+
+class PathMeterTestCase(unittest.TestCase):
+    def test_square(self):
+        meter = PathMeter()
+        meter.move_to(3, 4)
+        meter.line_to(13, 4)
+        meter.line_to(13, 14)
+        meter.line_to(3, 14)
+        meter.close_path()
+
+        self.assertEqual(meter.pierces, 1)
+        self.assertAlmostEqual(meter.travel_length, 5.0)
+        self.assertAlmostEqual(meter.cut_length, 40.0)
+        # Every corner brings the head to a stop.
+        self.assertEqual(meter.strokes, [10.0, 10.0, 10.0, 10.0])
+
+    def test_circle(self):
+        meter = PathMeter()
+        _write_hole(meter, 5.0, 5.0, 2.0)
+
+        self.assertAlmostEqual(meter.cut_length, 4 * math.pi)
+        self.assertEqual(len(meter.strokes), 1)
+
+    def test_rounded_end(self):
+        meter = PathMeter()
+        meter.move_to(0, 0)
+        meter.line_to(10, 0)
+        meter.arc_to(10, 2, rx=1, ry=1, clockwise=False)
+        meter.line_to(0, 2)
+
+        self.assertAlmostEqual(meter.cut_length, 20 + math.pi)
+        self.assertEqual(len(meter.strokes), 0)
+        meter.close_path()
+        self.assertAlmostEqual(meter.strokes[0], 20 + math.pi)
+
+    def test_wrong_turn(self):
+        # Turning the other way around the same semicircle doubles back on
+        # the line, so the head has to stop.
+        meter = PathMeter()
+        meter.move_to(0, 0)
+        meter.line_to(10, 0)
+        meter.arc_to(10, 2, rx=1, ry=1, clockwise=True)
+        meter.close_path()
+
+        self.assertEqual(meter.strokes[0], 10.0)
+
+
+class EstimateTestCase(unittest.TestCase):
+    CONFIG = {'materials': [
+        {'name': 'acrylic', 'thickness': 3.0, 'speed': 5.0},
+        {'name': 'acrylic', 'speed': 10.0, 'pierce_time': 0.5},
+    ]}
+
+    def test_parameters(self):
+        self.assertEqual(
+            cutting_parameters(self.CONFIG, 'acrylic', 3.0).speed, 5.0,
+        )
+        self.assertEqual(
+            cutting_parameters(self.CONFIG, 'acrylic', 2.0).pierce_time, 0.5,
+        )
+        self.assertEqual(
+            cutting_parameters(self.CONFIG, 'silicone', 2.0),
+            CuttingParameters(),
+        )
+
+    def test_move_time(self):
+        # Long enough to reach full speed.
+        self.assertAlmostEqual(_move_time(100.0, 10.0, 100.0), 10.1)
+        # Too short, so the head turns around at half way.
+        self.assertAlmostEqual(_move_time(0.25, 10.0, 100.0), 0.1)
+
+    def test_layer(self):
+        layer = Layer(name="test", grid=2.0, width=10, height=10)
+        layer.add_link(Coordinate2(2, 2), Coordinate2(3, 2))
+        layer.add_link(Coordinate2(3, 2), Coordinate2(3, 3))
+        layer.add_hole(Coordinate2(7, 7), radius=0.5)
+
+        stats = layer_stats(layer, config=self.CONFIG)
+
+        self.assertEqual(stats.contours, 1)
+        self.assertEqual(stats.holes, 1)
+        self.assertEqual(stats.pierces, 3)
+        outline = 4 * 20.0
+        hole = 2 * math.pi
+        # Inner and outer sides, the rounded outer corner, and two end caps,
+        # all scaled by the grid.
+        route = 2.0 * (
+            2 * (1 - 0.4) + 2 * 1 + math.pi / 2 * 0.4 + 2 * math.pi * 0.4
+        )
+        self.assertAlmostEqual(stats.cut_length, outline + hole + route)
+        self.assertAlmostEqual(stats.pierce_time, 1.5)
+        self.assertGreater(stats.cut_time, stats.cut_length / 10.0)
+        self.assertAlmostEqual(
+            stats.time,
+            stats.cut_time + stats.travel_time + stats.pierce_time,
+        )
+
+        report = format_stats([stats])
+        self.assertIn("test", report)
+        self.assertIn("total", report)
@@ -0,0 +1,102 @@
+import collections
+import io
+import struct
+import unittest
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.stl import layer_triangles, write_stl
+from pcdl.tests.fixtures import random_layer, sample_layer
+
+
+def _volume(triangles):
+    volume = 0.0
+    for _, a, b, c in triangles:
+        volume += (
+            a[0] * (b[1] * c[2] - b[2] * c[1]) -
+            a[1] * (b[0] * c[2] - b[2] * c[0]) +
+            a[2] * (b[0] * c[1] - b[1] * c[0])
+        ) / 6
+    return volume
+
+
+class STLTestCase(unittest.TestCase):
+    def test_empty_layer(self):
+        layer = Layer(grid=2.0, width=5, height=4, thickness=3.0)
+        triangles = list(layer_triangles(layer, z=1.0))
+
+        self.assertEqual(len(triangles), 12)
+        self.assertAlmostEqual(_volume(triangles), 10.0 * 8.0 * 3.0)
+        self.assertEqual(
+            {point[2] for _, *points in triangles for point in points},
+            {1.0, 4.0},
+        )
+
+    def test_volume(self):
+        # The board less the channels, as strips 0.8 cells wide, and the
+        # holes, as squares.
+        cut = 21.76 + 21.76 - 2.56 + 5.76 + 4.0 + 0.64
+        triangles = list(layer_triangles(sample_layer()))
+        self.assertAlmostEqual(_volume(triangles), (1600 - cut) * 2.0)
+
+    def test_closed(self):
+        # The outward normals of a closed surface, weighted by area, cancel
+        # out, and each triangle is wound anticlockwise around its normal.
+        total = [0.0, 0.0, 0.0]
+        for normal, a, b, c in layer_triangles(sample_layer()):
+            u = [b[i] - a[i] for i in range(3)]
+            v = [c[i] - a[i] for i in range(3)]
+            cross = [
+                u[1] * v[2] - u[2] * v[1],
+                u[2] * v[0] - u[0] * v[2],
+                u[0] * v[1] - u[1] * v[0],
+            ]
+            self.assertGreater(
+                sum(n * k for n, k in zip(normal, cross)), 0,
+            )
+            for i in range(3):
+                total[i] += cross[i]
+        for value in total:
+            self.assertAlmostEqual(value, 0.0)
+
+    def test_watertight(self):
+        # Every edge is shared by exactly two triangles, which run along it
+        # in opposite directions, so no corner lies partway along an edge.
+        board = random_layer(3, width=30, height=24)
+        for layer in (sample_layer(), board):
+            edges = collections.Counter()
+            for _, *corners in layer_triangles(layer):
+                for a, b in zip(corners, corners[1:] + corners[:1]):
+                    edges[a, b] += 1
+            for (a, b), count in edges.items():
+                self.assertEqual((count, edges[b, a]), (1, 1), (a, b))
+
+    def test_greedy(self):
+        # Identical rows are merged, so a plain channel adds a fixed number
+        # of faces however long it is.
+        def count(length):
+            layer = Layer(grid=2.0, width=40, height=40)
+            for y in range(2, 2 + length):
+                layer.add_link(Coordinate2(5, y), Coordinate2(5, y + 1))
+            return sum(1 for _ in layer_triangles(layer))
+
+        self.assertEqual(count(4), count(30))
+
+    def test_write_stl(self):
+        layers = [sample_layer(), Layer(grid=2.0, width=20, height=20)]
+        output = io.BytesIO(b'prefix')
+        output.seek(len(b'prefix'))
+        count = write_stl(layers, output)
+
+        data = output.getvalue()[len(b'prefix'):]
+        self.assertEqual(len(data), 84 + 50 * count)
+        self.assertEqual(struct.unpack_from('<I', data, 80), (count,))
+        self.assertEqual(
+            count, sum(1 for layer in layers for _ in layer_triangles(layer)),
+        )
+
+        top = set()
+        for index in range(count):
+            values = struct.unpack_from('<12f', data, 84 + 50 * index)
+            top.update(values[5::3])
+        self.assertEqual(top, {0.0, 2.0, 4.0})
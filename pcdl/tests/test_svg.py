@@ -1,7 +1,18 @@
-from pcdl.grid import Coordinate2
-from pcdl.svg import _HalfEdge
+from pcdl.grid import Coordinate2, R0, R90, R180, R270
+from pcdl.layers import Layer
+from pcdl.path import PathBuilder
+from pcdl.svg import (
+    Transformation,
+    _HalfEdge, _half_edges, _hedge_key, _trace_contours, render_layer,
+)
 
+import io
+import itertools
 import unittest
+import xml.etree.ElementTree
+from array import array
+
+SVG = "{http://www.w3.org/2000/svg}"
 
 
 class HalfEdgeTestCase(unittest.TestCase):
@@ -31,3 +42,152 @@ class HalfEdgeTestCase(unittest.TestCase):
 
     def test_direction(self):
         pass
+
+
+class RenderLayerTestCase(unittest.TestCase):
+    def _layer(self):
+        layer = Layer(name="test", grid=2.0, width=10, height=10)
+        layer.add_link(Coordinate2(2, 2), Coordinate2(3, 2))
+        layer.add_link(Coordinate2(3, 2), Coordinate2(3, 3))
+        layer.add_link(Coordinate2(6, 6), Coordinate2(6, 7))
+        layer.add_hole(Coordinate2(5, 2), radius=0.5)
+        layer.add_hole(Coordinate2(7, 3), radius=0.4)
+        return layer
+
+    def _render(self, layer, **kwargs):
+        output = io.BytesIO()
+        render_layer(layer, output, **kwargs)
+        return xml.etree.ElementTree.fromstring(output.getvalue())
+
+    def test_compact_holes_are_circles(self):
+        root = self._render(self._layer(), compact=True)
+
+        circles = root.findall(f".//{SVG}circle")
+        self.assertEqual(len(circles), 2)
+        self.assertEqual(
+            {(c.get("cx"), c.get("cy"), c.get("r")) for c in circles},
+            {("11.0", "5.0", "1.0"), ("15.0", "7.0", "0.8")},
+        )
+
+    def test_compact_merges_contours(self):
+        layer = self._layer()
+        expanded = self._render(layer)
+        compact = self._render(layer, compact=True)
+
+        expanded_paths = expanded.findall(f".//{SVG}path")
+        compact_paths = compact.findall(f".//{SVG}path")
+
+        # Two routes, two holes and the outline.
+        self.assertEqual(len(expanded_paths), 5)
+        # One compound path for the routes plus the outline.
+        self.assertEqual(len(compact_paths), 2)
+
+        self.assertEqual(
+            compact_paths[0].get("d").count("M"),
+            2,
+        )
+        for path in compact_paths:
+            self.assertIsNone(path.get("stroke"))
+        self.assertEqual(compact.find(f"{SVG}g").get("stroke"), "red")
+
+
+class CanonicalOrderTestCase(unittest.TestCase):
+    LINKS = [
+        ((6, 6), (6, 7)),
+        ((2, 2), (3, 2)),
+        ((3, 2), (3, 3)),
+        ((8, 3), (9, 3)),
+        ((8, 2), (8, 3)),
+    ]
+
+    def _render(self, links):
+        layer = Layer(name="test", grid=2.0, width=12, height=12)
+        for a, b in links:
+            layer.add_link(Coordinate2(*a), Coordinate2(*b))
+        output = io.BytesIO()
+        render_layer(layer, output)
+        return output.getvalue()
+
+    def test_independent_of_insertion_order(self):
+        expected = self._render(self.LINKS)
+        for permutation in itertools.islice(
+            itertools.permutations(self.LINKS), 0, None, 7,
+        ):
+            self.assertEqual(self._render(permutation), expected)
+
+    def test_contours_start_at_smallest_vertex(self):
+        layer = Layer(name="test", grid=1.0, width=12, height=12)
+        for a, b in self.LINKS:
+            layer.add_link(Coordinate2(*a), Coordinate2(*b))
+
+        contours = list(_trace_contours(_half_edges(layer)))
+
+        starts = [contour[0] for contour in contours]
+        self.assertEqual(starts, sorted(starts, key=_hedge_key))
+        for contour in contours:
+            self.assertEqual(contour[0], contour[-1])
+            self.assertEqual(
+                contour[0], min(contour, key=_hedge_key),
+            )
+
+
+class TransformationTestCase(unittest.TestCase):
+    POINTS = [(0.0, 0.0), (-0.4, 0.0), (0.0, 0.4), (-0.4, -0.5), (1.5, -2.0)]
+
+    def test_points_match_point(self):
+        points = array('d', itertools.chain.from_iterable(self.POINTS))
+        for rotation in (R0, R90, R180, R270):
+            transformation = Transformation(
+                offset=Coordinate2(3, 7), scale=2.0, rotation=rotation,
+            )
+            result = transformation.transform_points(points)
+            self.assertEqual(
+                list(zip(result[0::2], result[1::2])),
+                [transformation.transform_point(p) for p in self.POINTS],
+            )
+
+    def test_matrix(self):
+        transformation = Transformation(
+            offset=Coordinate2(3, 7), scale=2.0, rotation=R90,
+        )
+        matrix = Transformation.from_matrix(*transformation.matrix)
+        for point in self.POINTS:
+            for a, b in zip(
+                matrix.transform_point(point),
+                transformation.transform_point(point),
+            ):
+                self.assertAlmostEqual(a, b)
+
+    def test_compose(self):
+        cell = Transformation(
+            offset=Coordinate2(1, 1), scale=2.0, rotation=R0,
+        )
+        placement = Transformation.translation(10.0, 0.0) @ (
+            Transformation.turn(R270)
+        )
+        composed = placement @ cell
+
+        for point in self.POINTS:
+            expected = placement.transform_point(cell.transform_point(point))
+            for a, b in zip(composed.transform_point(point), expected):
+                self.assertAlmostEqual(a, b)
+        self.assertEqual(composed.transform_distance(1.0), 2.0)
+        self.assertFalse(composed.reflects)
+
+    def test_reflection_reverses_arcs(self):
+        mirror = Transformation.from_matrix(-1, 0, 0, 1, 0, 0)
+        self.assertTrue(mirror.reflects)
+        self.assertFalse(mirror.transform_sweep(True))
+
+        path = PathBuilder()
+        path.move_to(0.0, 0.0)
+        path.arc_to(2.0, 0.0, rx=1.0, ry=1.0)
+        path.apply(mirror)
+
+        self.assertEqual(path.to_svg(), "M 0.0,0.0 A 1.0,1.0 0 0,1 -2.0,0.0")
+
+    def test_distorting_matrix(self):
+        with self.assertRaises(ValueError):
+            Transformation.from_matrix(1, 0, 0, 2, 0, 0)
+        with self.assertRaises(ValueError):
+            Transformation.from_matrix(1, 1, 0, 1, 0, 0)
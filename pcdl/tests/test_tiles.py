@@ -0,0 +1,53 @@
+import io
+import pathlib
+import tempfile
+import unittest
+
+import PIL.Image
+
+from pcdl.grid import Coordinate2
+from pcdl.layers import Layer
+from pcdl.tiles import TILE_SIZE, TileCache, max_zoom, render_tile
+
+
+class RenderTileTestCase(unittest.TestCase):
+    def test_render(self):
+        layer = Layer(width=64, height=32)
+        layer.add_link(Coordinate2(10, 10), Coordinate2(11, 10))
+        layer.add_hole(Coordinate2(50, 20), radius=0.5)
+
+        tile = PIL.Image.open(io.BytesIO(render_tile(layer, 0, 0, 0)))
+
+        self.assertEqual(tile.size, (TILE_SIZE, TILE_SIZE))
+        # Four pixels per cell at zoom level zero.
+        self.assertEqual(tile.getpixel((42, 42))[3], 255)
+        self.assertEqual(tile.getpixel((202, 82))[3], 255)
+        self.assertEqual(tile.getpixel((100, 100))[3], 0)
+
+    def test_max_zoom(self):
+        self.assertEqual(max_zoom(Layer(width=4, height=4)), 0)
+        self.assertEqual(max_zoom(Layer(width=64, height=32)), 4)
+
+
+class TileCacheTestCase(unittest.TestCase):
+    def test_memory_eviction(self):
+        cache = TileCache(capacity=2)
+        cache.put(('a', 0, 0, 0), b'1')
+        cache.put(('a', 1, 0, 0), b'2')
+        cache.get(('a', 0, 0, 0))
+        cache.put(('a', 1, 1, 0), b'3')
+
+        self.assertEqual(cache.get(('a', 0, 0, 0)), b'1')
+        self.assertIsNone(cache.get(('a', 1, 0, 0)))
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as directory:
+            directory = pathlib.Path(directory)
+            TileCache(directory).put(('a', 2, 1, 3), b'tile')
+
+            cache = TileCache(directory)
+            self.assertEqual(cache.get(('a', 2, 1, 3)), b'tile')
+
+            cache.retain(['b'])
+            self.assertIsNone(cache.get(('a', 2, 1, 3)))
+            self.assertEqual(list(directory.iterdir()), [])
@@ -0,0 +1,195 @@
+"""
+Rendering and caching of raster preview tiles.
+
+Tiles follow the usual slippy map scheme.  At zoom level zero a single tile
+covers the whole board, and each subsequent level doubles the resolution.
+Each layer is tiled separately so that a change to one frame of a design only
+invalidates the tiles of that layer.
+"""
+import collections
+import hashlib
+import io
+import math
+import pathlib
+import shutil
+import threading
+from array import array
+from typing import Optional
+
+import PIL.Image
+import PIL.ImageDraw
+
+from pcdl.grid import Coordinate2
+from pcdl.svg import RADIUS
+
+
+TILE_SIZE = 256
+
+# Changed whenever tiles would be drawn differently, so that tiles cached on
+# disk by an older version are not served.
+TILE_VERSION = 1
+
+# Tiles are rendered at up to this many pixels per grid cell.
+_MAX_CELL_SIZE = 64
+
+_LAYER_COLOURS = [
+    (200, 40, 40),
+    (40, 120, 200),
+    (40, 160, 60),
+    (200, 140, 20),
+    (140, 60, 180),
+    (20, 160, 160),
+]
+
+
+def layer_colour(index: int):
+    return _LAYER_COLOURS[index % len(_LAYER_COLOURS)]
+
+
+def max_zoom(layer) -> int:
+    extent = max(layer.width, layer.height)
+    return max(0, math.ceil(math.log2(_MAX_CELL_SIZE * extent / TILE_SIZE)))
+
+
+def render_tile(layer, z: int, x: int, y: int, *, colour=(200, 40, 40)):
+    """Renders a single tile of a layer as PNG encoded bytes."""
+    extent = max(layer.width, layer.height)
+    scale = TILE_SIZE * 2 ** z / extent
+
+    # Position of the top left corner of the tile in grid units.
+    left = x * TILE_SIZE / scale
+    top = y * TILE_SIZE / scale
+    span = TILE_SIZE / scale
+
+    def project(position):
+        return (
+            (position.x + 0.5 - left) * scale,
+            (position.y + 0.5 - top) * scale,
+        )
+
+    image = PIL.Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
+    draw = PIL.ImageDraw.Draw(image)
+
+    x0 = math.floor(left) - 1
+    y0 = math.floor(top) - 1
+    x1 = math.ceil(left + span) + 1
+    y1 = math.ceil(top + span) + 1
+
+    index = layer.index()
+    fill = (*colour, 255)
+
+    width = max(1, round(2 * RADIUS * scale))
+    links = index.links_in(x0, y0, x1, y1)
+    for offset in range(0, len(links), 4):
+        ax, ay, bx, by = links[offset:offset + 4]
+        draw.line([
+            project(Coordinate2(ax, ay)), project(Coordinate2(bx, by)),
+        ], fill=fill, width=width)
+
+    # Round off the joints between links.
+    r = RADIUS * scale
+    for offset in range(0, len(links), 4):
+        for px, py in (links[offset:offset + 2], links[offset + 2:offset + 4]):
+            cx, cy = project(Coordinate2(px, py))
+            draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=fill)
+
+    holes = index.holes_in(x0, y0, x1, y1)
+    for offset in range(0, len(holes), 2):
+        position = Coordinate2(*holes[offset:offset + 2])
+        cx, cy = project(position)
+        r = layer.hole_radius(position) * scale
+        draw.ellipse([cx - r, cy - r, cx + r, cy + r], fill=fill)
+
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+class TileCache(object):
+    """Two tier cache of rendered tiles.
+
+    Recently used tiles are kept in memory, and every tile is also written to
+    disk under a directory named for the digest of the frame and config it
+    was rendered from.  Tiles for frames that have changed can be dropped from
+    both tiers with `retain`.
+    """
+
+    def __init__(
+        self, directory: Optional[pathlib.Path] = None, *,
+        capacity: int = 1024,
+    ):
+        self.directory = directory
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._memory: collections.OrderedDict = collections.OrderedDict()
+
+    def _path(self, key):
+        digest, z, x, y = key
+        return self.directory.joinpath(digest, str(z), str(x), f"{y}.png")
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self.directory is None:
+            return None
+
+        try:
+            tile = self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+        self._remember(key, tile)
+        return tile
+
+    def put(self, key, tile: bytes) -> None:
+        self._remember(key, tile)
+
+        if self.directory is None:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so that concurrent readers never see a partial
+        # tile.
+        partial = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        partial.write_bytes(tile)
+        partial.replace(path)
+
+    def _remember(self, key, tile):
+        with self._lock:
+            self._memory[key] = tile
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
+
+    def retain(self, digests) -> None:
+        """Drops all tiles that were not rendered from one of `digests`."""
+        digests = set(digests)
+        with self._lock:
+            for key in list(self._memory):
+                if key[0] not in digests:
+                    del self._memory[key]
+
+        if self.directory is None or not self.directory.exists():
+            return
+
+        for path in self.directory.iterdir():
+            if path.is_dir() and path.name not in digests:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def frame_digests(frames):
+    """Returns a digest of the pixels of each frame decoded from a design."""
+    digests = []
+    for size, pixels in frames:
+        digest = hashlib.sha1()
+        digest.update(repr(size).encode())
+        digest.update(array('q', [
+            -1 if colour is None else colour for colour in pixels
+        ]).tobytes())
+        digests.append(digest.hexdigest())
+    return digests
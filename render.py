@@ -1,11 +1,51 @@
 import argparse
+import io
 import pathlib
+import sys
 
 import toml
 
 import pcdl
 
 
+def _report(stage, done, total):
+    if total is None:
+        print(f"\r{stage}: {done}\033[K", end='', file=sys.stderr)
+    else:
+        print(f"\r{stage}: {done}/{total}\033[K", end='', file=sys.stderr)
+
+
+def _size(text):
+    units = {'K': 1e3, 'M': 1e6, 'G': 1e9}
+    scale = units.get(text[-1:].upper())
+    if scale is None:
+        return int(text)
+    return int(float(text[:-1]) * scale)
+
+
+def _render_variants(parser, args):
+    # Each variant gets the layer files and a self contained composite.
+    configs = [toml.load(path) for path in args.variants]
+    try:
+        directories = pcdl.variant_directories(args.variants)
+        renderings = pcdl.render_variants(
+            args.description, configs, compact=args.compact,
+            processes=args.processes, workers=args.workers,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    for directory, rendering in zip(directories, renderings):
+        writer = pcdl.OutputWriter(
+            args.output.joinpath(directory), bundle=args.bundle,
+            compress=args.svgz, level=args.compression_level,
+            workers=args.workers,
+        )
+        with writer:
+            for filename, data in rendering.layers.items():
+                writer.write(filename, data)
+            writer.write('composite.svg', rendering.composite)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="render a gif describing a pneumatic circuit to svg"
@@ -14,32 +54,200 @@ def main():
         '--config', type=argparse.FileType('r'),
     )
     parser.add_argument(
-        'description', type=argparse.FileType('rb'),
+        '--check', action='store_true',
+        help="check the design for problems instead of rendering it",
+    )
+    parser.add_argument(
+        '--compact', action='store_true',
+        help="merge contours into one compound path per cut class",
+    )
+    parser.add_argument(
+        '--processes', type=int,
+        help="trace the routes in each layer using this many processes",
+    )
+    parser.add_argument(
+        '--geometry', choices=['binary', 'npz'],
+        help="also export the traced geometry of each layer as flat arrays",
+    )
+    parser.add_argument(
+        '--stl', action='store_true',
+        help="also export a 3d model of the stacked layers",
+    )
+    parser.add_argument(
+        '--svgz', action='store_true',
+        help="write gzip compressed svgz files",
+    )
+    parser.add_argument(
+        '--bundle', choices=pcdl.BUNDLES,
+        help="write every file into a single archive",
+    )
+    parser.add_argument(
+        '--compression-level', type=int, default=pcdl.DEFAULT_LEVEL,
+        help="compression level, from 1 (fastest) to 9 (smallest)",
     )
     parser.add_argument(
-        'output', type=pathlib.Path
+        '--progress', action='store_true',
+        help="report progress on stderr",
+    )
+    parser.add_argument(
+        '--variant', type=pathlib.Path, action='append', dest='variants',
+        help="render with this config into a directory named after it, "
+        "tracing once for every variant given",
+    )
+    parser.add_argument(
+        '--memory-budget', type=_size,
+        help="render in a way expected to fit in this much memory, such as "
+        "512M or 2G, or fail straight away if there is none",
+    )
+    parser.add_argument(
+        '--memory-report', action='store_true',
+        help="report the memory used by each stage on stderr, which slows "
+        "rendering down",
+    )
+    parser.add_argument(
+        '--workers', type=int,
+        help="number of threads to decode images with",
+    )
+    parser.add_argument(
+        'description', type=pathlib.Path,
+        help="an animated gif, a multi-page tiff, or a directory of pngs",
+    )
+    parser.add_argument(
+        'output', type=pathlib.Path, nargs='?',
     )
     args = parser.parse_args()
 
+    if args.variants:
+        if args.output is None:
+            parser.error("the output directory is required")
+        unsupported = [
+            option for option, given in (
+                ('--config', args.config is not None),
+                ('--check', args.check),
+                ('--geometry', args.geometry is not None),
+                ('--stl', args.stl),
+                ('--progress', args.progress),
+                ('--memory-budget', args.memory_budget is not None),
+                ('--memory-report', args.memory_report),
+            ) if given
+        ]
+        if unsupported:
+            parser.error(
+                f"{', '.join(unsupported)} cannot be used with --variant"
+            )
+        _render_variants(parser, args)
+        return
+
     config = toml.load(args.config)
 
-    layers = pcdl.load_gif(args.description, config=config)
+    if args.check:
+        problems = pcdl.check_design(args.description, config=config)
+        for problem in problems:
+            print(problem)
+        sys.exit(1 if problems else 0)
+    if args.output is None:
+        parser.error("the output directory is required unless checking")
+
+    progress = None
+    if args.progress:
+        progress = pcdl.Progress(_report)
+
+    workers = args.workers
+    if args.memory_budget is not None:
+        try:
+            plan = pcdl.plan_memory(
+                args.description, config=config,
+                budget=args.memory_budget, workers=workers,
+            )
+        except pcdl.MemoryBudgetError as error:
+            parser.exit(1, f"{parser.prog}: {error}\n")
+        config = plan.config
+        workers = plan.workers
+
+    memory = None
+    if args.memory_report:
+        memory = pcdl.MemoryProfile()
+        memory.start()
 
-    args.output.mkdir(parents=True, exist_ok=True)
+    layers = pcdl.load_design(
+        args.description, config=config, workers=workers,
+        progress=progress, memory=memory,
+    )
+
+    writer = pcdl.OutputWriter(
+        args.output, bundle=args.bundle, compress=args.svgz,
+        level=args.compression_level, workers=workers,
+    )
+    with writer:
+        # Layers that repeat an earlier one reuse its files, and the
+        # composite refers to the earlier layer's file in their place.  Only
+        # the files of repeated layers are held on to, until their last
+        # repeat has been written.
+        shared = pcdl.shared_layers(layers)
+        last = {first: index for index, first in enumerate(shared)}
+        documents = {}
+        geometries = {}
+        filenames = []
+        for index, layer in enumerate(layers):
+            first = shared[index]
+            if first == index:
+                # Layers exported as geometry as well are only traced once.
+                routes = None
+                if args.geometry is not None:
+                    routes = pcdl.layer_routes(
+                        layer, processes=args.processes, memory=memory,
+                    )
+                output = io.BytesIO()
+                pcdl.render_layer(
+                    layer, output, compact=args.compact,
+                    processes=args.processes, routes=routes,
+                    progress=progress, memory=memory,
+                )
+                documents[index] = output.getvalue()
+            filename = pcdl.layer_filename(index, layer)
+            document = documents[first]
+            if last[first] == index:
+                del documents[first]
+            filenames.append(writer.write(filename, document))
+            del document
 
-    filenames = []
-    for index, layer in enumerate(layers):
-        filename = f"layer{index}_{layer.name}_{layer.material}_{layer.thickness}mm.svg"
-        with open(args.output.joinpath(filename), 'wb') as output:
-            pcdl.render_layer(layer, output)
-        filenames.append(filename)
+            if args.geometry is not None:
+                if first == index:
+                    geometry = pcdl.layer_geometry(layer, routes=routes)
+                    del routes
+                    output = io.BytesIO()
+                    if args.geometry == 'npz':
+                        pcdl.write_npz(geometry, output)
+                    else:
+                        pcdl.write_binary(geometry, output)
+                    del geometry
+                    geometries[index] = output.getvalue()
+                suffix = '.npz' if args.geometry == 'npz' else '.geom'
+                data = geometries[first]
+                if last[first] == index:
+                    del geometries[first]
+                writer.write(
+                    str(pathlib.PurePath(filename).with_suffix(suffix)), data,
+                )
+                del data
 
-    with open(args.output.joinpath('composite.svg'), 'wb') as output:
+        output = io.BytesIO()
         pcdl.render_composite(
-            filenames, output,
+            [filenames[first] for first in shared], output,
             width=layers[0].width, height=layers[0].height,
             grid=layers[0].grid,
         )
+        writer.write('composite.svg', output.getvalue())
+
+        if args.stl:
+            with writer.stream('stack.stl') as output:
+                pcdl.write_stl(layers, output)
+
+    if progress is not None:
+        print(file=sys.stderr)
+    if memory is not None:
+        memory.stop()
+        print(memory.report(), file=sys.stderr)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import pathlib
+
+import toml
+
+from pcdl.server import PreviewServer
+from pcdl.tiles import TileCache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="serve tiled previews of a design describing a "
+        "pneumatic circuit"
+    )
+    parser.add_argument(
+        '--config', type=argparse.FileType('r'),
+    )
+    parser.add_argument(
+        '--host', default='localhost',
+    )
+    parser.add_argument(
+        '--port', type=int, default=8000,
+    )
+    parser.add_argument(
+        '--cache', type=pathlib.Path,
+        help="directory in which to keep rendered tiles between runs",
+    )
+    parser.add_argument(
+        '--workers', type=int,
+        help="number of threads to render tiles with",
+    )
+    parser.add_argument(
+        'description', type=pathlib.Path,
+        help="an animated gif, a multi-page tiff, or a directory of pngs",
+    )
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+
+    server = PreviewServer(
+        args.description, config=config,
+        cache=TileCache(args.cache), workers=args.workers,
+    )
+    print(f"serving on http://{args.host}:{args.port}/")
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import pathlib
+
+import toml
+
+import pcdl
+from pcdl.simulate import simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="simulate a design describing a pneumatic circuit"
+    )
+    parser.add_argument(
+        '--config', type=argparse.FileType('r'),
+    )
+    parser.add_argument(
+        'description', type=pathlib.Path,
+        help="an animated gif, a multi-page tiff, or a directory of pngs",
+    )
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+    lanes = config['simulation'].get('lanes', 1)
+
+    layers = pcdl.load_design(args.description, config=config)
+
+    results = simulate(layers, config=config)
+
+    names = list(results)
+    print('step', *names, sep='\t')
+    for step, values in enumerate(zip(*results.values())):
+        print(step, *(f"{value:0{lanes}b}" for value in values), sep='\t')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import argparse
+import pathlib
+
+import toml
+
+import pcdl
+from pcdl.stats import format_stats, stack_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="report cut lengths and estimated machine time for "
+        "designs describing pneumatic circuits"
+    )
+    parser.add_argument(
+        '--config', type=argparse.FileType('r'),
+    )
+    parser.add_argument(
+        'descriptions', type=pathlib.Path, nargs='+',
+        help="animated gifs, multi-page tiffs, or directories of pngs",
+    )
+    args = parser.parse_args()
+
+    config = toml.load(args.config)
+
+    for description in args.descriptions:
+        layers = pcdl.load_design(description, config=config)
+        print(description)
+        print(format_stats(stack_stats(layers, config=config)))
+
+
+if __name__ == '__main__':
+    main()